@@ -4,11 +4,16 @@
 import os
 import sys
 import json
-import setuptools
 from datetime import datetime
 
+from . import native
 from .cmdline import get_options
 from .config import get_config
+from .store import ArtifactStore
+from .store import install_stored
+from .store import fetch_artifacts
+from .store import publish_artifacts
+from .fingerprint import BuildRecord
 from .configure import set_value_in_config
 from .configure import run_interactive_setup
 from .constants import HELP
@@ -16,6 +21,7 @@ from .constants import META_NAME
 from .constants import VERSION
 from .context import SetupContext
 from .context import ManifestContext
+from .context import write_if_changed
 from .guessing import perform_guesswork
 
 
@@ -60,10 +66,36 @@ def pypackage_setup(setup_py_commands=None, options=None, additional=""):
             " ".join(sys.argv[1:]),
             datetime.utcnow().isoformat().split(".")[0],
         )
-        with open(META_NAME, "w") as openfile:
-            openfile.write(banner + json.dumps(config._metadata, indent=4))
+        write_if_changed(
+            META_NAME,
+            banner + json.dumps(config._metadata, indent=4),
+            banner=True,
+        )
+
+    build_record = BuildRecord(config, setup_py_commands)
+    if build_record.up_to_date():
+        print("Nothing changed since {} were built".format(
+            ", ".join(build_record.artifacts.values())
+        ))
+        return
+
+    store = ArtifactStore.from_config(config) if setup_py_commands else None
+    if store and setup_py_commands == ["install"] and \
+            install_stored(store, config):
+        return
+    elif store:
+        setup_py_commands = fetch_artifacts(store, build_record,
+                                            setup_py_commands)
+        if not setup_py_commands:
+            build_record.save()
+            return
 
-    kwargs = config._as_kwargs
+    if setup_py_commands and getattr(config, "native_build", False):
+        # native builds don't need the MANIFEST.in or setup.py on disk
+        setup_py_commands = native.build(config, setup_py_commands)
+        if not setup_py_commands:
+            _built(build_record, store)
+            return
 
     with ManifestContext(config, options):   # write the MANIFEST.in
         with SetupContext(config, options):  # write the setup.py
@@ -71,8 +103,18 @@ def pypackage_setup(setup_py_commands=None, options=None, additional=""):
                 # use setuptools to build/install/test/whatever us directly
                 sys.argv = ["setup.py"]
                 sys.argv.extend(setup_py_commands)
-                setuptools.setup(**kwargs)
+                import setuptools
+                setuptools.setup(**config._setuptools_kwargs)
+                _built(build_record, store)
             else:
                 if options.interactive:
                     print(" setup.py ".center(40, "~"))
                 print(config)
+
+
+def _built(build_record, store):
+    """Records a finished build, and publishes it to the store if in use."""
+
+    build_record.save()
+    if store:
+        publish_artifacts(store, build_record)
@@ -0,0 +1,296 @@
+"""On disk cache of guesswork results, to skip rescanning unchanged files.
+
+Entries are keyed on file identity (path, size, mtime and inode) so that only
+files which have changed since the last run are read again. Listings derived
+from the whole tree (data files, packages) are keyed on the identity of every
+directory, since adding or removing a file changes its directory's mtime.
+Content digests of build inputs are kept the same way as file entries.
+"""
+
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+
+from .constants import dist_version
+
+
+# bump this whenever the format, or what's stored in it, changes
+CACHE_VERSION = 3
+
+CACHE_NAME = "pypackage-guesses.json"
+
+DEFAULT_CACHE_DIR = ".eggs"
+
+# files changed this recently might still be mid change when read
+RACY_SECONDS = 2
+
+# read files in chunks of this many bytes when hashing them
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_identity(stat):
+    """Returns a list of size, mtime in nanoseconds and inode from stat."""
+
+    mtime_ns = getattr(stat, "st_mtime_ns", None)
+    if mtime_ns is None:  # pragma: no cover
+        mtime_ns = int(stat.st_mtime * 1e9)
+    return [stat.st_size, mtime_ns, stat.st_ino]
+
+
+def tree_identity(tree, *extra):
+    """Returns a hex digest of every directory's identity in the tree.
+
+    Args::
+
+        tree: TreeSnapshot to fingerprint
+        extra: any additional values which should change the key
+    """
+
+    digest = hashlib.sha1()
+    for path, stat in sorted(tree.directory_stats()):
+        digest.update(json.dumps(
+            [os.path.abspath(path)] + file_identity(stat)
+        ).encode("utf-8"))
+    digest.update(json.dumps(extra, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def content_digest(path):
+    """Returns the sha256 hex digest of the file at path."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as openfile:
+        chunk = openfile.read(HASH_CHUNK_SIZE)
+        while chunk:
+            digest.update(chunk)
+            chunk = openfile.read(HASH_CHUNK_SIZE)
+    return digest.hexdigest()
+
+
+def is_racy(mtime):
+    """Returns a boolean of if mtime is too recent to cache against.
+
+    Something changed in the same mtime tick as it was read could change
+    again without its identity changing, so it isn't cached until it's
+    older than RACY_SECONDS.
+    """
+
+    return mtime >= time.time() - RACY_SECONDS
+
+
+def newest_mtime(tree):
+    """Returns the latest mtime of any directory in the tree."""
+
+    return max([stat.st_mtime for _, stat in tree.directory_stats()] or [0])
+
+
+def _file_mode(path):
+    """Returns the mode for path, its current one or the umask's default."""
+
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def replace_atomically(temp_path, path, mode=None):
+    """Renames temp_path over path, giving it path's or the umask's mode.
+
+    Args::
+
+        temp_path: the finished file, in the same directory as path
+        path: the file path to replace
+        mode: the permissions to use, or None to find them from path
+    """
+
+    os.chmod(temp_path, _file_mode(path) if mode is None else mode)
+    if os.name == "nt" and os.path.exists(path):  # pragma: no cover
+        os.remove(path)
+    os.rename(temp_path, path)
+
+
+def build_atomically(path, build, suffix=""):
+    """Builds path via a temporary file next to it and a rename.
+
+    An existing file's permissions are kept, new files get the umask's. The
+    temporary file is removed if build raises.
+
+    Args::
+
+        path: the file path to create or replace
+        build: callable taking the temporary file's path, which it fills in
+        suffix: string to end the temporary file's name with
+    """
+
+    directory = os.path.dirname(path) or os.curdir
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    mode = _file_mode(path)  # before writing, in case it is a new file
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-",
+                                             suffix=suffix)
+    os.close(descriptor)
+    try:
+        build(temp_path)
+        replace_atomically(temp_path, path, mode)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomically(path, content):
+    """Writes content to path via a temporary file and a rename.
+
+    An existing file's permissions are kept, new files get the umask's.
+    """
+
+    def _write(temp_path):
+        """Writes the content to the temporary file."""
+
+        with open(temp_path, "wb") as opentemp:
+            opentemp.write(content)
+
+    build_atomically(path, _write)
+
+
+class GuessCache(object):
+    """Persistent cache of per-file matches and tree wide listings.
+
+    Args:
+        cache_dir: directory to keep the cache file in
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.path = os.path.join(cache_dir, CACHE_NAME)
+        self._files = {}     # absolute path: [size, mtime_ns, inode, hits]
+        self._listings = {}  # listing name: [tree identity, value]
+        self._digests = {}   # absolute path: [size, mtime_ns, inode, sha256]
+        self._seen = set()
+        self._digested = set()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Reads the cache from disk, discarding it if it's from elsewhen."""
+
+        try:
+            with open(self.path, "rb") as opencache:
+                cached = json.loads(opencache.read().decode("utf-8"))
+        except (IOError, OSError, ValueError):
+            return
+
+        if cached.get("format") != CACHE_VERSION or \
+                cached.get("pypackage") != dist_version():
+            logging.info("Discarding guess cache from another version")
+            return
+
+        self._files = cached.get("files", {})
+        self._listings = cached.get("listings", {})
+        self._digests = cached.get("digests", {})
+
+    def file_hits(self, path, stat):
+        """Returns the cached hits for path if it has not changed, or None."""
+
+        path = os.path.abspath(path)
+        self._seen.add(path)
+        cached = self._files.get(path)
+        if cached and cached[:3] == file_identity(stat):
+            return cached[3]
+
+    def store_file_hits(self, path, stat, hits):
+        """Stores the hits for path, a JSON serializable value."""
+
+        path = os.path.abspath(path)
+        self._seen.add(path)
+        if is_racy(stat.st_mtime):
+            self._files.pop(path, None)
+            return
+        self._files[path] = file_identity(stat) + [hits]
+        self._dirty = True
+
+    def file_digest(self, path, stat):
+        """Returns the sha256 of path's content, only reading it if changed.
+
+        Args::
+
+            path: the file to hash
+            stat: the file's current stat result
+        """
+
+        path = os.path.abspath(path)
+        self._digested.add(path)
+        identity = file_identity(stat)
+        cached = self._digests.get(path)
+        if cached and cached[:3] == identity:
+            return cached[3]
+
+        digest = content_digest(path)
+        if not is_racy(stat.st_mtime):
+            self._digests[path] = identity + [digest]
+            self._dirty = True
+        return digest
+
+    def listing(self, name, identity, compute, mtime=None):
+        """Returns the listing called name, computing it if identity changed.
+
+        Args::
+
+            name: string name of the listing
+            identity: string identity of everything the listing depends on
+            compute: callable to build the listing on a miss
+            mtime: the newest mtime the identity depends on, a racy one
+                   means the computed listing isn't stored
+
+        Returns:
+            the cached or computed listing
+        """
+
+        cached = self._listings.get(name)
+        if cached and cached[0] == identity:
+            return cached[1]
+
+        value = compute()
+        if mtime is not None and is_racy(mtime):
+            if self._listings.pop(name, None) is not None:
+                self._dirty = True
+            return value
+        self._listings[name] = [identity, value]
+        self._dirty = True
+        return value
+
+    def save(self):
+        """Writes the cache back to disk, if anything has changed."""
+
+        if not self._dirty:
+            return
+
+        if self._seen:  # forget about files which are no longer around
+            self._files = {path: cached for path, cached in
+                           self._files.items() if path in self._seen}
+        if self._digested:
+            self._digests = {path: cached for path, cached in
+                             self._digests.items() if path in self._digested}
+
+        try:
+            cache_dir = os.path.dirname(self.path)
+            if cache_dir and not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            write_atomically(self.path, json.dumps({
+                "format": CACHE_VERSION,
+                "pypackage": dist_version(),
+                "files": self._files,
+                "listings": self._listings,
+                "digests": self._digests,
+            }).encode("utf-8"))
+        except (IOError, OSError) as error:
+            logging.info("Could not write cache %s: %r", self.path, error)
+        else:
+            self._dirty = False
@@ -4,6 +4,7 @@
 import os
 import io
 
+from .tree import TreeSnapshot
 from .constants import INPUT
 
 
@@ -23,16 +24,20 @@ should edit the pypackage.meta rather than this setup.py."""
         return trigger in opensetup.read()
 
 
-def _generated_files():
+def _generated_files(tree=None):
     """Finds all generated files in the current working directory.
 
+    Args:
+        tree: TreeSnapshot of the cwd, or None to scan it
+
     Returns:
         list of full file paths
     """
 
     generated = []
     roots = []
-    for root, directories, files in os.walk(os.curdir):
+    tree = tree or TreeSnapshot()
+    for root, directories, files in tree.walk():
         if root.startswith(("./.tox", "./.eggs", "./venv", "./.venv")):
             continue
 
@@ -26,6 +26,21 @@ def flags(*args):
     return any([arg in cmd_line_flags for arg in args])
 
 
+def flag_value(*args):
+    """Returns the value given to any of the flags, or None if not used.
+
+    Values can follow the flag as the next argument, or be joined with an =,
+    ie; -j 4 == --jobs 4 == --jobs=4
+    """
+
+    for index, flag in enumerate(sys.argv):
+        for arg in args:
+            if flag == arg and index + 1 < len(sys.argv):
+                return sys.argv[index + 1]
+            elif flag.startswith("{}=".format(arg)):
+                return flag.split("=", 1)[1]
+
+
 def get_options():
     """Search through argv real quick and lazy like for some flags.
 
@@ -33,6 +48,9 @@ def get_options():
         configuration object with boolean attributes:
         re_classify, re_config, interactive, setup, metadata, extended,
         re_probe, no_guess, help
+
+        and the value attributes (None if not provided):
+        jobs, guess_budget
     """
 
     class Options(object):
@@ -47,6 +65,8 @@ def get_options():
             self.no_guess = flags("-N", "--no-guess")
             self.help = flags("-h", "--help")
             self.version = flags("-v", "--version")
+            self.jobs = flag_value("-j", "--jobs")
+            self.guess_budget = flag_value("--guess-budget")
 
     return Options()
 
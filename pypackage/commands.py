@@ -5,27 +5,45 @@ Each command's docstring is used as additional help if the -h flag is used.
 Setup is a bit of a snowflake in that it doesn't build anything, takes no args.
 
 Info does not take any arguments, only looks up packages by name.
+
+Every command but worker is forwarded to a py-worker process when one is
+running, and runs in process otherwise, or when it will prompt the user.
 """
 
 
 from __future__ import print_function
 
 import sys
-import pkg_resources
 
+from . import worker as _worker
 from . import pypackage_setup
 from .cleaner import clean_all
 from .config import get_config
+from .cmdline import flags
 from .cmdline import get_options
 from .cmdline import help_and_version
 
 
+def _interactive():
+    """Returns a boolean of if the command will prompt for its metadata."""
+
+    return flags("-i", "--interactive")
+
+
+def _clean_prompts():
+    """Returns a boolean of if py-clean will prompt before deleting."""
+
+    return "-y" not in sys.argv
+
+
+@_worker.forwarded_unless(_interactive)
 def install():
     """py-install will build a setup.py and use it to install locally."""
 
     pypackage_setup(["install"], additional=install.__doc__)
 
 
+@_worker.forwarded_unless(_interactive)
 def run_tests():
     """py-test will build a setup.py and run the test command with it.
 
@@ -44,6 +62,7 @@ def run_tests():
     pypackage_setup(["test"], additional=run_tests.__doc__)
 
 
+@_worker.forwarded_unless(_interactive)
 def develop():
     """py-develop will build a setup.py and run the develop command with it."""
 
@@ -52,6 +71,7 @@ def develop():
     pypackage_setup(["develop"] + sys.argv[1:], options, develop.__doc__)
 
 
+@_worker.forwarded_unless(_interactive)
 def build():
     """py-build will build and run a setup.py from metadata and/or inspection.
 
@@ -71,6 +91,7 @@ def build():
     pypackage_setup(build_commands, options=options, additional=build.__doc__)
 
 
+@_worker.forwarded
 @help_and_version
 def setup():
     """py-setup will create a setup.py from metadata files and/or inspection.
@@ -95,6 +116,7 @@ def setup():
         print(get_config())
 
 
+@_worker.forwarded
 @help_and_version
 def info():
     """py-info will print the most recent version of a package's metadata.
@@ -103,6 +125,8 @@ def info():
         py-info <package> [package] ...\
     """
 
+    import pkg_resources
+
     env = pkg_resources.Environment()
     separator = False
     for arg in sys.argv[1:]:
@@ -138,6 +162,7 @@ def info():
         separator = True
 
 
+@_worker.forwarded_unless(_clean_prompts)
 @help_and_version
 def clean():
     """py-clean will remove generated files from other py-* commands.
@@ -150,3 +175,28 @@ def clean():
     """
 
     clean_all("-y" not in sys.argv)
+
+
+@help_and_version
+def worker():
+    """py-worker keeps pypackage loaded to run the other py-* commands quickly.
+
+    While it runs, the other commands are forwarded to it over a Unix socket,
+    at $PYPACKAGE_WORKER or ~/.pypackage-worker.sock, and run in a forked
+    copy of the worker. Without a worker they run as usual. The worker exits
+    after an hour without requests, or when pypackage is upgraded.
+
+    Usage:
+        py-worker [OPTIONS]
+
+    Options:
+        --stop  Stop the running worker \
+    """
+
+    if not _worker.supported():
+        raise SystemExit("py-worker needs Unix sockets, which aren't here")
+    elif "--stop" in sys.argv:
+        if not _worker.stop():
+            raise SystemExit("No pypackage worker is running")
+    else:
+        _worker.serve()
@@ -8,16 +8,26 @@ import os
 import re
 import copy
 import json
-import nose
-import yaml
-import pytest
+import stat
 import logging
-import unittest
+import importlib
+import threading
 from pprint import pformat
 from collections import OrderedDict
-from setuptools import find_packages
 
-from .runner import TestRunner
+from . import git
+from .tree import PRUNED_DIRS
+from .tree import ROOT_PRUNED_DIRS
+from .tree import TreeSnapshot
+from .tree import parse_find_packages
+from .ignore import IgnoreMatcher
+from .cache import GuessCache
+from .cache import file_identity
+from .cache import newest_mtime
+from .cache import tree_identity
+from .cache import DEFAULT_CACHE_DIR
+from .runner import TEST_COMMAND
+from .runner import test_command
 from .runner import NOSE_TEMPLATE
 from .runner import PYTEST_TEMPLATE
 from .runner import UNITTEST_TEMPLATE
@@ -27,6 +37,10 @@ from .constants import VERSION
 from .constants import UNICODE
 
 
+# characters of the long_description file checked up front
+LONG_DESCRIPTION_SNIFF = 4096
+
+
 class UNDEF(object):
     """Used to differentiate None/0/False from an option not being defined."""
 
@@ -186,12 +200,46 @@ class Config(object):
         ("source_label", str),  # these two are in a draft pep 426
         ("source_url", str),    # early implementation here
     ])
+    # settings for pypackage itself, these are not asked for interactively
+    _SETTINGS_KEYS = OrderedDict([
+        ("cache_dir", str),     # where guesswork is cached, "" to disable
+        ("scan_workers", int),  # threads to read files with while guessing
+        ("scan_processes", bool),  # also match file contents in processes
+        ("scan_max_size", int),    # larger files are not scanned, 0 for any
+        ("guess_budget", int),     # milliseconds to spend scanning files
+        ("ignore", list),          # extra gitignore style patterns to skip
+        ("use_gitignore", bool),   # also skip what the .gitignore ignores
+        ("git_files", bool),       # only look at files tracked in git
+        ("git_untracked", bool),   # plus untracked files git doesn't ignore
+        ("git_dev_version", bool),  # guess 1.2.dev3+gabc1234 after a tag
+        ("native_build", bool),    # pure python wheels without setuptools
+        ("parallel_build", bool),  # native sdist and wheel in processes
+        ("artifact_store", str),   # shared directory of built artifacts
+        ("artifact_store_size", int),  # bytes to keep the store under
+    ])
+
+    # feature hooks run by _verify, as (method, keys it depends on, keys it
+    # may change). only the hooks depending on a changed key are run again
+    _FEATURES = (
+        ("_enable_test_runner",
+         ("test_runner", "tests_require", "runner_args", "tests_dir", "name"),
+         ("test_runner", "tests_require", "runner_args", "cmdclass")),
+        ("_enable_long_description_read", ("long_description",), ()),
+        ("_enable_metadata_obj",
+         ("name", "version", "description", "url", "author", "author_email",
+          "license", "platforms", "keywords", "source_label", "source_url"),
+         ()),
+    )
+
+    # internal state which setting does not change the kwargs
+    _UNTRACKED = ("_tree", "_cache", "_ignore", "_metadata_exclusions")
 
     def __init__(self, **kwargs):
         """Builds a Config object, fills in options passed as kwargs."""
 
         config_as_dict = {key: UNDEF() for key in Config._KEYS}
         config_as_dict.update({key: UNDEF() for key in Config._PYPACKAGE_KEYS})
+        config_as_dict.update({key: UNDEF() for key in Config._SETTINGS_KEYS})
         self._defaults = site_defaults()
         config_as_dict.update(self._defaults)
         config_as_dict.update(kwargs)
@@ -225,18 +273,129 @@ class Config(object):
         # _verify will toggle these if set
         self._configured_runner_args = False
         self._configured_tests_require = False
-        self._long_read = ""  # used in direct setuptools interactions
+        self._long_path = None  # long_description file, read when needed
+        self._long_text = None  # its content, once read
         self._long_read_in_setup = ""  # used in writing the setup.py
 
         # filled in during guessing phase
         self._metadata_exclusions = SetOnce()
 
+        # scanned on first use, then shared by guessing and find_packages
+        self._root = os.curdir  # the project directory, the cwd unless set
+        self._tree = None
+        self._cache = None
+        self._ignore = None
+
         # perform init-time type validation and runs feature functions
         self._verify()
 
+    @property
+    def _project_tree(self):
+        """The TreeSnapshot of the cwd, scanned once per config object.
+
+        Nothing gitignored is pruned from the snapshot, find_packages has to
+        see what setuptools would. The guesswork walks skip ignored paths.
+        """
+
+        if self._tree is None:
+            pruned = PRUNED_DIRS
+            root_pruned = ROOT_PRUNED_DIRS
+            cache_dir = getattr(self, "cache_dir", None)
+            if cache_dir and not os.path.isabs(cache_dir):
+                # keep our own cache out of the package_data guesses
+                root_pruned += (cache_dir,)
+            root = self._root
+            tracked = git.tracked_files(root) if \
+                getattr(self, "git_files", False) else None
+
+            if tracked is None:
+                self._tree = TreeSnapshot.kept(None, root, pruned=pruned,
+                                               root_pruned=root_pruned)
+            else:
+                if getattr(self, "git_untracked", False):
+                    ignore = self._ignore_matcher
+                    walked = TreeSnapshot(
+                        root,
+                        pruned=pruned,
+                        skip_dir=ignore.gitignored_dir,
+                        root_pruned=root_pruned,
+                    )
+                    tracked = sorted(set(tracked).union(
+                        path for path in walked.paths() if
+                        not ignore.gitignored_file(path)
+                    ))
+                self._tree = TreeSnapshot.from_files(
+                    tracked,
+                    root,
+                    pruned=pruned,
+                    stat_sources=[git.index_path(root)],
+                    root_pruned=root_pruned,
+                )
+        return self._tree
+
+    @property
+    def _ignore_matcher(self):
+        """The IgnoreMatcher for guessing, from the .gitignore and settings."""
+
+        if self._ignore is None:
+            self._ignore = IgnoreMatcher(
+                self._root,
+                patterns=getattr(self, "ignore", []),
+                gitignore=getattr(self, "use_gitignore", True),
+            )
+        return self._ignore
+
+    @property
+    def _guess_cache(self):
+        """The GuessCache for this project, or None if caching is disabled."""
+
+        if self._cache is None:
+            cache_dir = getattr(self, "cache_dir", DEFAULT_CACHE_DIR)
+            self._cache = GuessCache(cache_dir) if cache_dir else False
+        return self._cache or None
+
+    def _find_packages(self, **kwargs):
+        """Runs find_packages on the project tree, cached if guessing."""
+
+        tree = self._project_tree
+        if not self._cache:
+            return tree.find_packages(**kwargs)
+
+        return self._cache.listing(
+            "packages",
+            tree_identity(tree, kwargs),
+            lambda: tree.find_packages(**kwargs),
+            newest_mtime(tree),
+        )
+
+    def __setattr__(self, name, value):
+        """Sets the attribute, invalidating the cached kwargs if relevant."""
+
+        if name not in Config._UNTRACKED:
+            self.__dict__.pop("_kwargs", None)
+        super(Config, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        """Deletes the attribute, invalidating the cached kwargs."""
+
+        if name not in Config._UNTRACKED:
+            self.__dict__.pop("_kwargs", None)
+        super(Config, self).__delattr__(name)
+
     @property
     def _as_kwargs(self):
-        """Builds a dict suitable for use with setuptools.setup directly."""
+        """A dict suitable for use with setuptools.setup directly.
+
+        The dict is built once and kept until an attribute changes, a shallow
+        copy is returned so callers can add or remove keys freely.
+        """
+
+        if "_kwargs" not in self.__dict__:
+            self.__dict__["_kwargs"] = self._build_kwargs()
+        return OrderedDict(self.__dict__["_kwargs"])
+
+    def _build_kwargs(self):
+        """Builds the dict for _as_kwargs."""
 
         kwargs = OrderedDict()
 
@@ -244,13 +403,11 @@ class Config(object):
             if hasattr(self, key):
                 if key == "packages":
                     kwargs[key] = self._packages_actual()
-                elif key == "long_description":
-                    kwargs[key] = self._long_read or self.long_description
                 else:
                     kwargs[key] = getattr(self, key)
 
         if "packages" not in kwargs:
-            packages = find_packages(exclude=["test", "tests"])
+            packages = self._find_packages(exclude=["test", "tests"])
             if packages:
                 kwargs["packages"] = packages
 
@@ -259,6 +416,42 @@ class Config(object):
 
         return kwargs
 
+    @property
+    def _resolved_kwargs(self):
+        """The _as_kwargs, with the long_description file read."""
+
+        kwargs = self._as_kwargs
+        if "long_description" in kwargs:
+            kwargs["long_description"] = self._long_read or \
+                self.long_description
+        return kwargs
+
+    @property
+    def _setuptools_kwargs(self):
+        """The _resolved_kwargs, with our test command for setuptools."""
+
+        kwargs = self._resolved_kwargs
+        if kwargs.get("cmdclass", {}).get("test") == TEST_COMMAND:
+            kwargs["cmdclass"] = dict(kwargs["cmdclass"])
+            kwargs["cmdclass"]["test"] = test_command(self)
+        return kwargs
+
+    @property
+    def _long_read(self):
+        """The content of the long_description file, read on first use."""
+
+        if self._long_path is None:
+            return ""
+
+        if self._long_text is None:
+            try:
+                with io.open(self._long_path, encoding="utf-8") as descr:
+                    text = descr.read()
+            except:
+                text = ""
+            self.__dict__["_long_text"] = text
+        return self._long_text
+
     @property
     def _metadata(self):
         """Metadata unique to this config."""
@@ -274,16 +467,18 @@ class Config(object):
         for key in self._metadata_exclusions:
             metadata.pop(key, None)
 
-        # reset long_description back to the filename
-        if self._long_read:
-            metadata["long_description"] = self.long_description
-
         # add in feature keys that have been set
         for attr in Config._PYPACKAGE_KEYS:
             if hasattr(self, attr):
                 if attr != "runner_args" or self._configured_runner_args:
                     metadata[attr] = getattr(self, attr)
 
+        # and any settings which were not mixed in from the site defaults
+        for attr in Config._SETTINGS_KEYS:
+            if hasattr(self, attr) and \
+                    getattr(self, attr) != self._defaults.get(attr):
+                metadata[attr] = getattr(self, attr)
+
         return metadata
 
     def __str__(self):
@@ -299,7 +494,10 @@ class Config(object):
 
         imports = ["from setuptools import setup"]
         if find_needed:
-            imports.append("from setuptools import find_packages")
+            imports.append("from setuptools import {}".format(
+                "find_namespace_packages" if "find_namespace_packages(" in
+                packages_str else "find_packages"
+            ))
         if self._long_read_in_setup:
             imports.insert(0, "import io")
         if hasattr(self, "metadata"):
@@ -363,15 +561,10 @@ class Config(object):
         """Returns the list of packages for direct use with setuptools."""
 
         for package in self.packages:
-            if package.startswith("find_packages(") and \
-                    ";" not in package and "." not in package:
-                # no ;'s or .'s here to reduce attack surface
-                try:
-                    found_packages = eval(package)
-                except:
-                    continue
-                else:
-                    return found_packages
+            # parsed rather than eval'd, only literal arguments are allowed
+            finder_kwargs = parse_find_packages(package)
+            if finder_kwargs is not None:
+                return self._find_packages(**finder_kwargs)
         else:
             return self.packages
 
@@ -389,7 +582,8 @@ class Config(object):
 
         if hasattr(self, "packages"):
             for package in self.packages:
-                if "find_packages(" in package:
+                if "find_packages(" in package or \
+                        "find_namespace_packages(" in package:
                     # user supplied a find_packages() string
                     package_str = package
                     break
@@ -406,7 +600,7 @@ class Config(object):
         cmdclass = getattr(self, "cmdclass", {})
         as_string = copy.deepcopy(cmdclass)
         if "test" in as_string:
-            as_string["test"] = "PyPackageTest"  # name in template
+            as_string["test"] = TEST_COMMAND  # name in template
 
         if as_string:
             return "cmdclass={{{}}}".format(", ".join(  # repr the keys only
@@ -431,13 +625,16 @@ class Config(object):
             None, modifies attributes of self
         """
 
-        if self._long_read or not hasattr(self, "long_description"):
+        if self._long_path or not hasattr(self, "long_description"):
             return
 
+        # only check it's a file which starts off as utf-8 here, the content
+        # is read later by _long_read if setuptools needs it
         try:
             if os.path.isfile(self.long_description):
                 with io.open(self.long_description, encoding="utf-8") as descr:
-                    self._long_read = descr.read()
+                    descr.read(LONG_DESCRIPTION_SNIFF)
+                self._long_path = self.long_description
                 self._long_read_in_setup = (
                     'with io.open("{}", encoding="utf-8") as opendescr:\n'
                     "    long_description=opendescr.read()\n\n\n"
@@ -469,8 +666,14 @@ class Config(object):
             self.test_runner = "unittest"
             self._enable_unittest()
 
-        TestRunner.pypackage(self)  # XXX after runner_args are set
-        self.cmdclass = {"test": TestRunner}
+        # swapped for the real command by _setuptools_kwargs when it's needed
+        self.cmdclass = {"test": TEST_COMMAND}
+
+    @property
+    def _runner(self):
+        """The test runner module, imported on first use."""
+
+        return importlib.import_module(self.test_runner)
 
     def _enable_nosetest(self):
         """Do nosetest specific logic to enable it as a test runner."""
@@ -478,8 +681,6 @@ class Config(object):
         default_args = ["-v", "-d", "--with-coverage", "--cov-report",
                         "term-missing", "--cov"]
 
-        self._runner = nose
-
         # grab the user's tests_require, make sure nose is in there
         self.tests_require = getattr(self, "tests_require", None)
         if self.tests_require is None:
@@ -515,7 +716,6 @@ class Config(object):
     def _enable_unittest(self):
         """Do unittest specific logic to enable it as a test runner."""
 
-        self._runner = unittest
         self.runner_args = getattr(self, "runner_args", None)
         if self.runner_args is None:
             self.runner_args = []
@@ -527,8 +727,6 @@ class Config(object):
 
         default_args = ["-v", "-rx", "--cov-report", "term-missing", "--cov"]
 
-        self._runner = pytest
-
         # grab the user's tests_require, make sure pytest is in there
         self.tests_require = getattr(self, "tests_require", None)
         if self.tests_require is None:
@@ -567,17 +765,42 @@ class Config(object):
         if any(getattr(self, k, None) for k in ("source_url", "source_label")):
             self.metadata = Metadata(self)
 
-    def _verify(self):
-        """Ensures self attributes conform to their type declarations."""
+    def _verify(self, keys=None):
+        """Ensures self attributes conform to their type declarations.
 
-        self._enable_test_runner()
-        self._enable_long_description_read()
-        self._enable_metadata_obj()
+        Args::
 
-        for key, type_ in list(Config._KEYS.items()) + list(
-                Config._PYPACKAGE_KEYS.items()):
-            if hasattr(self, key):
-                self._verify_key(key, type_)
+            keys: the keys which have changed, only they and anything which
+                  depends on them are verified. None to verify everything
+        """
+
+        # features below change attributes in place, rebuild the kwargs after
+        self.__dict__.pop("_kwargs", None)
+
+        if keys is None:
+            to_verify = Config._VALIDATORS
+            features = Config._FEATURES
+        else:
+            to_verify = set(keys)
+            features = [feature for feature in Config._FEATURES if
+                        to_verify.intersection(feature[1])]
+            for _, _, changes in features:
+                to_verify.update(changes)
+
+        for method, _, _ in features:
+            getattr(self, method)()
+
+        for key in Config._VALIDATORS:
+            if key in to_verify and hasattr(self, key):
+                self._validate(key, Config._VALIDATORS[key])
+
+    def _validate(self, key, validator):
+        """Sets key to the result of validator, if it changes the value."""
+
+        value = getattr(self, key)
+        validated = validator(value)
+        if validated is not value:
+            setattr(self, key, validated)
 
     def _verify_key(self, key, type_):
         """Verify that key is of type type_.
@@ -586,43 +809,196 @@ class Config(object):
             TypeError if they key cannot be coerced into type_
         """
 
-        if isinstance(type_, dict) and isinstance(getattr(self, key), dict):
-            setattr(self, key, ensure_dict(getattr(self, key), type_))
-        elif isinstance(type_, dict):
-            raise TypeError("{} should be a dict, not {}!".format(
-                key,
-                type(getattr(self, key)).__name__,
-            ))
-        elif type_ is list and isinstance(getattr(self, key), list):
-            setattr(self, key, ensure_list(getattr(self, key)))
-        elif type_ is list:
-            setattr(self, key, [getattr(self, key)])
-        elif not isinstance(getattr(self, key), type_):
-            if isinstance(type_, tuple):  # multiple acceptable values
-                for type__ in type_:
-                    if type__ is list:
-                        setattr(self, key, [getattr(self, key)])
-                        break
-                    else:
-                        try:
-                            setattr(self, key, type__(getattr(self, key)))
-                            break
-                        except:
-                            pass
-                else:
-                    raise TypeError("{} should be a {} or {}, not {}!".format(
-                        key,
-                        ", ".join([t.__name__ for t in type_[:-1]]),
-                        type_[-1].__name__,
-                        type(getattr(self, key)).__name__,
-                    ))
-            else:
+        self._validate(key, compile_validator(key, type_))
+
+
+def compile_validator(key, type_):
+    """Builds the function to validate and coerce values of key into type_.
+
+    The coercion strategy is decided once here rather than for every value.
+
+    Args::
+
+        key: the string key name, used in error messages
+        type_: the type declaration for key, a type, tuple of types or a dict
+               of a single key type to value type
+
+    Returns:
+        function taking a value, returning it or it coerced into type_
+
+    Raises:
+        the function raises TypeError if the value cannot be coerced
+    """
+
+    def type_name(value):
+        return type(value).__name__
+
+    if isinstance(type_, dict):
+        def validate_dict(value):
+            if not isinstance(value, dict):
+                raise TypeError("{} should be a dict, not {}!".format(
+                    key, type_name(value),
+                ))
+            return ensure_dict(value, type_)
+        return validate_dict
+
+    if type_ is list:
+        def validate_list(value):
+            if isinstance(value, list):
+                return ensure_list(value)
+            return [value]
+        return validate_list
+
+    if isinstance(type_, tuple):  # multiple acceptable values
+        def validate_multiple(value):
+            if isinstance(value, type_):
+                return value
+            for type__ in type_:
+                if type__ is list:
+                    return [value]
                 try:
-                    setattr(self, key, type_(getattr(self, key)))
+                    return type__(value)
                 except:
-                    raise TypeError("{} should be a {}, not {}!".format(
-                        key, type_.__name__, type(getattr(self, key)).__name__,
-                    ))
+                    pass
+            raise TypeError("{} should be a {} or {}, not {}!".format(
+                key,
+                ", ".join([t.__name__ for t in type_[:-1]]),
+                type_[-1].__name__,
+                type_name(value),
+            ))
+        return validate_multiple
+
+    def validate(value):
+        if isinstance(value, type_):
+            return value
+        try:
+            return type_(value)
+        except:
+            raise TypeError("{} should be a {}, not {}!".format(
+                key, type_.__name__, type_name(value),
+            ))
+    return validate
+
+
+# validators for every declared key, in declaration order
+Config._VALIDATORS = OrderedDict(
+    (key, compile_validator(key, type_)) for key, type_ in
+    list(Config._KEYS.items()) + list(Config._PYPACKAGE_KEYS.items()) +
+    list(Config._SETTINGS_KEYS.items())
+)
+
+
+# tuples of key names and site defaults shared between ConfigRecords, the
+# least recently used are dropped past INTERNED_SIZE
+_INTERNED = OrderedDict()
+_INTERNED_LOCK = threading.Lock()
+INTERNED_SIZE = 256
+
+
+def _interned(value, key=None):
+    """Returns a shared instance of value, equal values share one object.
+
+    Args::
+
+        value: a tuple of strings, or a JSON serializable dict
+        key: the hashable identity of value, defaults to value itself
+    """
+
+    key = value if key is None else key
+    with _INTERNED_LOCK:
+        value = _INTERNED.pop(key, value)
+        _INTERNED[key] = value
+        while len(_INTERNED) > INTERNED_SIZE:
+            _INTERNED.popitem(last=False)
+    return value
+
+
+def _shared_values(items, defaults):
+    """Returns a tuple of the values, using the defaults' own equal values.
+
+    Args::
+
+        items: iterable of (key, value)
+        defaults: the interned site defaults dict
+    """
+
+    return tuple(
+        defaults[key] if key in defaults and defaults[key] == value else
+        value for key, value in items
+    )
+
+
+class ConfigRecord(object):
+    """Compact, read only snapshot of a Config for handling many at once.
+
+    Key names and site defaults are shared by every record with the same
+    ones, as are values which came from the site defaults. Other values are
+    held in tuples and the Metadata shim is only built on demand. The
+    _as_kwargs and _metadata views are the same as the Config's.
+
+    Args::
+
+        config: the Config object to snapshot
+    """
+
+    __slots__ = (
+        "_kwargs_keys",
+        "_kwargs_values",
+        "_metadata_keys",
+        "_metadata_values",
+        "_defaults",
+        "_has_metadata_obj",
+    )
+
+    def __init__(self, config):
+        kwargs = config._as_kwargs
+        has_metadata_obj = kwargs.pop("metadata", None) is not None
+        metadata = config._metadata
+
+        defaults = _interned(config._defaults, json.dumps(
+            config._defaults, sort_keys=True, default=repr,
+        ))
+
+        set_ = super(ConfigRecord, self).__setattr__
+        set_("_kwargs_keys", _interned(tuple(kwargs)))
+        set_("_kwargs_values", _shared_values(kwargs.items(), defaults))
+        set_("_metadata_keys", _interned(tuple(metadata)))
+        set_("_metadata_values", _shared_values(metadata.items(), defaults))
+        set_("_defaults", defaults)
+        set_("_has_metadata_obj", has_metadata_obj)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigRecord is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("ConfigRecord is read only")
+
+    def __getattr__(self, name):
+        """Looks up a config attribute by name, like on a Config."""
+
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        for keys, values in ((self._kwargs_keys, self._kwargs_values),
+                             (self._metadata_keys, self._metadata_values)):
+            if name in keys:
+                return values[keys.index(name)]
+        raise AttributeError(name)
+
+    @property
+    def _as_kwargs(self):
+        """A dict suitable for use with setuptools.setup directly."""
+
+        kwargs = OrderedDict(zip(self._kwargs_keys, self._kwargs_values))
+        if self._has_metadata_obj:
+            kwargs["metadata"] = Metadata(self)
+        return kwargs
+
+    @property
+    def _metadata(self):
+        """Metadata unique to this config."""
+
+        return OrderedDict(zip(self._metadata_keys, self._metadata_values))
 
 
 def _multiline(value, indent=4):
@@ -694,15 +1070,58 @@ def ensure_dict(dict_to_verify, dict_types):
     return return_dict
 
 
+# parsed metadata files, {absolute path: (file identity, parsed dict)}
+_METADATA_CACHE = OrderedDict()
+_METADATA_CACHE_LOCK = threading.Lock()
+METADATA_CACHE_SIZE = 256
+
+
+def load_metadata(filename):
+    """Loads a metadata file, reusing the parsed result while it's unchanged.
+
+    Parsed files are kept in a process wide LRU cache keyed by their path,
+    size, mtime and inode. Callers get their own deep copy to modify.
+
+    Args::
+
+        filename: path to a (maybe commented) JSON metadata file
+
+    Returns:
+        dict of the parsed metadata, or None if the file does not exist
+    """
+
+    try:
+        file_stat = os.stat(filename)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+
+    path = os.path.abspath(filename)
+    identity = file_identity(file_stat)
+    with _METADATA_CACHE_LOCK:
+        cached = _METADATA_CACHE.pop(path, None)
+        if cached is not None and cached[0] == identity:
+            _METADATA_CACHE[path] = cached
+            return copy.deepcopy(cached[1])
+
+    parsed = json_maybe_commented(filename) or {}
+    with _METADATA_CACHE_LOCK:
+        _METADATA_CACHE[path] = (identity, parsed)
+        while len(_METADATA_CACHE) > METADATA_CACHE_SIZE:
+            _METADATA_CACHE.popitem(last=False)
+    return copy.deepcopy(parsed)
+
+
 def site_defaults():
     """Look for site default metadata to mixin onto any missing values."""
 
     filename = os.path.join(os.path.expanduser("~"), ".pypackage")
-    if os.path.isfile(filename):
-        return json_maybe_commented(filename) or {}
-    else:
+    defaults = load_metadata(filename)
+    if defaults is None:
         logging.debug("Site defaults requested but not found at %s", filename)
         return {}
+    return defaults
 
 
 def get_config(path=None):
@@ -718,62 +1137,89 @@ def get_config(path=None):
     if path is None:
         path = os.path.abspath(os.path.curdir)
 
-    pyjson = os.path.join(path, META_NAME)
-    if os.path.isfile(pyjson):
-        return Config(**json_maybe_commented(pyjson))
+    metadata = load_metadata(os.path.join(path, META_NAME))
+    if metadata is not None:
+        return Config(**metadata)
     else:
         logging.info("Using site defaults, no %s found in %s", META_NAME, path)
         return Config()
 
 
+def get_config_records(paths):
+    """Builds a compact, read only ConfigRecord for each path.
+
+    Only one full Config is alive at a time, which keeps the memory used
+    when handling thousands of packages in one process down. Packages are
+    found from each path, not the cwd.
+
+    Args:
+        paths: iterable of string paths to search inside
+
+    Returns:
+        list of ConfigRecord objects, in the same order as paths
+    """
+
+    records = []
+    for path in paths:
+        config = get_config(path)
+        config._root = path
+        records.append(ConfigRecord(config))
+    return records
+
+
 def reduce_json_unicode(json_obj):
-    """Stupidly dumps JSON into YAML to remove what unicode it can."""
+    """Converts unicode strings which are plain ascii to str on python 2."""
+
+    if STRING_TYPE is str:  # python 3, json already gives us str
+        return json_obj
+
+    if isinstance(json_obj, dict):
+        return {reduce_json_unicode(key): reduce_json_unicode(value) for
+                key, value in json_obj.items()}
+    elif isinstance(json_obj, list):
+        return [reduce_json_unicode(value) for value in json_obj]
+    elif isinstance(json_obj, STRING_TYPE):
+        try:
+            return str(json_obj)
+        except UnicodeEncodeError:
+            return json_obj
+    return json_obj
 
-    return yaml.safe_load(json.dumps(json_obj))
 
+# a comment line, leading whitespace then #
+_COMMENT_LINE = re.compile(r"^[ \t]*#.*$", re.M)
 
-def json_maybe_commented(filename, remove_comments=False):
-    """Tries twice to load the filename as JSON.
 
-    The second time, if needed, it will remove lines starting with `#`.
+def json_maybe_commented(filename):
+    """Loads filename as JSON, where lines starting with `#` are comments.
+
+    Comment lines are blanked rather than removed, so that the line numbers
+    in any error are the same as in the original file.
     """
 
-    if remove_comments:
-        cleaned_lines = []
-        offset = 0
-        with open(filename, "r") as openfile:
-            for line in openfile:
-                if re.match("\s*#", line):  # leading whitespace then #
-                    offset += 1
-                else:
-                    cleaned_lines.append(line)
-        try:
-            return reduce_json_unicode(json.loads("".join(cleaned_lines)))
-        except Exception as error:
-            meta_line = ""
-            if offset:
-                if hasattr(error, "lineno"):  # new python
+    comments = 0
+    try:
+        with open(filename, "rb") as openfile:
+            content = openfile.read().decode("utf-8")
+        cleaned, comments = _COMMENT_LINE.subn("", content)
+        return reduce_json_unicode(json.loads(cleaned))
+    except Exception as error:
+        meta_line = ""
+        if comments:
+            if hasattr(error, "lineno"):  # new python
+                meta_line = " (originally line {} in .meta)".format(
+                    error.lineno
+                )
+            else:  # old python
+                try:
                     meta_line = " (originally line {} in .meta)".format(
-                        offset + error.lineno
+                        int(error.args[0].split("line ")[1].split()[0])
                     )
-                else:  # old python
-                    try:
-                        meta_line = " (originally line {} in .meta)".format(
-                            offset +
-                            int(error.args[0].split("line ")[1].split()[0])
-                        )
-                    except:
-                        pass
-
-            raise SystemExit("Error reading json from {}: {!r}{}".format(
-                filename,
-                error,
-                meta_line,
-            ))
-    else:
-        try:
-            with open(filename, "r") as openfile:
-                return reduce_json_unicode(json.loads(openfile.read()))
-        except Exception as error:
-            logging.debug("Commented JSON? Recursing because: %r", error)
-            return json_maybe_commented(filename, remove_comments=True)
+                except:
+                    pass
+
+        raise SystemExit("Error reading json from {}: {!r}{}".format(
+            filename,
+            error,
+            meta_line,
+        ))
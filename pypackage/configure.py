@@ -75,7 +75,7 @@ def set_value_in_config(key, config, keys):
         setattr(config, key, user_val)
 
         try:
-            config._verify()
+            config._verify(keys=[key])
         except Exception as error:
             print(error, file=sys.stderr)
             print("{} as {} failed to verify. should be {}".format(
@@ -3,7 +3,6 @@
 
 import os
 import sys
-import pkg_resources
 
 
 if sys.version_info > (3,):  # pragma: no cover
@@ -18,10 +17,52 @@ else:  # pragma: no cover
     UNICODE = unicode           # nopep8
 
 
-VERSION = "{} {}".format(
-    os.path.basename(sys.argv[0]),
-    pkg_resources.get_distribution("pypackage").version,
-)
+_DIST_VERSION = []
+
+
+def dist_version():
+    """Returns the installed version of pypackage, looked up on first use."""
+
+    if not _DIST_VERSION:
+        try:
+            from importlib.metadata import version
+        except ImportError:  # pragma: no cover
+            import pkg_resources
+            _DIST_VERSION.append(
+                pkg_resources.get_distribution("pypackage").version
+            )
+        else:
+            _DIST_VERSION.append(version("pypackage"))
+    return _DIST_VERSION[0]
+
+
+class LazyVersion(object):
+    """The program name and version string, built when first displayed.
+
+    Looking up the installed version means reading package metadata, which
+    is not worth doing on every import just for --version or a banner.
+    """
+
+    def __str__(self):
+        return "{} {}".format(os.path.basename(sys.argv[0]), dist_version())
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __format__(self, format_spec):
+        return format(str(self), format_spec)
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(str(self))
+
+
+VERSION = LazyVersion()
 
 
 META_NAME = "pypackage.meta"
@@ -51,8 +92,10 @@ Usage:
 Options:
     -a --all                Same as -e/--extended, display all config options
     -e --extended           Consider all options for interactive configuration
+    --guess-budget MS       Stop guessing at the version/author after MS millis
     -h --help               Show this help message and exit
     -i --interactive        Enter interactive configuration mode
+    -j --jobs N             Scan files for guesswork with N worker threads
     -m --metadata           Only update the package metadata; build a setup.py
     -N --no-guess           Do not perform any guessing of attributes
     -p --reprobe            Re-guess all attributes, ignore package metadata
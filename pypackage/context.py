@@ -3,6 +3,43 @@
 
 import os
 
+from .cache import write_atomically
+from .manifest import read_manifest
+from .manifest import combined_manifest
+
+
+def write_if_changed(path, content, banner=False):
+    """Writes content to path, only if it differs from what's there already.
+
+    Args::
+
+        path: the file path to write
+        content: the string content to write
+        banner: boolean of if content starts with a banner comment line, which
+                is not considered when comparing, as it has a timestamp
+
+    Returns:
+        boolean of if the file was written
+    """
+
+    new = content if isinstance(content, bytes) else content.encode("utf-8")
+    try:
+        with open(path, "rb") as openfile:
+            existing = openfile.read()
+    except (IOError, OSError):
+        existing = None
+
+    if existing is not None:
+        if banner and existing.startswith(b"#") and new.startswith(b"#"):
+            unchanged = existing.partition(b"\n")[2] == new.partition(b"\n")[2]
+        else:
+            unchanged = existing == new
+        if unchanged:
+            return False
+
+    write_atomically(path, new)
+    return True
+
 
 class SetupContext(object):
     """Context manager for writing and (maybe) removing the setup.py.
@@ -22,8 +59,7 @@ class SetupContext(object):
 
         # dump the config out as a setup.py for back-compat...
         # it's not actually used this build, we pass kwargs directly
-        with open("setup.py", "w") as opensetup:
-            opensetup.write("{}\n".format(str(self.config)))
+        write_if_changed("setup.py", "{}\n".format(str(self.config)))
 
         return self
 
@@ -49,47 +85,26 @@ class ManifestContext(object):
         self.options = options
         self._clean = False  # clean up on exit?
         # gather any previously existing entries..
-        try:
-            with open("MANIFEST.in", "r") as openmanifest:
-                self.previously_existing = openmanifest.read().splitlines()
-        except:
-            self.previously_existing = []
+        self._original = read_manifest()
+        self.previously_existing = self._original.splitlines()
 
     def __enter__(self):
         """Write the MANIFEST.in file if there are data files in use."""
 
-        keys = ["package_data", "data_files"]
-        if not any([getattr(self.config, key, None) for key in keys]):
-            return self  # nothing to do
-
-        add_to_manifest = []
-        for _, files in getattr(self.config, "package_data", {}).items():
-            for file_ in files:
-                include_line = "include {}".format(file_)
-                if include_line not in self.previously_existing:
-                    add_to_manifest.append(include_line)
-
-        try:
-            for _, files in getattr(self.config, "data_files", []):
-                for file_ in files:
-                    include_line = "include {}".format(file_)
-                    if include_line not in self.previously_existing:
-                        add_to_manifest.append(include_line)
-        except ValueError:
-            raise SystemExit("Malformed data_files: {!r}".format(
-                getattr(self.config, "data_files", [])
-            ))
-
-        if add_to_manifest:
+        content, added = combined_manifest(
+            self._original,
+            getattr(self.config, "package_data", None),
+            getattr(self.config, "data_files", None),
+            self.config._project_tree,
+        )
+        if added:
             self._clean = True
-            with open("MANIFEST.in", "a") as openmanifest:
-                openmanifest.write("{}\n".format("\n".join(add_to_manifest)))
+            write_if_changed("MANIFEST.in", content)
 
         return self
 
     def __exit__(self, *args):
         if self.previously_existing:
-            with open("MANIFEST.in", "w") as openmanifest:
-                openmanifest.write("\n".join(self.previously_existing))
+            write_if_changed("MANIFEST.in", self._original)
         elif self._clean and not (self.options.metadata or self.options.setup):
             os.remove("MANIFEST.in")
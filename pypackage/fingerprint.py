@@ -0,0 +1,283 @@
+"""Skips py-build when nothing has changed since the artifacts were built.
+
+The fingerprint of a build is a digest of the resolved config and the
+content of every file that goes into the sdist and wheel. It's stored with
+the identities and digests of the artifacts in the dist directory, and the
+next build with the same fingerprint is skipped as long as the artifacts
+are still there, unchanged.
+"""
+
+
+import os
+import re
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+
+from . import native
+from .config import Metadata
+from .cache import file_identity
+from .cache import content_digest
+from .cache import write_atomically
+from .constants import dist_version
+
+
+FINGERPRINT_NAME = ".pypackage-build.json"
+
+# the commands a build can be skipped for
+BUILD_COMMANDS = ("build", "sdist", "bdist_wheel")
+
+# the commands which make an artifact, in the order they're recorded
+ARTIFACT_COMMANDS = ("sdist", "bdist_wheel")
+
+
+def _normalized(name):
+    """Returns name lowered, with runs of -_. as _, to compare file names."""
+
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+def _artifact_command(file_name, kwargs):
+    """Returns the command which made the artifact file_name, or None.
+
+    Setuptools and the native build can name the artifacts differently, so
+    they're matched on the name and version alone.
+    """
+
+    if file_name.endswith(".tar.gz"):
+        if _normalized(file_name[:-len(".tar.gz")]) == \
+                _normalized(native.sdist_name(kwargs)):
+            return "sdist"
+    elif file_name.endswith(".whl"):
+        parts = file_name[:-len(".whl")].split("-")
+        expected = native.wheel_name(kwargs).split("-")[:2]
+        if len(parts) >= 5 and [_normalized(part) for part in parts[:2]] == \
+                [_normalized(part) for part in expected]:
+            return "bdist_wheel"
+
+
+def _digest(*values):
+    """Returns the sha256 hex digest of the JSON encoded values."""
+
+    return hashlib.sha256(json.dumps(
+        values, sort_keys=True,
+    ).encode("utf-8")).hexdigest()
+
+
+def _plain(value):
+    """JSON encodes what json can't in the kwargs, for input_fingerprint.
+
+    The Metadata shim is encoded as its fields, without the generator which
+    names the running command. Anything else raises a TypeError, as its
+    repr could change between runs.
+    """
+
+    if isinstance(value, Metadata):
+        fields = dict(vars(value))
+        fields.pop("generator", None)
+        return fields
+    raise TypeError("{!r} can't be fingerprinted".format(value))
+
+
+def input_files(config, kwargs):
+    """Returns the sorted paths of every file that goes into the artifacts.
+
+    Args::
+
+        config: the Config being built
+        kwargs: the config's _resolved_kwargs
+    """
+
+    tree = config._project_tree
+    manifest = native.build_manifest(kwargs, tree)
+    sources = [source for source, _, _ in native.wheel_files(kwargs,
+                                                             manifest, tree)]
+    return native.sdist_files(kwargs, manifest, [config._long_path], sources,
+                              tree)
+
+
+def input_fingerprint(config):
+    """Returns the hex digest of everything a build of the config uses.
+
+    Args::
+
+        config: the Config being built
+
+    Returns:
+        the fingerprint, or None if the inputs aren't known to pypackage
+    """
+
+    kwargs = config._resolved_kwargs
+    if native.fallback_reason(kwargs):
+        return None  # setuptools or a cmdclass might read anything
+
+    try:
+        settings = json.dumps(
+            [dist_version(), native.python_tag(), config._as_kwargs],
+            sort_keys=True,
+            default=_plain,
+        )
+    except TypeError as error:
+        logging.info("Not fingerprinting the build: %s", error)
+        return None
+
+    cache = config._guess_cache
+    digest = hashlib.sha256()
+    digest.update(settings.encode("utf-8"))
+
+    for path in input_files(config, kwargs):
+        stat = os.stat(path)
+        digest.update(json.dumps([
+            path.replace(os.sep, "/"),
+            cache.file_digest(path, stat) if cache else content_digest(path),
+        ]).encode("utf-8"))
+
+    if cache:
+        cache.save()
+    return digest.hexdigest()
+
+
+def artifact_key(inputs, command):
+    """Returns the key of the artifact command builds from inputs.
+
+    Args::
+
+        inputs: the input_fingerprint of the config
+        command: the setuptools command which makes the artifact
+    """
+
+    return _digest(inputs, command)
+
+
+class BuildRecord(object):
+    """The fingerprint of a build and the artifacts it made.
+
+    Args::
+
+        config: the Config being built
+        commands: the setuptools commands being run
+        dist_dir: the directory the artifacts are written to
+    """
+
+    def __init__(self, config, commands, dist_dir="dist"):
+        self.path = os.path.join(dist_dir, FINGERPRINT_NAME)
+        self.dist_dir = dist_dir
+        self.inputs = None
+        self.fingerprint = None
+        self.commands = []
+        self.artifacts = OrderedDict()  # command: file name, once known
+        self._kwargs = None
+        if commands and all(command in BUILD_COMMANDS for command in
+                            commands):
+            kwargs = config._resolved_kwargs
+            if not native.fallback_reason(kwargs):
+                self.commands = [command for command in ARTIFACT_COMMANDS if
+                                 command in commands]
+                self._kwargs = kwargs
+        if self.commands:
+            self.inputs = input_fingerprint(config)
+        if self.inputs:
+            self.fingerprint = _digest(self.inputs, list(commands))
+
+    def keys(self):
+        """Returns an OrderedDict of the artifact_key of each artifact."""
+
+        return OrderedDict(
+            (command, artifact_key(self.inputs, command)) for command in
+            self.commands
+        )
+
+    def find_built(self):
+        """Finds the newest artifact of each command in the dist directory.
+
+        Returns:
+            the artifacts OrderedDict of command: file name, filled in
+        """
+
+        newest = {}
+        try:
+            names = os.listdir(self.dist_dir)
+        except OSError:
+            names = []
+        for name in names:
+            command = _artifact_command(name, self._kwargs)
+            if command not in self.commands:
+                continue
+            try:
+                mtime = os.stat(os.path.join(self.dist_dir, name)).st_mtime
+            except OSError:
+                continue
+            if command not in newest or mtime > newest[command][0]:
+                newest[command] = (mtime, name)
+
+        self.artifacts = OrderedDict(
+            (command, newest[command][1]) for command in self.commands if
+            command in newest
+        )
+        return self.artifacts
+
+    def _load(self):
+        """Returns the previous build's record, or an empty dict."""
+
+        try:
+            with open(self.path, "rb") as openrecord:
+                return json.loads(openrecord.read().decode("utf-8"))
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def up_to_date(self):
+        """Returns a boolean of if the artifacts match the fingerprint."""
+
+        if not self.fingerprint:
+            return False
+
+        previous = self._load()
+        if previous.get("fingerprint") != self.fingerprint:
+            return False
+
+        recorded = previous.get("artifacts", {})
+        artifacts = OrderedDict()
+        for command in self.commands:
+            entry = recorded.get(command)
+            if not isinstance(entry, list) or len(entry) != 5:
+                return False
+            name, identity, digest = entry[0], entry[1:4], entry[4]
+            path = os.path.join(self.dist_dir, name)
+            try:
+                current = file_identity(os.stat(path))
+            except OSError:
+                return False
+            if current != identity and content_digest(path) != digest:
+                return False
+            artifacts[command] = name
+
+        self.artifacts = artifacts
+        return True
+
+    def save(self):
+        """Records the fingerprint with the artifacts which were built."""
+
+        if not self.fingerprint:
+            return
+
+        built = self.find_built()
+        artifacts = {}
+        for command in self.commands:
+            if command not in built:
+                logging.info("Not recording the build, no %s in %s",
+                             command, self.dist_dir)
+                return
+            path = os.path.join(self.dist_dir, built[command])
+            try:
+                artifacts[command] = [built[command]] + file_identity(
+                    os.stat(path)
+                ) + [content_digest(path)]
+            except (IOError, OSError):
+                logging.info("Not recording the build, %s is missing", path)
+                return
+
+        write_atomically(self.path, json.dumps({
+            "fingerprint": self.fingerprint,
+            "artifacts": artifacts,
+        }, indent=4, sort_keys=True).encode("utf-8"))
@@ -0,0 +1,658 @@
+"""Reads what pypackage needs out of a git repository, without running git.
+
+Only the on disk formats are used, so this works without git installed and
+costs a few reads rather than a subprocess per question.
+"""
+
+
+import io
+import os
+import json
+import mmap
+import zlib
+import heapq
+import hashlib
+import struct
+import binascii
+from collections import OrderedDict
+
+
+# file modes in the index which are not regular files or symlinks
+_GITLINK_MODE = 0o160000
+_DIRECTORY_MODE = 0o040000
+
+_HEADER = struct.Struct(">4sII")
+# ctime, mtime (seconds & nanoseconds), dev, ino, mode, uid, gid, size
+_ENTRY_STATS = struct.Struct(">10I")
+_SHA_SIZE = 20
+_EXTENDED_FLAG = 0x4000
+_NAME_MASK = 0x0fff
+
+
+def git_dir(root=os.curdir):
+    """Returns the path to the git directory of root, or None.
+
+    Follows the ``gitdir:`` file used by worktrees and submodules.
+    """
+
+    dot_git = os.path.join(root, ".git")
+    if os.path.isdir(dot_git):
+        return dot_git
+
+    try:
+        with io.open(dot_git, "r", encoding="utf-8") as opengit:
+            content = opengit.read().strip()
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+
+    if content.startswith("gitdir:"):
+        path = content[len("gitdir:"):].strip()
+        return os.path.normpath(os.path.join(root, path))
+
+
+def _varint(data, offset):
+    """Decodes one of git's offset varints, returns (value, new offset)."""
+
+    byte = bytearray(data[offset:offset + 1])[0]
+    offset += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = bytearray(data[offset:offset + 1])[0]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, offset
+
+
+def read_index(index_path):
+    """Reads the paths of the tracked files out of a git index file.
+
+    Supports index versions 2, 3 and 4. Conflicted paths are listed once,
+    submodules and sparse directory entries are left out.
+
+    Args::
+
+        index_path: path to the index file
+
+    Returns:
+        list of slash separated paths relative to the repository root
+
+    Raises:
+        ValueError if the file is not a git index
+    """
+
+    with open(index_path, "rb") as openindex:
+        data = openindex.read()
+
+    if len(data) < _HEADER.size:
+        raise ValueError("{} is not a git index".format(index_path))
+
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise ValueError("{} is not a git index".format(index_path))
+
+    paths = []
+    previous = b""
+    offset = _HEADER.size
+    for _ in range(count):
+        start = offset
+        mode = _ENTRY_STATS.unpack_from(data, offset)[6]
+        offset += _ENTRY_STATS.size + _SHA_SIZE
+        flags = struct.unpack_from(">H", data, offset)[0]
+        offset += 2
+        if version >= 3 and flags & _EXTENDED_FLAG:
+            offset += 2
+
+        if version == 4:  # prefix compressed against the previous path
+            strip, offset = _varint(data, offset)
+            end = data.index(b"\0", offset)
+            path = previous[:len(previous) - strip] + data[offset:end]
+            offset = end + 1
+        else:
+            name_length = flags & _NAME_MASK
+            if name_length < _NAME_MASK:
+                end = offset + name_length
+            else:  # too long for the flags, it's NUL terminated
+                end = data.index(b"\0", offset)
+            path = data[offset:end]
+            # entries are padded with 1-8 NULs to a multiple of 8 bytes
+            offset = start + ((end - start) // 8 + 1) * 8
+
+        previous = path
+        if mode in (_GITLINK_MODE, _DIRECTORY_MODE):
+            continue
+        if not paths or paths[-1] != path:  # conflicts have several stages
+            paths.append(path)
+
+    if bytes is str:  # pragma: no cover
+        return paths
+    return [path.decode("utf-8", "surrogateescape") for path in paths]
+
+
+def index_path(root=os.curdir):
+    """Returns the path to root's git index file, or None."""
+
+    directory = git_dir(root)
+    if directory is not None:
+        return os.path.join(directory, "index")
+
+
+def tracked_files(root=os.curdir):
+    """Returns the files tracked by git in root, or None if there's no index.
+
+    Args::
+
+        root: directory at the top of the git work tree
+
+    Returns:
+        list of file paths joined onto root, in the index's (sorted) order
+    """
+
+    index = index_path(root)
+    if index is None:
+        return None
+
+    try:
+        paths = read_index(index)
+    except (IOError, OSError, ValueError, struct.error):
+        return None
+
+    return [os.path.join(root, *path.split("/")) for path in paths]
+
+
+# object types, as numbered in pack files
+_OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+_OFS_DELTA = 6
+_REF_DELTA = 7
+_READ_CHUNK = 65536
+
+
+def _pack_varint(data, offset):
+    """Decodes a little endian base 128 varint, returns (value, offset)."""
+
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+
+def _apply_delta(base, delta):
+    """Rebuilds an object from its base and a pack delta."""
+
+    delta = bytearray(delta)
+    _, offset = _pack_varint(delta, 0)  # size of the base
+    size, offset = _pack_varint(delta, offset)
+    result = bytearray()
+    while offset < len(delta):
+        opcode = delta[offset]
+        offset += 1
+        if opcode & 0x80:  # copy a slice of the base
+            copy_offset = copy_size = 0
+            for bit in range(4):
+                if opcode & (1 << bit):
+                    copy_offset |= delta[offset] << (bit * 8)
+                    offset += 1
+            for bit in range(3):
+                if opcode & (1 << (bit + 4)):
+                    copy_size |= delta[offset] << (bit * 8)
+                    offset += 1
+            copy_size = copy_size or 0x10000
+            result += base[copy_offset:copy_offset + copy_size]
+        elif opcode:  # insert the next opcode bytes
+            result += delta[offset:offset + opcode]
+            offset += opcode
+        else:
+            raise ValueError("invalid delta opcode")
+
+    if len(result) != size:
+        raise ValueError("delta produced the wrong size")
+    return bytes(result)
+
+
+class _Pack(object):
+    """A pack file and its version 2 index, read on demand."""
+
+    def __init__(self, idx_path):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[:-len(".idx")] + ".pack"
+        with open(idx_path, "rb") as openidx:
+            self._idx = openidx.read()
+        if self._idx[:8] != b"\377tOc\0\0\0\2":
+            raise ValueError("{} is not a v2 pack index".format(idx_path))
+        self._fanout = struct.unpack_from(">256I", self._idx, 8)
+        self._count = self._fanout[-1]
+        self._data = None
+
+    def offset(self, sha):
+        """Returns the offset of the binary sha in the pack, or None."""
+
+        first = bytearray(sha[:1])[0]
+        low = self._fanout[first - 1] if first else 0
+        high = self._fanout[first]
+        shas = 8 + 256 * 4
+        while low < high:
+            middle = (low + high) // 2
+            start = shas + middle * 20
+            found = self._idx[start:start + 20]
+            if found < sha:
+                low = middle + 1
+            elif found > sha:
+                high = middle
+            else:
+                offsets = shas + self._count * 24
+                offset = struct.unpack_from(
+                    ">I", self._idx, offsets + middle * 4
+                )[0]
+                if offset & 0x80000000:  # in the large offset table
+                    large = offsets + self._count * 4
+                    offset = struct.unpack_from(
+                        ">Q", self._idx, large + (offset & 0x7fffffff) * 8,
+                    )[0]
+                return offset
+
+    def _inflate(self, offset):
+        """Decompresses the zlib stream starting at offset."""
+
+        decompressor = zlib.decompressobj()
+        result = []
+        while not decompressor.unused_data:
+            chunk = self._data[offset:offset + _READ_CHUNK]
+            if not chunk:
+                break
+            result.append(decompressor.decompress(chunk))
+            offset += _READ_CHUNK
+            if getattr(decompressor, "eof", False):
+                break
+        result.append(decompressor.flush())
+        return b"".join(result)
+
+    def read(self, offset, repository):
+        """Returns (type name, content) of the object at offset."""
+
+        if self._data is None:
+            with open(self.pack_path, "rb") as openpack:
+                self._data = mmap.mmap(
+                    openpack.fileno(), 0, access=mmap.ACCESS_READ,
+                )
+
+        header = bytearray(self._data[offset:offset + 32])
+        byte = header[0]
+        kind = (byte >> 4) & 7
+        position = 1
+        while byte & 0x80:  # the size, which the zlib stream tells us anyway
+            byte = header[position]
+            position += 1
+
+        if kind == _OFS_DELTA:
+            byte = header[position]
+            position += 1
+            base_offset = byte & 0x7f
+            while byte & 0x80:
+                byte = header[position]
+                position += 1
+                base_offset = ((base_offset + 1) << 7) | (byte & 0x7f)
+            base_type, base = self.read(offset - base_offset, repository)
+            delta = self._inflate(offset + position)
+            return base_type, _apply_delta(base, delta)
+        elif kind == _REF_DELTA:
+            base_sha = self._data[offset + position:offset + position + 20]
+            base_type, base = repository.read_object(base_sha)
+            delta = self._inflate(offset + position + 20)
+            return base_type, _apply_delta(base, delta)
+        elif kind in _OBJECT_TYPES:
+            return _OBJECT_TYPES[kind], self._inflate(offset + position)
+
+        raise ValueError("unknown pack object type {}".format(kind))
+
+
+def _timestamp(line):
+    """Returns the unix time from an author, committer or tagger line."""
+
+    try:
+        return int(line.rsplit(b" ", 2)[-2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _headers(content):
+    """Returns a list of (key, value) header lines of a commit or tag."""
+
+    headers = []
+    for line in content.split(b"\n"):
+        if not line:
+            break
+        key, _, value = line.partition(b" ")
+        headers.append((key, value))
+    return headers
+
+
+class Repository(object):
+    """Reads refs and objects out of a git directory.
+
+    Args::
+
+        directory: path to the git directory, usually ./.git
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._packs = None
+        self._commits = {}  # hex sha: (parent hex shas, commit time)
+
+    def _packed_refs(self):
+        """Returns {ref name: (hex sha, peeled hex sha or None)}."""
+
+        refs = OrderedDict()
+        try:
+            with open(os.path.join(self.directory, "packed-refs"), "rb") as \
+                    openrefs:
+                lines = openrefs.read().decode("utf-8").splitlines()
+        except (IOError, OSError, UnicodeDecodeError):
+            return refs
+
+        last = None
+        for line in lines:
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("^") and last is not None:
+                refs[last] = (refs[last][0], line[1:].strip())
+                continue
+            sha, _, name = line.partition(" ")
+            refs[name.strip()] = (sha, None)
+            last = name.strip()
+        return refs
+
+    def refs(self, prefix="refs/"):
+        """Returns {ref name: hex sha} for loose and packed refs in prefix."""
+
+        refs = OrderedDict(
+            (name, sha) for name, (sha, _) in self._packed_refs().items()
+            if name.startswith(prefix)
+        )
+
+        top = os.path.join(self.directory, *prefix.rstrip("/").split("/"))
+        for root, _, files in os.walk(top):
+            for file_ in files:
+                path = os.path.join(root, file_)
+                name = os.path.relpath(path, self.directory).replace(
+                    os.path.sep, "/"
+                )
+                try:
+                    with open(path, "rb") as openref:
+                        sha = openref.read().decode("utf-8").strip()
+                except (IOError, OSError, UnicodeDecodeError):
+                    continue
+                if sha:  # loose refs take precedence over packed ones
+                    refs[name] = sha
+        return refs
+
+    def resolve(self, ref):
+        """Returns the hex sha that ref points to, following symbolic refs.
+
+        Returns:
+            hex sha string, or None if ref cannot be resolved
+        """
+
+        for _ in range(10):  # symbolic refs can't nest deeper than this
+            if len(ref) == 40 and all(c in "0123456789abcdef" for c in ref):
+                return ref
+            try:
+                with open(os.path.join(self.directory, *ref.split("/")),
+                          "rb") as openref:
+                    value = openref.read().decode("utf-8").strip()
+            except (IOError, OSError, UnicodeDecodeError):
+                value = self._packed_refs().get(ref, (None, None))[0]
+            if not value:
+                return None
+            ref = value[len("ref:"):].strip() if \
+                value.startswith("ref:") else value
+
+    def head(self):
+        """Returns the hex sha of HEAD, or None."""
+
+        return self.resolve("HEAD")
+
+    def read_object(self, sha):
+        """Returns (type name, content) for an object's binary or hex sha.
+
+        Raises:
+            KeyError if the object is not in the repository
+        """
+
+        if len(sha) == 40:
+            hex_sha, sha = sha, binascii.unhexlify(sha)
+        else:
+            hex_sha = binascii.hexlify(sha).decode("ascii")
+
+        loose = os.path.join(self.directory, "objects", hex_sha[:2],
+                             hex_sha[2:])
+        try:
+            with open(loose, "rb") as openobject:
+                raw = zlib.decompress(openobject.read())
+        except (IOError, OSError):
+            pass
+        else:
+            header, _, content = raw.partition(b"\0")
+            return header.split(b" ")[0].decode("ascii"), content
+
+        for pack in self._all_packs():
+            offset = pack.offset(sha)
+            if offset is not None:
+                return pack.read(offset, self)
+
+        raise KeyError(hex_sha)
+
+    def _all_packs(self):
+        """Returns the list of _Pack objects in the repository."""
+
+        if self._packs is None:
+            self._packs = []
+            pack_dir = os.path.join(self.directory, "objects", "pack")
+            try:
+                names = sorted(os.listdir(pack_dir))
+            except OSError:
+                names = []
+            for name in names:
+                if name.endswith(".idx"):
+                    try:
+                        self._packs.append(_Pack(os.path.join(pack_dir, name)))
+                    except (IOError, OSError, ValueError):
+                        continue
+        return self._packs
+
+    def commit(self, sha):
+        """Returns (parent hex shas, commit time) of the commit at sha."""
+
+        if sha not in self._commits:
+            kind, content = self.read_object(sha)
+            if kind != "commit":
+                raise ValueError("{} is a {}, not a commit".format(sha, kind))
+            parents = []
+            committed = 0
+            for key, value in _headers(content):
+                if key == b"parent":
+                    parents.append(value.decode("ascii"))
+                elif key == b"committer":
+                    committed = _timestamp(value)
+            self._commits[sha] = (parents, committed)
+        return self._commits[sha]
+
+    def peel(self, sha):
+        """Follows annotated tags down to what they point at.
+
+        Returns:
+            tuple of (hex sha of the commit, tag or commit time)
+        """
+
+        tagged = None
+        for _ in range(10):
+            kind, content = self.read_object(sha)
+            if kind != "tag":
+                break
+            for key, value in _headers(content):
+                if key == b"object":
+                    sha = value.decode("ascii")
+                elif key == b"tagger" and tagged is None:
+                    tagged = _timestamp(value)
+
+        if tagged is None:
+            tagged = self.commit(sha)[1]
+        return sha, tagged
+
+    def tags(self):
+        """Returns {tag name: (commit hex sha, tag time)} of resolvable tags.
+
+        Tags whose objects cannot be read are left out.
+        """
+
+        tags = {}
+        for name, sha in self.refs("refs/tags/").items():
+            try:
+                tags[name[len("refs/tags/"):]] = self.peel(sha)
+            except (KeyError, ValueError, zlib.error, struct.error):
+                continue
+        return tags
+
+    def describe(self, tags=None):
+        """Finds the nearest tag reachable from HEAD, like git describe --tags.
+
+        Commits are walked newest first from HEAD, the first tagged commit
+        found is used, ties on a commit go to the newest tag.
+
+        Args::
+
+            tags: the result of tags(), to not resolve them again
+
+        Returns:
+            tuple of (tag name, commits since the tag, HEAD hex sha), or None
+        """
+
+        head = self.head()
+        tags = self.tags() if tags is None else tags
+        if head is None or not tags:
+            return None
+
+        by_commit = {}
+        for name, (sha, tagged) in tags.items():
+            if sha not in by_commit or tagged > by_commit[sha][1]:
+                by_commit[sha] = (name, tagged)
+
+        try:
+            found = self._newest_first(head, by_commit)
+            if found is None:
+                return None
+            return found, self._distance(head, tags[found][0]), head
+        except (KeyError, ValueError, zlib.error, struct.error):
+            return None
+
+    def _newest_first(self, head, by_commit):
+        """Returns the name of the first tag found walking back from head."""
+
+        queue = [(-self.commit(head)[1], head)]
+        seen = set([head])
+        while queue:
+            _, sha = heapq.heappop(queue)
+            if sha in by_commit:
+                return by_commit[sha][0]
+            for parent in self.commit(sha)[0]:
+                if parent not in seen:
+                    seen.add(parent)
+                    heapq.heappush(queue, (-self.commit(parent)[1], parent))
+
+    def _distance(self, head, tagged):
+        """Counts the commits reachable from head but not from tagged."""
+
+        from_head, from_tag = 1, 2
+        flags = {head: from_head}
+        flags[tagged] = flags.get(tagged, 0) | from_tag
+        queue = [(-self.commit(sha)[1], sha) for sha in set([head, tagged])]
+        heapq.heapify(queue)
+
+        count = 0
+        walked = set()
+        # stop once everything left to walk is reachable from the tag
+        while any(flags[sha] == from_head for _, sha in queue):
+            _, sha = heapq.heappop(queue)
+            flag = flags[sha]
+            if (sha, flag) in walked:
+                continue
+            walked.add((sha, flag))
+            if flag == from_head:
+                count += 1
+            for parent in self.commit(sha)[0]:
+                if flags.get(parent, 0) | flag != flags.get(parent):
+                    flags[parent] = flags.get(parent, 0) | flag
+                    heapq.heappush(queue, (-self.commit(parent)[1], parent))
+        return count
+
+
+def _tags_by_file_time(directory):
+    """The names of loose tags, oldest ref file first, for unreadable repos."""
+
+    tags_dir = os.path.join(directory, "refs", "tags")
+    try:
+        names = os.listdir(tags_dir)
+    except OSError:
+        return []
+    return sorted(names, key=lambda name: (
+        os.stat(os.path.join(tags_dir, name)).st_ctime, name,
+    ))
+
+
+def latest_tag(root=os.curdir, cache=None, dev=False):
+    """Returns the latest tag of the git repo at root, or None.
+
+    The latest tag is the nearest one reachable from HEAD, or failing that,
+    the most recently created one. The answer is cached against HEAD and the
+    state of the tags.
+
+    Args::
+
+        root: directory at the top of the git work tree
+        cache: GuessCache to keep the answer in, or None
+        dev: boolean to return a describe style version for commits after
+             the tag, like 1.2.dev3+g1a2b3c4 for 3 commits after the tag 1.2
+
+    Returns:
+        string tag or version, or None
+    """
+
+    directory = git_dir(root)
+    if directory is None:
+        return None
+
+    repository = Repository(directory)
+    if cache:
+        identity = json.dumps([
+            repository.head(),
+            dev,
+            sorted(repository.refs("refs/tags/").items()),
+        ])
+        return cache.listing(
+            "git_tag",
+            hashlib.sha1(identity.encode("utf-8")).hexdigest(),
+            lambda: _latest_tag(repository, dev),
+        )
+
+    return _latest_tag(repository, dev)
+
+
+def _latest_tag(repository, dev):
+    """Works out the latest tag for latest_tag, without caching."""
+
+    tags = repository.tags()
+    described = repository.describe(tags)
+    if described is not None:
+        name, distance, head = described
+        if dev and distance:
+            return "{}.dev{}+g{}".format(name, distance, head[:7])
+        return name
+
+    if tags:
+        return max(tags, key=lambda name: (tags[name][1], name))
+
+    by_file_time = _tags_by_file_time(repository.directory)
+    return by_file_time[-1] if by_file_time else None
@@ -6,25 +6,38 @@ from __future__ import unicode_literals
 
 import os
 import re
+import mmap
+import time
 import codecs
 from collections import namedtuple
 from collections import OrderedDict
 
+from . import git
+from .tree import TreeSnapshot
+from .cache import newest_mtime
+from .cache import tree_identity
+from .ignore import IgnoreMatcher
+from .manifest import expand_paths
+from .manifest import compact_paths
 from .constants import INPUT
 
 
-def python_modules():
+def python_modules(tree=None):
     """Determine if there are python modules in the cwd.
 
+    Args:
+        tree: TreeSnapshot of the cwd, or None to scan it
+
     Returns:
         list of python modules as strings
     """
 
     ignored = ["setup.py", "conftest.py"]
+    tree = tree or TreeSnapshot()
 
     py_modules = []
-    for file_ in os.listdir(os.path.abspath(os.curdir)):
-        if file_ in ignored or not os.path.isfile(file_):
+    for file_ in tree.files():
+        if file_ in ignored:
             continue
 
         file_name, file_ext = os.path.splitext(file_)
@@ -34,27 +47,38 @@ def python_modules():
     return sorted(py_modules)
 
 
-def potential_data_files(scripts):
+def potential_data_files(scripts, tree=None, cache=None, ignore=None):
     """Determine if there are any potential data files down from cwd.
 
     Tries to ignore normal things that would pop up you'd like not to include.
 
-    Args:
+    Args::
+
         scripts: list of known script exectuables
+        tree: TreeSnapshot of the cwd, or None to scan it
+        cache: GuessCache to reuse the listing from an unchanged tree, or None
+        ignore: IgnoreMatcher of what not to include, or None for the default
 
     Returns:
         list of files as relative paths down from cwd
     """
 
-    potential_files = []
+    tree = tree or TreeSnapshot()
+    ignore = ignore or IgnoreMatcher(tree.root)
+    if cache:
+        return cache.listing(
+            "package_data",
+            tree_identity(tree, scripts, ignore.identity),
+            lambda: potential_data_files(scripts, tree, ignore=ignore),
+            newest_mtime(tree),
+        )
 
-    for root, directories, files in os.walk(os.curdir):
-        if _ignored(root, is_file=False):
-            continue
+    potential_files = []
 
+    for root, directories, files in tree.walk(skip_dir=ignore.ignored_dir):
         for file_ in files:
-            if not _ignored(file_):
-                relative_path = os.path.join(root, file_)
+            relative_path = os.path.join(root, file_)
+            if not ignore.ignored_file(relative_path):
                 while relative_path[0] in (os.curdir, os.path.sep):
                     relative_path = relative_path[1:]
                 if relative_path not in scripts:
@@ -63,34 +87,315 @@ def potential_data_files(scripts):
     return potential_files
 
 
-def latest_git_tag():
-    """Returns the latest tag from git, if .git exists."""
+def latest_git_tag(cache=None, dev=False):
+    """Returns the latest tag from git, if .git exists.
+
+    Args::
+
+        cache: GuessCache to keep the answer in against HEAD, or None
+        dev: boolean to return a describe style dev version when there are
+             commits after the tag
+    """
+
+    return git.latest_tag(cache=cache, dev=dev)
+
+
+# any of the attribute names assigned to a string literal, wrapped in zero to
+# two underscores. it's a lookahead so that an unclosed quote can't consume
+# the following lines, every line start is tried, same as separate searches
+_ASSIGNMENT = re.compile((
+    br'^(?=(_{0,2})'
+    br'(version|author_email|author|email|maintainer_email|maintainer)'
+    br'\1 *= *[\'"]([^\'"]*)[\'"])'
+), re.M)
+
+
+def match_assignments(content):
+    """Finds the attribute assignments in content in a single scan.
+
+    Args:
+        content: bytes content of a file
+
+    Returns:
+        dict of {(name, underscores): (position, bytes value)} holding the
+        first assignment of each name at each underscore depth
+    """
+
+    found = {}
+    for re_match in _ASSIGNMENT.finditer(content):
+        underscores, name, value = re_match.groups()
+        key = (codecs.decode(name, "ascii"), len(underscores))
+        if key not in found:
+            found[key] = (re_match.start(), value)
+    return found
+
+
+# files with these extensions never hold a version or author assignment
+_SKIPPED_EXTENSIONS = frozenset([
+    ".7z", ".a", ".bmp", ".bz2", ".class", ".db", ".dll", ".dylib", ".egg",
+    ".exe", ".gif", ".gz", ".h5", ".hdf5", ".ico", ".jar", ".jpeg", ".jpg",
+    ".json", ".lib", ".mo", ".mp3", ".mp4", ".npy", ".npz", ".o", ".ogg",
+    ".otf", ".parquet", ".pdf", ".pickle", ".pkl", ".png", ".pyc", ".pyd",
+    ".pyo", ".so", ".sqlite", ".sqlite3", ".svgz", ".tar", ".tgz", ".tif",
+    ".tiff", ".ttf", ".wav", ".webp", ".whl", ".woff", ".woff2", ".xz",
+    ".zip",
+])
+
+# leading bytes of binary formats which can otherwise look like text
+_BINARY_MAGIC = (b"\x89PNG", b"PK\x03\x04", b"\x1f\x8b", b"%PDF", b"GIF8")
+
+# bytes sniffed from the start of each file to tell if it's binary
+SNIFF_SIZE = 4096
+
+# files larger than this are not considered, unless configured otherwise
+DEFAULT_MAX_SIZE = 102400
+
+
+def _skipped_by_name(file_name):
+    """Return a boolean of if the file can be skipped without reading it."""
+
+    return os.path.splitext(file_name)[1].lower() in _SKIPPED_EXTENSIONS
+
 
-    def git_tag_refs(file_=""):
-        return os.path.join(".git", "refs", "tags", file_)
+def _is_binary(head):
+    """Return a boolean of if the first block of a file looks binary."""
 
+    return b"\0" in head or head.startswith(_BINARY_MAGIC)
+
+
+def _is_utf8(content):
+    """Return a boolean of if content decodes as utf-8, checked in blocks."""
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
     try:
-        git_tags = os.listdir(git_tag_refs())
-    except OSError:
-        return None
+        for start in range(0, len(content), 65536):
+            decoder.decode(content[start:start + 65536])
+        decoder.decode(b"", True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _read_file(file_path):
+    """Returns the bytes content of file_path, or nothing if it's binary."""
+
+    with open(file_path, "rb") as openfile:
+        head = openfile.read(SNIFF_SIZE)
+        if _is_binary(head):
+            return b""
+        return head + openfile.read()
+
+
+def assignments_in(content):
+    """Finds the attribute assignments in a file's content.
+
+    Args:
+        content: bytes (or a buffer of) the content of a file
+
+    Returns:
+        list of [name, underscores, value] for the first assignment of each
+        name at each underscore depth, empty if the content isn't utf-8
+    """
+
+    found = match_assignments(content)
+    if not found or not _is_utf8(content):
+        return []
+
+    return [[name, i, codecs.decode(value, "utf-8")] for
+            (name, i), (_, value) in sorted(found.items())]
+
+
+def file_assignments(file_path):
+    """Reads file_path and finds the attribute assignments in it.
+
+    Only the first block is read from binary files. Larger text files are
+    mapped into memory rather than copied into a string to be matched.
+    """
+
+    with open(file_path, "rb") as openfile:
+        head = openfile.read(SNIFF_SIZE)
+        if _is_binary(head):
+            return []
+        elif len(head) < SNIFF_SIZE:
+            return assignments_in(head)
+
+        content = mmap.mmap(openfile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return assignments_in(content)
+        finally:
+            content.close()
+
+
+class ScanPools(object):
+    """The thread and process pools scan_files uses, started when needed.
+
+    Args::
+
+        workers: number of threads, and processes, in each pool
+        processes: boolean to also start a process pool to match content in
+    """
+
+    def __init__(self, workers=1, processes=False):
+        self.workers = workers
+        self.processes = processes
+        self._threads = None
+        self._processes = None
+
+    @property
+    def threads(self):
+        """The ThreadPool to read files with."""
+
+        if self._threads is None:
+            from multiprocessing.pool import ThreadPool
+            self._threads = ThreadPool(self.workers)
+        return self._threads
 
-    latest_tag = {0: None}
-    for tag in git_tags:
-        latest_tag[os.stat(git_tag_refs(tag)).st_ctime] = tag
+    @property
+    def process_pool(self):
+        """The multiprocessing Pool to match file contents in."""
 
-    return latest_tag[max(latest_tag)]
+        if self._processes is None:
+            import multiprocessing
+            self._processes = multiprocessing.Pool(self.workers)
+        return self._processes
 
+    def close(self):
+        """Stops any of the pools which were started."""
 
-def find_in_files():
+        for pool in (self._processes, self._threads):
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        self._threads = self._processes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def scan_files(file_paths, workers=1, processes=False, pools=None):
+    """Finds the attribute assignments in file_paths, maybe in parallel.
+
+    Args::
+
+        file_paths: list of file paths to scan
+        workers: number of threads to read files with, 1 to read serially
+        processes: boolean to also match the content in a process pool
+        pools: ScanPools to reuse between calls, or None to start new ones
+
+    Returns:
+        list of file_assignments results, in the same order as file_paths
+    """
+
+    if workers < 2 or len(file_paths) < 2:
+        return [file_assignments(file_path) for file_path in file_paths]
+
+    if pools is None:
+        with ScanPools(workers, processes) as pools:
+            return scan_files(file_paths, workers, processes, pools)
+
+    chunksize = max(1, len(file_paths) // (workers * 4))
+    if not processes:
+        return pools.threads.map(file_assignments, file_paths, chunksize)
+
+    return list(pools.process_pool.imap(
+        assignments_in,
+        pools.threads.imap(_read_file, file_paths, chunksize),
+        chunksize,
+    ))
+
+
+# additional to the pattern weights, files named this are preferred
+FILE_WEIGHTS = {
+    "__init__.py": 100,
+    "__version__.py": 125,
+    "version.py": 75,
+}
+
+# keys which find_in_files can guess at
+FOUND_IN_FILES = (
+    "version",
+    "author",
+    "author_email",
+    "maintainer",
+    "maintainer_email",
+)
+
+
+def _candidate_tiers(tree, candidates):
+    """Splits candidate files into tiers, most likely to hold the answer first.
+
+    The first tier holds the weighted files in top-level packages (and the
+    project root), the second holds everything else.
+    """
+
+    first, second = [], []
+    for candidate in candidates:
+        file_, file_path = candidate[1:3]
+        root = os.path.dirname(file_path)
+        top_level = os.path.dirname(root) == tree.root and \
+            tree.isfile(os.path.join(root, "__init__.py"))
+        if file_ in FILE_WEIGHTS and (root == tree.root or top_level):
+            first.append(candidate)
+        else:
+            second.append(candidate)
+
+    return [tier for tier in (first, second) if tier]
+
+
+def _unbeatable(guess, remaining):
+    """Return a boolean of if no remaining candidate could beat the guess.
+
+    A remaining file could at best match with two underscores, and ties are
+    won by whichever comes first while walking the tree.
+    """
+
+    for candidate in remaining:
+        best_case = 75 + FILE_WEIGHTS.get(candidate[1], 0)
+        if best_case > guess.weight or \
+                (best_case == guess.weight and candidate[0] < guess.order):
+            return False
+    return True
+
+
+def find_in_files(tree=None, cache=None, workers=1, processes=False,
+                  max_size=DEFAULT_MAX_SIZE, keys=None, budget=None,
+                  ignore=None, git_dev_version=False):
     """Look through most files to try to determine the version and author.
 
+    Files are scanned in tiers, stopping early once every key has a guess no
+    later tier could improve on. The result does not depend on the tiers, it
+    is the same as scanning every file.
+
+    Args::
+
+        tree: TreeSnapshot of the cwd, or None to scan it
+        cache: GuessCache to skip reading unchanged files, or None
+        workers: number of threads to scan files with
+        processes: boolean to match file contents in a process pool
+        max_size: files larger than this many bytes are ignored, 0 for any
+        keys: the keys to guess at, defaults to all of them (FOUND_IN_FILES)
+        budget: milliseconds to spend scanning, after which the best guesses
+                found so far are returned, or None for no limit
+        ignore: IgnoreMatcher of directories to skip, or None for the default
+        git_dev_version: boolean to guess describe style dev versions from
+                         git when HEAD is past the latest tag
+
     Returns:
         OrderedDict with the some/all of the following keys if found::
 
             version, author, author_email, maintainer, maintainer_email
     """
 
-    Guess = namedtuple("Guess", ("source", "weight", "guess"))
+    Guess = namedtuple("Guess", ("source", "weight", "guess", "order"))
+
+    keys = FOUND_IN_FILES if keys is None else keys
+    if not keys:
+        return OrderedDict()
+
+    deadline = time.time() + budget / 1000.0 if budget else None
 
     versions = []
     authors = []
@@ -98,9 +403,10 @@ def find_in_files():
     maintainers = []
     maintainer_emails = []
 
-    git_tag = latest_git_tag()
+    git_tag = latest_git_tag(cache, git_dev_version) if \
+        "version" in keys else None
     if git_tag:
-        versions.append(Guess("git tag", 99, git_tag))
+        versions.append(Guess("git tag", 99, git_tag, -1))
 
     to_find = OrderedDict([
         ("version", versions),
@@ -111,150 +417,176 @@ def find_in_files():
         ("maintainer_email", maintainer_emails),
     ])
 
-    file_weights = {  # additional to the pattern weights
-        "__init__.py": 100,
-        "__version__.py": 125,
-        "version.py": 75,
-    }
-
-    for root, directories, files in os.walk(os.curdir):
-
-        if _ignored(root, is_file=False):
-            continue
+    tree = tree or TreeSnapshot()
+    ignore = ignore or IgnoreMatcher(tree.root)
 
+    candidates = []  # [walk order, file name, file path, assignments or None]
+    for root, directories, files in tree.walk(skip_dir=ignore.ignored_dir):
         for file_ in files:
+            if _skipped_by_name(file_):
+                continue
+
             file_path = os.path.join(root, file_)
+            stat = tree.stat(file_path)
             # ignore large files, allows us to be faster with regex's/reading
-            if os.stat(file_path).st_size > 102400:
+            if max_size and stat.st_size > max_size:
                 continue
 
-            with open(file_path, "rb") as openfile:
-                try:
-                    content = codecs.decode(openfile.read(), "utf-8")
-                except UnicodeDecodeError:
-                    continue
-
-            for name, guesses in to_find.items():
-                for i in range(3):
-                    pattern = r'^{u}{name}{u} *= *[\'"]([^\'"]*)[\'"]'.format(
-                        u="_" * i,
-                        name=name,
-                    )
-
-                    re_match = re.search(pattern, content, re.M)
-                    if re_match:
-                        match_weight = 25 * (i + 1)  # more _ == more important
-                        if file_ in file_weights:
-                            match_weight += file_weights[file_]
-
-                        guess = re_match.group(1)
-                        try:
-                            # try to use an ascii string if possible
-                            guess = str(codecs.encode(guess, "ascii").decode())
-                        except UnicodeEncodeError:
-                            pass
-
-                        guesses.append(Guess(
-                            "{u_}{name}{u_} from file {fname}".format(
-                                u_="_" * i,
-                                name=name,
-                                fname=file_path,
-                            ),
-                            match_weight,
-                            guess,
-                        ))
-                        break
-
-    to_find.pop("email")  # duplicated to match either email or author_email
-    return OrderedDict((name, max(guesses, key=lambda x: x.weight).guess) for
-                       name, guesses in to_find.items() if guesses)
-
-
-def _ignored(file_or_dir, is_file=True, _recurse=False):
-    """Return a boolean of if this file or dir is ignored.
+            cached = cache.file_hits(file_path, stat) if cache else None
+            candidates.append([len(candidates), file_, file_path, cached])
 
-    Args::
+    tiers = _candidate_tiers(tree, candidates)
+    pools = ScanPools(workers, processes)  # started on the first scan
+    try:
+        for tier_index, tier in enumerate(tiers):
+            # read and match everything that wasn't cached, in batches so the
+            # time budget can be checked, results are kept in walk order
+            to_scan = [candidate for candidate in tier if candidate[3] is None]
+            batch_size = max(workers, 1) * 16 if deadline else len(to_scan)
+            for start in range(0, len(to_scan), batch_size or 1):
+                if deadline and time.time() > deadline:
+                    break
+                batch = to_scan[start:start + batch_size]
+                scanned = scan_files([c[2] for c in batch], workers,
+                                     processes, pools)
+                for candidate, found in zip(batch, scanned):
+                    candidate[3] = found
+                    if cache:
+                        cache.store_file_hits(
+                            candidate[2],
+                            tree.stat(candidate[2]),
+                            found,
+                        )
+
+            for order, file_, file_path, found in tier:
+                found = {(name, i): value for name, i, value in found or []}
+
+                for name, guesses in to_find.items():
+                    for i in range(3):
+                        if (name, i) in found:
+                            # more _ == more important
+                            match_weight = 25 * (i + 1)
+                            match_weight += FILE_WEIGHTS.get(file_, 0)
+
+                            guess = found[name, i]
+                            try:
+                                # try to use an ascii string if possible
+                                guess = str(codecs.encode(
+                                    guess, "ascii"
+                                ).decode())
+                            except UnicodeEncodeError:
+                                pass
+
+                            guesses.append(Guess(
+                                "{u_}{name}{u_} from file {fname}".format(
+                                    u_="_" * i,
+                                    name=name,
+                                    fname=file_path,
+                                ),
+                                match_weight,
+                                guess,
+                                order,
+                            ))
+                            break
+
+            if deadline and time.time() > deadline:
+                break
+
+            remaining = [c for later in tiers[tier_index + 1:] for c in later]
+            best = _best_guesses(to_find)
+            if all(key in best and _unbeatable(best[key], remaining) for
+                   key in keys):
+                break
+    finally:
+        pools.close()
+
+    return OrderedDict((name, guess.guess) for name, guess in
+                       _best_guesses(to_find).items() if name in keys)
+
+
+def _best_guesses(to_find):
+    """Picks the highest weighted guess for each key, first found on a tie."""
+
+    return OrderedDict(
+        (name, max(guesses, key=lambda x: (x.weight, -x.order))) for
+        name, guesses in to_find.items() if guesses and name != "email"
+    )
 
-        file_or_dir: string file or directory name
-        is_file: boolean of if this is a file
-    """
 
-    ignored_files = [
-        "MANIFEST.in",
-        "setup.cfg",
-        ".travis.yml",
-        ".coverage",
-        ".coveragerc",
-        ".gitignore",
-        "tox.ini",
-        "conftest.py",
-        "pypackage.meta",
-        ".DS_Store",
-    ]
-
-    ignored_file_patterns = [
-        r".*\.pyc$",
-        r".*\.py$",  # These will be found as part of a package
-    ]
-
-    ignored_dirs = [
-        "__pycache__",
-        "build",
-        "dist",
-        ".git",
-        ".svn",
-        ".eggs",
-        "EGG-INFO",
-    ]
-
-    ignored_dir_patterns = [
-        r"docs?",
-        r"examples?",
-        r".*\.egg$",
-        r".*\.egg-info$",
-        r"tests?",
-        r".?venv",
-    ]
-
-    if not is_file:
-        return any([_ignored(part, _recurse=True) for
-                    part in file_or_dir.split(os.path.sep)])
-
-    file_or_dir = os.path.basename(file_or_dir)
-    ignored = ignored_dirs if _recurse else ignored_files
-
-    if file_or_dir in ignored:
-        return True
-
-    patterns = ignored_dir_patterns if _recurse else ignored_file_patterns
-    for pattern in patterns:
-        if re.match(pattern, file_or_dir, re.I):
-            return True
-
-    return False
-
-
-def _guess_at_things(config):
+def _scan_workers(config, options=None):
+    """Returns the number of scanning threads from options or config."""
+
+    workers = getattr(options, "jobs", None)
+    if workers is None:
+        workers = getattr(config, "scan_workers", 1)
+
+    try:
+        return max(1, int(workers))
+    except ValueError:
+        raise SystemExit("Invalid number of jobs: {!r}".format(workers))
+
+
+def _guess_budget(config, options=None):
+    """Returns the guessing time budget in milliseconds, or None."""
+
+    budget = getattr(options, "guess_budget", None)
+    if budget is None:
+        budget = getattr(config, "guess_budget", None)
+
+    if budget is None:
+        return None
+
+    try:
+        return int(budget) or None
+    except ValueError:
+        raise SystemExit("Invalid guess budget: {!r}".format(budget))
+
+
+def _guess_at_things(config, options=None):
     """Guesses at attributes of this package's setup configuration.
 
+    Args::
+
+        config: config object to guess for
+        options: options object for cmd line flags, or None
+
     Returns:
         OrderedDict of {attribute: guess}
     """
 
+    tree = config._project_tree
+    cache = config._guess_cache
+    ignore = config._ignore_matcher
+
+    # only look for what's missing, or everything again if re-probing
+    re_probe = getattr(options, "re_probe", False)
+    wanted = [key for key in FOUND_IN_FILES if
+              re_probe or not hasattr(config, key)]
+
     guesses = OrderedDict(
         name=os.path.basename(os.path.realpath(os.path.curdir))
     )
-    guesses.update(find_in_files())
-
-    py_modules = python_modules()
+    guesses.update(find_in_files(
+        tree,
+        cache,
+        workers=_scan_workers(config, options),
+        processes=getattr(config, "scan_processes", False),
+        max_size=getattr(config, "scan_max_size", DEFAULT_MAX_SIZE),
+        keys=wanted,
+        budget=_guess_budget(config, options),
+        ignore=ignore,
+        git_dev_version=getattr(config, "git_dev_version", False),
+    ))
+
+    py_modules = python_modules(tree)
     if py_modules:
         guesses["py_modules"] = py_modules
 
     scripts = []
     for potential in ("scripts", "bin"):
         root = os.path.join(os.path.abspath(os.curdir), potential)
-        if os.path.isdir(root):
-            for file_ in os.listdir(root):
+        if tree.isdir(potential):
+            for file_ in tree.files(potential) + tree.directories(potential):
                 # windows does not have a firm grasp of executable files
                 if os.name == "nt" or \
                    os.access(os.path.join(root, file_), os.X_OK):
@@ -263,9 +595,9 @@ def _guess_at_things(config):
     if scripts:
         guesses["scripts"] = scripts
 
-    package_files = potential_data_files(scripts)
+    package_files = potential_data_files(scripts, tree, cache, ignore)
     if package_files:
-        guesses["package_data"] = package_files
+        guesses["package_data"] = compact_paths(package_files, tree)
 
     return guesses
 
@@ -318,7 +650,7 @@ def perform_guesswork(config, options):
         options: options object for cmd line flags
     """
 
-    guesses = _guess_at_things(config)
+    guesses = _guess_at_things(config, options)
 
     if options.interactive:
         guesses = _interactive_confirm(guesses)
@@ -340,11 +672,15 @@ def perform_guesswork(config, options):
 
     # convert to kwargs here to have config run find_packages
     kwargs = config._as_kwargs
+    if config._cache:
+        config._cache.save()
 
     has_data = getattr(config, "package_data", None)
 
     if has_data and "packages" not in kwargs and "py_modules" not in guesses:
         # we have no python to distribute, only some binary, move package_data
-        config.data_files = [("", list(set(*config.package_data.values())))]
+        config.data_files = [("", expand_paths(
+            list(set(*config.package_data.values()))
+        ))]
         config._metadata_exclusions.append("data_files")
         delattr(config, "package_data")
@@ -0,0 +1,233 @@
+"""Compiled matching of the files and directories ignored while guessing.
+
+pypackage's own ignore rules are combined with the project's .gitignore and
+any extra gitignore style patterns from the metadata. Everything is compiled
+once, directories are checked once as they're entered and pruned from there.
+"""
+
+
+import os
+import re
+import io
+import hashlib
+
+
+IGNORED_FILES = (
+    "MANIFEST.in",
+    "setup.cfg",
+    ".travis.yml",
+    ".coverage",
+    ".coveragerc",
+    ".gitignore",
+    "tox.ini",
+    "conftest.py",
+    "pypackage.meta",
+    ".DS_Store",
+)
+
+IGNORED_FILE_PATTERNS = (
+    r".*\.pyc$",
+    r".*\.py$",  # These will be found as part of a package
+)
+
+IGNORED_DIRS = (
+    "__pycache__",
+    "build",
+    "dist",
+    ".git",
+    ".svn",
+    ".eggs",
+    "EGG-INFO",
+)
+
+IGNORED_DIR_PATTERNS = (
+    r"docs?",
+    r"examples?",
+    r".*\.egg$",
+    r".*\.egg-info$",
+    r"tests?",
+    r".?venv",
+)
+
+
+def _combined(patterns, flags=re.I):
+    """Compiles the patterns into a single regex, case insensitive unless
+    other flags are given."""
+
+    return re.compile("|".join("(?:{})".format(p) for p in patterns), flags)
+
+
+def _glob_to_regex(glob):
+    """Translates a gitignore glob into a regex body for a relative path."""
+
+    regex = []
+    index = 0
+    while index < len(glob):
+        char = glob[index]
+        if glob.startswith("**/", index):
+            regex.append("(?:.*/)?")
+            index += 3
+            continue
+        elif glob.startswith("/**", index) and index + 3 == len(glob):
+            regex.append("/.*")
+            index += 3
+            continue
+        elif char == "*":
+            regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "[":
+            end = glob.find("]", index + 1)
+            if end == -1:
+                regex.append(re.escape(char))
+            else:
+                chars = glob[index + 1:end].replace("\\", "\\\\")
+                if chars.startswith("!"):
+                    chars = "^{}".format(chars[1:])
+                regex.append("[{}]".format(chars))
+                index = end
+        elif char == "\\" and index + 1 < len(glob):
+            index += 1
+            regex.append(re.escape(glob[index]))
+        else:
+            regex.append(re.escape(char))
+        index += 1
+    return "".join(regex)
+
+
+def parse_gitignore(lines):
+    """Parses gitignore style lines into rules.
+
+    Returns:
+        list of (negated, directory only, compiled regex) tuples, the regex
+        is matched against the slash separated path relative to the root
+    """
+
+    rules = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.startswith("#"):
+            continue
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+
+        body = _glob_to_regex(line.lstrip("/"))
+        if "/" in line:  # anchored to the root of the project
+            regex = "^{}$".format(body)
+        else:  # matches the name at any level
+            regex = "(?:^|/){}$".format(body)
+
+        rules.append((negated, directory_only, re.compile(regex)))
+
+    return rules
+
+
+class IgnoreMatcher(object):
+    """Decides which files and directories are ignored while guessing.
+
+    Args::
+
+        root: the project root, where the .gitignore is read from
+        patterns: extra gitignore style patterns to ignore
+        gitignore: boolean to also use the root's .gitignore
+    """
+
+    def __init__(self, root=os.curdir, patterns=(), gitignore=True):
+        self.root = root
+        self._files = frozenset(IGNORED_FILES)
+        self._file_patterns = _combined(IGNORED_FILE_PATTERNS)
+        self._dirs = frozenset(IGNORED_DIRS)
+        self._dir_patterns = _combined(IGNORED_DIR_PATTERNS)
+
+        lines = list(patterns)
+        if gitignore:
+            try:
+                with io.open(os.path.join(root, ".gitignore"), "r",
+                             encoding="utf-8") as opengitignore:
+                    lines = opengitignore.read().splitlines() + lines
+            except (IOError, OSError, UnicodeDecodeError):
+                pass
+
+        self.identity = hashlib.sha1(
+            "\n".join(lines).encode("utf-8")
+        ).hexdigest()
+
+        self._rules = parse_gitignore(lines)
+        if not any(negated for negated, _, _ in self._rules):
+            # without negations it's only a question of any rule matching
+            # case sensitive, as git matches them by default
+            self._any_file = _combined(
+                [rule.pattern for _, dir_only, rule in self._rules
+                 if not dir_only] or ["(?!)"],
+                flags=0,
+            )
+            self._any_dir = _combined(
+                [rule.pattern for _, _, rule in self._rules] or ["(?!)"],
+                flags=0,
+            )
+        else:
+            self._any_file = self._any_dir = None
+
+    def _relative(self, path):
+        """Returns path relative to the root, slash separated."""
+
+        relative = os.path.relpath(path, self.root)
+        return relative.replace(os.path.sep, "/")
+
+    def _gitignored(self, path, is_dir):
+        """Return a boolean of if path is ignored by the gitignore rules."""
+
+        if not self._rules:
+            return False
+
+        relative = self._relative(path)
+        if self._any_dir is not None:
+            combined = self._any_dir if is_dir else self._any_file
+            return combined.search(relative) is not None
+
+        # with negations, the last rule to match decides
+        for negated, dir_only, rule in reversed(self._rules):
+            if (is_dir or not dir_only) and rule.search(relative):
+                return not negated
+        return False
+
+    def gitignored_dir(self, path):
+        """Return a boolean of if the directory at path is gitignored.
+
+        Only the .gitignore and user patterns are considered, this is used to
+        prune whole trees (node_modules, build caches) from the snapshot.
+        """
+
+        return self._gitignored(path, True)
+
+    def gitignored_file(self, path):
+        """Return a boolean of if the file at path is gitignored."""
+
+        return self._gitignored(path, False)
+
+    def ignored_dir(self, path):
+        """Return a boolean of if the directory at path should be pruned."""
+
+        name = os.path.basename(path)
+        return name in self._dirs or \
+            self._dir_patterns.match(name) is not None or \
+            self._gitignored(path, True)
+
+    def ignored_file(self, path):
+        """Return a boolean of if the file at path is ignored."""
+
+        name = os.path.basename(path)
+        return name in self._files or \
+            self._file_patterns.match(name) is not None or \
+            self._gitignored(path, False)
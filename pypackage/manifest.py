@@ -0,0 +1,319 @@
+"""Compacts lists of data files into globs and MANIFEST.in rules.
+
+A directory whose files are all included is listed as a single ``dir/*``
+glob, and a directory whose whole tree is included becomes one
+``recursive-include``. The output grows with the number of directories
+rather than the number of files.
+"""
+
+
+import os
+import glob
+from fnmatch import fnmatchcase
+from collections import OrderedDict
+
+from .tree import _scandir
+
+
+GLOB_CHARS = ("*", "?", "[")
+
+
+def _is_glob(path):
+    """Return a boolean of if path contains any glob characters."""
+
+    return any(char in path for char in GLOB_CHARS)
+
+
+def _listing(directory, tree=None):
+    """Returns (set of file names, list of directory names) in directory.
+
+    The listing comes from the tree when it has one, or from the disk.
+    """
+
+    listing = tree.listing(directory) if tree is not None else None
+    if listing is not None:
+        return listing
+
+    files, directories = set(), []
+    try:
+        entries = list(_scandir(directory or os.curdir))
+    except OSError:
+        return files, directories
+
+    for entry in entries:
+        try:
+            if entry.is_dir():
+                directories.append(entry.name)
+            else:
+                files.add(entry.name)
+        except OSError:
+            continue
+    return files, directories
+
+
+def compact_paths(paths, tree=None):
+    """Collapses the files of fully included directories into globs.
+
+    Directories with more than one file, where every file on disk is in
+    paths, are listed as ``dir/*``. The root directory is never globbed.
+
+    Args::
+
+        paths: list of relative file paths, slash or os.sep separated
+        tree: TreeSnapshot of the cwd to list directories from, or None
+
+    Returns:
+        list of relative file paths and directory globs, in the order the
+        directories were first seen
+    """
+
+    by_directory = OrderedDict()
+    for path in paths:
+        directory, name = os.path.split(path)
+        by_directory.setdefault(directory, set()).add(name)
+
+    compacted = []
+    seen = set()
+    for path in paths:
+        directory, name = os.path.split(path)
+        if directory in seen:
+            continue
+
+        names = by_directory[directory]
+        if directory and len(names) > 1 and \
+                names.issuperset(_listing(directory, tree)[0]):
+            seen.add(directory)
+            compacted.append("{}/*".format(directory.replace(os.sep, "/")))
+        else:
+            compacted.append(path)
+
+    return compacted
+
+
+def expand_paths(paths):
+    """Expands any globs from compact_paths back into the matching files."""
+
+    expanded = []
+    for path in paths:
+        if _is_glob(path):
+            expanded.extend(sorted(
+                match for match in glob.glob(path) if os.path.isfile(match)
+            ))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def _fully_included(directory, globbed, explicit, tree=None):
+    """Returns a boolean of if every file in directory's tree is included.
+
+    Args::
+
+        directory: the top of the tree to check
+        globbed: set of directories included with a glob
+        explicit: set of file paths included on their own
+        tree: TreeSnapshot of the cwd to list directories from, or None
+    """
+
+    to_check = [directory]
+    while to_check:
+        current = to_check.pop()
+        files, directories = _listing(current, tree)
+        if current not in globbed and any(
+                os.path.join(current, name) not in explicit for name in files):
+            return False
+        to_check.extend(os.path.join(current, d) for d in directories)
+    return True
+
+
+def manifest_lines(paths, tree=None):
+    """Builds MANIFEST.in rules to include paths.
+
+    Args::
+
+        paths: list of relative file paths and ``dir/*`` globs
+        tree: TreeSnapshot of the cwd to list directories from, or None
+
+    Returns:
+        list of MANIFEST.in lines, without duplicates
+    """
+
+    globbed, explicit = set(), set()
+    for path in paths:
+        directory, name = os.path.split(os.path.normpath(path))
+        if name == "*" and directory:
+            globbed.add(directory)
+        elif not _is_glob(path):
+            explicit.add(os.path.normpath(path))
+
+    # ancestors first, so a recursive-include covers everything below it
+    recursive = set()
+    for directory in sorted(globbed, key=lambda d: d.count(os.sep)):
+        parent = os.path.dirname(directory)
+        while parent and parent not in recursive:
+            parent = os.path.dirname(parent)
+        if not parent and _fully_included(directory, globbed, explicit,
+                                          tree):
+            recursive.add(directory)
+
+    lines = OrderedDict()
+    for path in paths:
+        covering = os.path.dirname(os.path.normpath(path))
+        while covering and covering not in recursive:
+            covering = os.path.dirname(covering)
+
+        if covering:
+            line = "recursive-include {} *".format(
+                covering.replace(os.sep, "/")
+            )
+        else:
+            line = "include {}".format(path)
+        lines[line] = None
+
+    return list(lines)
+
+
+def _split(path):
+    """Returns the parts of a relative path, without any leading ./"""
+
+    return [part for part in path.replace(os.sep, "/").split("/") if
+            part not in ("", os.curdir)]
+
+
+def _matches(pattern, parts):
+    """Return a boolean of if the glob pattern matches all of the parts."""
+
+    pattern = _split(pattern)
+    return len(pattern) == len(parts) and all(
+        fnmatchcase(part, pat) for part, pat in zip(parts, pattern)
+    )
+
+
+def _tail_matches(pattern, parts):
+    """Return a boolean of if the glob pattern matches the end of parts."""
+
+    count = len(_split(pattern))
+    return 0 < count <= len(parts) and _matches(pattern, parts[-count:])
+
+
+def _below(directory, parts):
+    """Returns the parts below directory, or None if they aren't below it."""
+
+    directory = _split(directory)
+    if len(parts) > len(directory) and \
+            _matches("/".join(directory), parts[:len(directory)]):
+        return parts[len(directory):]
+
+
+def manifest_files(lines, paths, selected=()):
+    """Selects the paths included by MANIFEST.in lines, like distutils does.
+
+    Args::
+
+        lines: MANIFEST.in lines, applied in order
+        paths: relative file paths to select from
+        selected: paths already included before the lines are applied
+
+    Returns:
+        set of the selected paths
+    """
+
+    files = [(path, _split(path)) for path in set(paths).union(selected)]
+    selected = set(selected)
+    for line in lines:
+        words = line.split()
+        if len(words) < 2 or words[0].startswith("#"):
+            continue
+
+        action, args = words[0], words[1:]
+        if action in ("include", "exclude"):
+            def test(parts):
+                return any(_matches(pattern, parts) for pattern in args)
+        elif action in ("global-include", "global-exclude"):
+            def test(parts):
+                return any(_tail_matches(pattern, parts) for pattern in args)
+        elif action in ("recursive-include", "recursive-exclude"):
+            def test(parts):
+                below = _below(args[0], parts)
+                return below is not None and any(
+                    _tail_matches(pattern, below) for pattern in args[1:]
+                )
+        elif action in ("graft", "prune"):
+            def test(parts):
+                return any(_below(directory, parts) for directory in args)
+        else:
+            continue
+
+        chosen = set(path for path, parts in files if test(parts))
+        if action.endswith("include") or action == "graft":
+            selected.update(chosen)
+        else:
+            selected.difference_update(chosen)
+
+    return selected
+
+
+def data_manifest_lines(package_data, data_files, tree=None):
+    """Builds the MANIFEST.in rules to include package_data and data_files.
+
+    Args::
+
+        package_data: the package_data dict, or None
+        data_files: the data_files list of (directory, files), or None
+        tree: TreeSnapshot of the cwd to list directories from, or None
+
+    Returns:
+        list of MANIFEST.in lines
+    """
+
+    to_include = []
+    for _, files in (package_data or {}).items():
+        to_include.extend(files)
+
+    try:
+        for _, files in data_files or []:
+            to_include.extend(files)
+    except ValueError:
+        raise SystemExit("Malformed data_files: {!r}".format(data_files))
+
+    return manifest_lines(to_include, tree)
+
+
+def read_manifest(path="MANIFEST.in"):
+    """Returns the content of the MANIFEST.in, or "" if there isn't one."""
+
+    try:
+        with open(path, "rb") as openmanifest:
+            return openmanifest.read().decode("utf-8")
+    except (IOError, OSError):
+        return ""
+
+
+def combined_manifest(original, package_data, data_files, tree=None):
+    """Returns the MANIFEST.in content with our data rules added to it.
+
+    Args::
+
+        original: the existing MANIFEST.in content
+        package_data: the package_data dict, or None
+        data_files: the data_files list of (directory, files), or None
+        tree: TreeSnapshot of the cwd to list directories from, or None
+
+    Returns:
+        tuple of (content, boolean of if any rules were added)
+    """
+
+    if not (package_data or data_files):
+        return original, False
+
+    existing = set(original.splitlines())
+    add_to_manifest = [
+        line for line in data_manifest_lines(package_data, data_files, tree)
+        if line not in existing
+    ]
+    if not add_to_manifest:
+        return original, False
+
+    if original and not original.endswith("\n"):
+        original += "\n"
+    return "{}{}\n".format(original, "\n".join(add_to_manifest)), True
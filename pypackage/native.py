@@ -0,0 +1,885 @@
+"""Builds pure python wheels and sdists from the config, without setuptools.
+
+Source files are streamed from where they are into the wheel's zip or the
+sdist's tar, rather than being copied into build/ or a staging directory
+first. The .dist-info, .egg-info, PKG-INFO, setup.py and MANIFEST.in files
+are written directly from memory, so nothing in the project is touched.
+Anything which needs setuptools to build, like ext_modules or a custom
+cmdclass, falls back to setuptools.
+"""
+
+
+from __future__ import print_function
+
+import os
+import re
+import sys
+import glob
+import time
+import base64
+import hashlib
+from io import BytesIO
+from fnmatch import fnmatchcase
+
+from .tree import TreeSnapshot
+from .cache import build_atomically
+from .runner import TEST_COMMAND
+from .manifest import read_manifest
+from .manifest import manifest_files
+from .manifest import combined_manifest
+from .constants import dist_version
+
+
+# keys which only setuptools knows how to build with
+SETUPTOOLS_ONLY = ("ext_modules", "use_2to3", "namespace_packages",
+                   "extensions")
+
+# setuptools commands which use what the build command produces
+_NEEDS_BUILD = ("bdist", "bdist_dumb", "bdist_egg", "bdist_rpm",
+                "bdist_wheel", "build_ext", "build_py", "install")
+
+# read and write files in chunks of this many bytes
+CHUNK_SIZE = 1024 * 1024
+
+# files setuptools adds to every sdist when they exist, as globs
+SDIST_DEFAULTS = ("README", "README.rst", "README.txt", "README.md",
+                  "pyproject.toml", "setup.cfg", "test/test*.py",
+                  "LICEN[CS]E*", "COPYING*", "NOTICE*", "AUTHORS*")
+
+# top level directories which are never in an sdist
+SDIST_PRUNED = ("build", "dist")
+
+# the options egg_info sets in the sdist's setup.cfg
+EGG_INFO_OPTIONS = (("tag_build", ""), ("tag_date", "0"))
+
+# bdist_wheel options in setup.cfg which only setuptools builds support
+SETUPTOOLS_WHEEL_OPTIONS = ("plat_name", "build_number", "py_limited_api")
+
+# values distutils reads as true for boolean options
+TRUE_VALUES = ("1", "true", "yes", "on", "y", "t")
+
+
+def fallback_reason(kwargs):
+    """Returns why kwargs can't be built natively, or None if they can.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs
+    """
+
+    if not kwargs.get("name"):
+        return "there is no name"
+
+    for key in SETUPTOOLS_ONLY:
+        if kwargs.get(key):
+            return "{} is set".format(key)
+
+    cmdclass = dict(kwargs.get("cmdclass") or {})
+    if cmdclass.pop("test", TEST_COMMAND) != TEST_COMMAND or cmdclass:
+        return "a custom cmdclass is set"
+
+    wheel_options = _bdist_wheel_options()
+    for option in SETUPTOOLS_WHEEL_OPTIONS:
+        if wheel_options.get(option):
+            return "setup.cfg sets bdist_wheel {}".format(
+                option.replace("_", "-")
+            )
+
+
+def _escaped(kwargs):
+    """Returns the name and version, escaped like bdist_wheel does."""
+
+    return (
+        re.sub(r"[^\w.]+", "_", kwargs["name"], flags=re.UNICODE),
+        re.sub(r"[^\w.+!]+", "_", _version(kwargs), flags=re.UNICODE),
+    )
+
+
+def _version(kwargs):
+    """Returns the version, 0.0.0 if there isn't one like setuptools.
+
+    The version is normalized when packaging is installed, as setuptools
+    does, otherwise it is used as it is.
+    """
+
+    version = kwargs.get("version") or "0.0.0"
+    try:
+        from packaging.version import Version, InvalidVersion
+    except ImportError:  # pragma: no cover
+        return version
+
+    try:
+        return str(Version(version))
+    except InvalidVersion:
+        return version
+
+
+def wheel_name(kwargs):
+    """Returns the file name of the wheel for kwargs."""
+
+    name, version = _escaped(kwargs)
+    return "{}-{}-{}-none-any.whl".format(name, version, python_tag())
+
+
+def sdist_name(kwargs):
+    """Returns the file name of the sdist for kwargs, without the extension.
+    """
+
+    return "{}-{}".format(kwargs["name"], _version(kwargs))
+
+
+def _read_setup_cfg(optionxform=None):
+    """Returns a RawConfigParser of the setup.cfg, empty if there isn't one.
+
+    Args::
+
+        optionxform: callable to transform option names with, or None for
+                     configparser's default of lowering them
+    """
+
+    try:
+        from configparser import RawConfigParser, Error
+    except ImportError:  # pragma: no cover
+        from ConfigParser import RawConfigParser, Error
+
+    parser = RawConfigParser()
+    if optionxform is not None:
+        parser.optionxform = optionxform
+    try:
+        parser.read("setup.cfg")
+    except Error as error:
+        raise SystemExit("Could not read setup.cfg: {}".format(error))
+    return parser
+
+
+def _bdist_wheel_options():
+    """Returns a dict of the bdist_wheel options set in the setup.cfg.
+
+    The deprecated [wheel] section is read first, as bdist_wheel still
+    takes its universal option.
+    """
+
+    parser = _read_setup_cfg()
+    options = {}
+    for section in ("wheel", "bdist_wheel"):
+        if parser.has_section(section):
+            options.update(
+                (key.replace("-", "_"), value.strip()) for key, value in
+                parser.items(section)
+            )
+    return options
+
+
+def python_tag():
+    """Returns the wheel python tag, as bdist_wheel would use.
+
+    That's py2.py3 for universal wheels, else the setup.cfg's python-tag or
+    the tag of the running python.
+    """
+
+    options = _bdist_wheel_options()
+    if options.get("universal", "").lower() in TRUE_VALUES:
+        return "py2.py3"
+    return options.get("python_tag") or "py{}".format(sys.version_info[0])
+
+
+def _package_path(package, package_dir):
+    """Returns the directory of package, honouring package_dir.
+
+    Args::
+
+        package: dotted package name, "" for the root
+        package_dir: the package_dir dict from the config
+    """
+
+    parts = package.split(".") if package else []
+    for index in range(len(parts), 0, -1):
+        prefix = ".".join(parts[:index])
+        if prefix in package_dir:
+            return os.path.join(package_dir[prefix], *parts[index:])
+    return os.path.join(package_dir.get("", ""), *parts)
+
+
+def _python_files(kwargs):
+    """Yields (source path, path in the wheel) for packages and modules."""
+
+    package_dir = kwargs.get("package_dir") or {}
+    for package in kwargs.get("packages") or []:
+        path = _package_path(package, package_dir)
+        try:
+            names = sorted(os.listdir(path or os.curdir))
+        except OSError:
+            raise SystemExit("Package directory {} not found".format(path))
+        for name in names:
+            if name.endswith(".py") and \
+                    os.path.isfile(os.path.join(path, name)):
+                yield (os.path.join(path, name),
+                       "/".join(package.split(".") + [name]))
+
+    for module in kwargs.get("py_modules") or []:
+        package, _, name = module.rpartition(".")
+        path = os.path.join(_package_path(package, package_dir), name + ".py")
+        if not os.path.isfile(path):
+            raise SystemExit("Module {} not found at {}".format(module, path))
+        yield path, "/".join(module.split(".")) + ".py"
+
+
+def _tree_paths(tree):
+    """Returns the normalized paths of the files in tree.
+
+    Snapshots of the tracked files don't hold what's on disk like the
+    MANIFEST.in sees it, so a new snapshot is scanned for those.
+    """
+
+    if tree is None or not tree.complete:
+        tree = TreeSnapshot()
+    return [os.path.normpath(path) for path in tree.paths()]
+
+
+def _package_data(kwargs, manifest, tree=None):
+    """Yields (source path, path in the wheel) for the packages' data files.
+
+    package_data globs are relative to their package's directory, with the
+    "" key applying to every package. With include_package_data, files the
+    MANIFEST.in includes inside of package directories are added, same as
+    setuptools does.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs
+        manifest: the MANIFEST.in content to use
+        tree: the config's _project_tree, or None to scan the cwd
+    """
+
+    package_dir = kwargs.get("package_dir") or {}
+    package_data = kwargs.get("package_data") or {}
+    exclude = kwargs.get("exclude_package_data") or {}
+    packages = dict(
+        (package, _package_path(package, package_dir)) for package in
+        kwargs.get("packages") or []
+    )
+
+    found = []
+    for package, path in packages.items():
+        for pattern in package_data.get("", []) + package_data.get(package,
+                                                                   []):
+            for match in glob.glob(os.path.join(path, pattern)):
+                if os.path.isfile(match):
+                    found.append(os.path.normpath(match))
+
+    if kwargs.get("include_package_data") and manifest:
+        found.extend(os.path.normpath(path) for path in manifest_files(
+            manifest.splitlines(), _tree_paths(tree)
+        ))
+
+    # each file belongs to the deepest package directory it is inside of
+    by_depth = sorted(
+        packages.items(), key=lambda item: -len(os.path.normpath(item[1]))
+    )
+    for path in sorted(set(found)):
+        for package, package_path in by_depth:
+            package_path = os.path.normpath(package_path)
+            relative = os.path.relpath(path, package_path)
+            if relative.startswith(os.pardir) or relative == os.curdir:
+                continue
+            patterns = exclude.get("", []) + exclude.get(package, [])
+            if not any(fnmatchcase(relative, pat) for pat in patterns):
+                yield path, "/".join(
+                    package.split(".") + relative.split(os.sep)
+                )
+            break
+
+
+def _data_dir_files(kwargs, data_dir):
+    """Yields (source path, path in the wheel) for scripts and data_files."""
+
+    for script in kwargs.get("scripts") or []:
+        yield script, "{}/scripts/{}".format(
+            data_dir, os.path.basename(script)
+        )
+
+    for target, files in kwargs.get("data_files") or []:
+        target = "/".join(part for part in target.replace(os.sep, "/").split(
+            "/") if part not in ("", os.curdir))
+        for path in files:
+            yield path, "{}/data/{}".format(data_dir, "/".join(
+                part for part in (target, os.path.basename(path)) if part
+            ))
+
+
+def _requirements(value):
+    """Returns a list of requirement strings from a str or list value."""
+
+    if not value:
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = value.splitlines()
+    return [line.strip() for line in value if line.strip()]
+
+
+def metadata(kwargs):
+    """Returns the core metadata for kwargs, for METADATA and PKG-INFO."""
+
+    headers = [
+        ("Metadata-Version", "2.1"),
+        ("Name", kwargs["name"]),
+        ("Version", _version(kwargs)),
+        ("Summary", kwargs.get("description")),
+        ("Home-page", kwargs.get("url")),
+        ("Download-URL", kwargs.get("download_url")),
+        ("Author", kwargs.get("author")),
+        ("Author-email", kwargs.get("author_email")),
+        ("Maintainer", kwargs.get("maintainer")),
+        ("Maintainer-email", kwargs.get("maintainer_email")),
+        ("License", kwargs.get("license")),
+        ("Keywords", ",".join(kwargs.get("keywords") or []) or None),
+    ]
+    headers.extend(("Platform", platform) for platform in
+                   kwargs.get("platforms") or [])
+    headers.extend(("Classifier", classifier) for classifier in
+                   kwargs.get("classifiers") or [])
+    headers.extend(("Requires-Dist", requirement) for requirement in
+                   _requirements(kwargs.get("install_requires")))
+
+    for extra, requirements in sorted(
+            (kwargs.get("extras_require") or {}).items()):
+        extra, _, marker = extra.partition(":")
+        headers.append(("Provides-Extra", extra))
+        condition = 'extra == "{}"'.format(extra)
+        if marker:
+            condition = "({}) and {}".format(marker, condition)
+        headers.extend(
+            ("Requires-Dist", "{}; {}".format(requirement, condition)) for
+            requirement in _requirements(requirements)
+        )
+
+    lines = ["{}: {}".format(key, value) for key, value in headers if value]
+    long_description = kwargs.get("long_description")
+    if long_description:
+        lines.extend(["", long_description.rstrip("\n")])
+    return "\n".join(lines) + "\n"
+
+
+def _entry_points(kwargs):
+    """Returns the entry_points.txt content, or None if there are none."""
+
+    entry_points = kwargs.get("entry_points") or {}
+    if not entry_points:
+        return None
+    if not isinstance(entry_points, dict):
+        return "{}\n".format(entry_points.strip())
+
+    sections = []
+    for group, lines in sorted(entry_points.items()):
+        if not isinstance(lines, (list, tuple)):
+            lines = lines.splitlines()
+        sections.append("[{}]\n{}\n".format(group, "\n".join(
+            line.strip() for line in lines if line.strip()
+        )))
+    return "\n".join(sections)
+
+
+def _top_level(kwargs):
+    """Returns the top_level.txt content."""
+
+    names = set(package.split(".")[0] for package in
+                kwargs.get("packages") or [])
+    names.update(module.split(".")[0] for module in
+                 kwargs.get("py_modules") or [])
+    return "".join("{}\n".format(name) for name in sorted(names))
+
+
+def _date_time(mtime):
+    """Returns a zip date_time tuple, honouring SOURCE_DATE_EPOCH."""
+
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        mtime = int(epoch)
+    return time.gmtime(max(mtime, 315532800))[:6]  # zip can't go pre 1980
+
+
+class WheelWriter(object):
+    """Writes files into a wheel's zip, keeping its RECORD as it goes.
+
+    Args::
+
+        path: the wheel file to write to
+    """
+
+    def __init__(self, path):
+        import zipfile
+
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.record = []
+
+    def _info(self, arcname, mtime, mode):
+        import zipfile
+
+        info = zipfile.ZipInfo(arcname, _date_time(mtime))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = (mode & 0xFFFF) << 16
+        return info
+
+    def _recorded(self, arcname, digest, size):
+        self.record.append("{},sha256={},{}".format(
+            arcname,
+            base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode(),
+            size,
+        ))
+
+    def write(self, path, arcname, script=False):
+        """Streams the file at path into the wheel as arcname.
+
+        Args::
+
+            path: the source file to add
+            arcname: the path in the wheel to add it as
+            script: boolean to point a python shebang at the installing python
+        """
+
+        stat = os.stat(path)
+        info = self._info(arcname, stat.st_mtime, stat.st_mode | 0o644)
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as openfile:
+            first = openfile.read(CHUNK_SIZE)
+            if script and first.startswith(b"#!") and \
+                    b"python" in first.partition(b"\n")[0]:
+                first = b"#!python" + first[first.index(b"\n"):] if \
+                    b"\n" in first else b"#!python"
+                info.external_attr |= 0o755 << 16
+
+            if sys.version_info < (3, 6):  # pragma: no cover
+                data = first + openfile.read()
+                digest.update(data)
+                self.zip.writestr(info, data)
+                return self._recorded(arcname, digest, len(data))
+
+            with self.zip.open(info, "w") as member:
+                chunk = first
+                while chunk:
+                    digest.update(chunk)
+                    member.write(chunk)
+                    size += len(chunk)
+                    chunk = openfile.read(CHUNK_SIZE)
+        self._recorded(arcname, digest, size)
+
+    def writestr(self, arcname, content):
+        """Adds the string content to the wheel as arcname."""
+
+        data = content.encode("utf-8")
+        self.zip.writestr(self._info(arcname, time.time(), 0o644), data)
+        self._recorded(arcname, hashlib.sha256(data), len(data))
+
+    def close(self, record_name):
+        """Writes the RECORD as record_name, then closes the zip."""
+
+        self.record.append("{},,".format(record_name))
+        data = "\n".join(self.record) + "\n"
+        self.zip.writestr(self._info(record_name, time.time(), 0o644), data)
+        self.zip.close()
+
+
+def build_manifest(kwargs, tree=None):
+    """Returns the MANIFEST.in content ManifestContext would write.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs
+        tree: the config's _project_tree, or None to list from the disk
+    """
+
+    return combined_manifest(
+        read_manifest(),
+        kwargs.get("package_data"),
+        kwargs.get("data_files"),
+        tree,
+    )[0]
+
+
+def _sdist_setup_cfg():
+    """Returns the setup.cfg egg_info writes into the sdist.
+
+    egg_info rewrites the project's setup.cfg with configparser, which drops
+    comments and normalizes the formatting, with its own options set.
+    """
+
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    parser = _read_setup_cfg(optionxform=str)
+    if not parser.has_section("egg_info"):
+        parser.add_section("egg_info")
+    for option, value in EGG_INFO_OPTIONS:
+        parser.set("egg_info", option, value)
+
+    written = StringIO()
+    parser.write(written)
+    return written.getvalue()
+
+
+def wheel_files(kwargs, manifest, tree=None):
+    """Returns the files in the wheel.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs
+        manifest: the MANIFEST.in content to use
+        tree: the config's _project_tree, or None to scan the cwd
+
+    Returns:
+        list of (source path, path in the wheel, boolean of if it's a script)
+    """
+
+    name, version = _escaped(kwargs)
+    data_dir = "{}-{}.data".format(name, version)
+
+    files = []
+    written = set()
+    for source, arcname in list(_python_files(kwargs)) + \
+            list(_package_data(kwargs, manifest, tree)):
+        if arcname not in written:
+            written.add(arcname)
+            files.append((source, arcname, False))
+
+    scripts = set(kwargs.get("scripts") or [])
+    files.extend(
+        (source, arcname, source in scripts) for source, arcname in
+        _data_dir_files(kwargs, data_dir)
+    )
+    return files
+
+
+def build_wheel(kwargs, dist_dir="dist", manifest=None, files=None):
+    """Builds a pure python wheel from kwargs in dist_dir.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs, which must not need setuptools
+        dist_dir: the directory to write the wheel into
+        manifest: the MANIFEST.in content, defaults to what would be written
+        files: the wheel_files to write, defaults to finding them
+
+    Returns:
+        the path of the wheel
+    """
+
+    if files is None:
+        files = wheel_files(kwargs, build_manifest(kwargs) if manifest is None
+                            else manifest)
+
+    name, version = _escaped(kwargs)
+    dist_info = "{}-{}.dist-info".format(name, version)
+
+    def _write(temp_path):
+        """Writes the wheel to the temporary file."""
+
+        writer = WheelWriter(temp_path)
+        for source, arcname, script in files:
+            writer.write(source, arcname, script=script)
+
+        writer.writestr(dist_info + "/METADATA", metadata(kwargs))
+        writer.writestr(dist_info + "/WHEEL", (
+            "Wheel-Version: 1.0\n"
+            "Generator: pypackage ({})\n"
+            "Root-Is-Purelib: true\n"
+            "Tag: {}-none-any\n"
+        ).format(dist_version(), python_tag()))
+        entry_points = _entry_points(kwargs)
+        if entry_points:
+            writer.writestr(dist_info + "/entry_points.txt", entry_points)
+        writer.writestr(dist_info + "/top_level.txt", _top_level(kwargs))
+        writer.close(dist_info + "/RECORD")
+
+    path = os.path.join(dist_dir, wheel_name(kwargs))
+    build_atomically(path, _write, suffix=".whl.tmp")
+    return path
+
+
+def sdist_files(kwargs, manifest, extra=(), sources=None, tree=None):
+    """Returns the sorted relative paths of the project's files in the sdist.
+
+    These are setuptools' defaults, then the MANIFEST.in applied over them,
+    without anything in build/, dist/ or an .egg-info directory.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs
+        manifest: the MANIFEST.in content to use
+        extra: any other files to include, like the long_description file
+        sources: the source paths of the wheel_files, if already found
+        tree: the config's _project_tree, or None to scan the cwd
+    """
+
+    if sources is None:
+        sources = [source for source, _, _ in wheel_files(kwargs, manifest,
+                                                          tree)]
+
+    files = set(sources)
+    for pattern in SDIST_DEFAULTS:
+        files.update(path for path in glob.glob(pattern) if
+                     os.path.isfile(path))
+    files.update(path for path in extra if path and os.path.isfile(path))
+    files = set(os.path.normpath(path) for path in files)
+
+    lines = manifest.splitlines()
+    if any(line.strip() and not line.strip().startswith("#") for line in
+           lines):
+        files = manifest_files(lines, _tree_paths(tree), files)
+
+    return sorted(
+        path for path in files if
+        path.replace(os.sep, "/").split("/")[0] not in SDIST_PRUNED and
+        not any(part.endswith(".egg-info") for part in path.split(os.sep))
+    )
+
+
+class SdistWriter(object):
+    """Writes files into an sdist's gzipped tar, under its base directory.
+
+    Args::
+
+        path: the sdist file to write to
+        base: the directory everything in the sdist is inside of
+    """
+
+    def __init__(self, path, base):
+        import tarfile
+
+        self.tar = tarfile.open(path, "w:gz", format=tarfile.PAX_FORMAT)
+        self.base = base
+        self._dirs = set()
+
+    def _parents(self, arcname):
+        """Adds the directory entries leading up to arcname."""
+
+        import tarfile
+
+        parts = arcname.split("/")[:-1]
+        for index in range(1, len(parts) + 1):
+            directory = "/".join(parts[:index])
+            if directory not in self._dirs:
+                self._dirs.add(directory)
+                info = tarfile.TarInfo(directory)
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                info.mtime = time.time()
+                self.tar.addfile(info)
+
+    def write(self, path, arcname):
+        """Streams the file at path into the sdist as arcname."""
+
+        arcname = "{}/{}".format(self.base, arcname)
+        self._parents(arcname)
+        info = self.tar.gettarinfo(path, arcname)
+        with open(path, "rb") as openfile:
+            self.tar.addfile(info, openfile)
+
+    def writestr(self, arcname, content):
+        """Adds the string content to the sdist as arcname."""
+
+        import tarfile
+
+        arcname = "{}/{}".format(self.base, arcname)
+        self._parents(arcname)
+        data = content.encode("utf-8")
+        info = tarfile.TarInfo(arcname)
+        info.size = len(data)
+        info.mode = 0o644
+        info.mtime = time.time()
+        self.tar.addfile(info, BytesIO(data))
+
+    def close(self):
+        self.tar.close()
+
+
+def build_sdist(kwargs, setup_py, dist_dir="dist", manifest=None,
+                files=None):
+    """Builds an sdist from kwargs in dist_dir.
+
+    The setup.py, PKG-INFO, MANIFEST.in and .egg-info files are generated in
+    memory, the rest of the files are streamed from the project.
+
+    Args::
+
+        kwargs: the config's _resolved_kwargs, which must not need setuptools
+        setup_py: the content of the setup.py, str() of the config
+        dist_dir: the directory to write the sdist into
+        manifest: the MANIFEST.in content, defaults to what would be written
+        files: the sdist_files to write, defaults to finding them
+
+    Returns:
+        the path of the sdist
+    """
+
+    if manifest is None:
+        manifest = build_manifest(kwargs)
+    if files is None:
+        files = sdist_files(kwargs, manifest)
+
+    base = sdist_name(kwargs)
+    egg_info = "{}.egg-info".format(
+        re.sub(r"[^A-Za-z0-9.]+", "_", kwargs["name"])
+    )
+    files = [path.replace(os.sep, "/") for path in files]
+
+    generated = {
+        "PKG-INFO": metadata(kwargs),
+        "setup.py": "{}\n".format(setup_py),
+    }
+    if manifest:
+        generated["MANIFEST.in"] = manifest
+
+    setup_cfg = "setup.cfg" in files
+    if setup_cfg:
+        files.remove("setup.cfg")
+    generated["setup.cfg"] = _sdist_setup_cfg()
+
+    egg_files = {
+        "PKG-INFO": generated["PKG-INFO"],
+        "dependency_links.txt": "\n",
+        "top_level.txt": _top_level(kwargs) or "\n",
+    }
+    requires = _requirements(kwargs.get("install_requires"))
+    extras = sorted((kwargs.get("extras_require") or {}).items())
+    if requires or extras:
+        egg_files["requires.txt"] = "".join(
+            ["{}\n".format(line) for line in requires] +
+            ["\n[{}]\n{}".format(extra, "".join(
+                "{}\n".format(line) for line in _requirements(reqs)
+            )) for extra, reqs in extras]
+        ).lstrip("\n")
+    entry_points = _entry_points(kwargs)
+    if entry_points:
+        egg_files["entry_points.txt"] = entry_points
+
+    # setuptools lists the files it found, sorted by directory then name
+    sources = set(files).union(name for name in generated if
+                               name not in ("PKG-INFO", "setup.cfg"))
+    if setup_cfg:
+        sources.add("setup.cfg")
+    sources.update("{}/{}".format(egg_info, name) for name in
+                   list(egg_files) + ["SOURCES.txt"])
+    egg_files["SOURCES.txt"] = "\n".join(
+        sorted(sources, key=lambda name: name.rpartition("/")[::2])
+    )
+
+    def _write(temp_path):
+        """Writes the sdist to the temporary file."""
+
+        writer = SdistWriter(temp_path, base)
+        for name in sorted(set(files).union(generated)):
+            if name in generated:
+                writer.writestr(name, generated[name])
+            else:
+                writer.write(name, name)
+        for name, content in sorted(egg_files.items()):
+            writer.writestr("{}/{}".format(egg_info, name), content)
+        writer.close()
+
+    path = os.path.join(dist_dir, "{}.tar.gz".format(base))
+    build_atomically(path, _write, suffix=".tar.gz.tmp")
+    return path
+
+
+def _build_artifact(command, kwargs, dist_dir, manifest, files, setup_py):
+    """Builds the artifact for command, returns its path and build time.
+
+    Module level so it can be run in a process pool.
+    """
+
+    started = time.time()
+    if command == "sdist":
+        path = build_sdist(kwargs, setup_py, dist_dir, manifest, files)
+    else:
+        path = build_wheel(kwargs, dist_dir, manifest, files)
+    return path, time.time() - started
+
+
+def _build_artifact_star(args):
+    """Unpacks the args tuple for _build_artifact, for Pool.map."""
+
+    return _build_artifact(*args)
+
+
+def build(config, commands, dist_dir="dist"):
+    """Builds what it can of the setuptools commands natively.
+
+    The config and the files of each artifact are resolved once up front.
+    With the parallel_build setting, the sdist and wheel are then written at
+    the same time in separate processes.
+
+    Args::
+
+        config: the Config to build
+        commands: list of setuptools commands which were going to be run
+        dist_dir: the directory to write artifacts into
+
+    Returns:
+        list of the commands setuptools still needs to run
+    """
+
+    native = [command for command in commands if
+              command in ("sdist", "bdist_wheel")]
+    if not native:
+        return commands
+
+    kwargs = config._resolved_kwargs
+    reason = fallback_reason(kwargs)
+    if reason:
+        print("Building with setuptools, {}".format(reason))
+        return commands
+
+    started = time.time()
+    tree = config._project_tree
+    manifest = build_manifest(kwargs, tree)
+    in_wheel = wheel_files(kwargs, manifest, tree)
+    files = {"bdist_wheel": in_wheel}
+    if "sdist" in native:
+        files["sdist"] = sdist_files(
+            kwargs,
+            manifest,
+            [config._long_path],
+            [source for source, _, _ in in_wheel],
+            tree,
+        )
+    setup_py = str(config)
+    jobs = [(command, kwargs, dist_dir, manifest, files[command], setup_py)
+            for command in native]
+
+    if getattr(config, "parallel_build", False) and len(jobs) > 1:
+        if not os.path.isdir(dist_dir):
+            os.makedirs(dist_dir)
+        import multiprocessing
+        pool = multiprocessing.Pool(len(jobs))
+        try:
+            built = pool.map(_build_artifact_star, jobs, 1)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        built = [_build_artifact_star(job) for job in jobs]
+
+    for path, seconds in built:
+        print("Built {} in {:.2f}s".format(path, seconds))
+    if len(built) > 1:
+        print("Built {} artifacts in {:.2f}s".format(
+            len(built),
+            time.time() - started,
+        ))
+
+    return remaining(commands, native)
+
+
+def remaining(commands, done):
+    """Returns the commands left to run once the commands in done are.
+
+    The build command is dropped when nothing left needs what it builds.
+    """
+
+    left = [command for command in commands if command not in done]
+    if not any(command in _NEEDS_BUILD for command in left):
+        left = [command for command in left if command != "build"]
+    return left
@@ -6,40 +6,65 @@ The test runner can be one of pytest, nose, or unittest.
 
 
 import os
-import unittest
-from setuptools.command.test import test as TestCommand
 
 
-class TestRunner(TestCommand):  # pragma: no cover
-    """TestCommand subclass to use pytest or nose with setup.py test."""
+# the cmdclass placeholder for the test command until setuptools needs it
+TEST_COMMAND = "PyPackageTest"
 
-    @staticmethod
-    def pypackage(config):
-        """Set with self when this runner is selected for direct testing."""
+_TEST_RUNNER = []
 
-        TestRunner._pypackage = config
 
-    def finalize_options(self):
-        """Find our package name and test options to fill out test_args."""
+def test_command(config):  # pragma: no cover
+    """Returns the TestCommand subclass to run config's tests directly.
 
-        TestCommand.finalize_options(self)
-        self.test_args = TestRunner._pypackage.runner_args
-        self.test_suite = True
+    setuptools, and the test runner itself, are only imported here, when
+    setuptools is actually going to run our test command.
 
-    def run_tests(self):
-        """Run tests inline, could be any of pytest, nose or unittest."""
-
-        if TestRunner._pypackage.test_runner == "nose":
-            errno = TestRunner._pypackage._runner.main(argv=self.test_args)
-        elif TestRunner._pypackage.test_runner == "unittest":
-            test_suite = unittest.defaultTestLoader.discover(os.path.abspath(
-                getattr(TestRunner._pypackage, "tests_dir", ".")
-            ))
-            errno = unittest.TextTestRunner().run(test_suite)
-        else:
-            errno = TestRunner._pypackage._runner.main(self.test_args)
-
-        raise SystemExit(errno)
+    Args::
+
+        config: the Config object with the test_runner to use
+    """
+
+    if not _TEST_RUNNER:
+        from setuptools.command.test import test as TestCommand
+
+        class TestRunner(TestCommand):
+            """TestCommand subclass to run pytest, nose or unittest."""
+
+            @staticmethod
+            def pypackage(config):
+                """Set with self when this runner is selected."""
+
+                TestRunner._pypackage = config
+
+            def finalize_options(self):
+                """Find our package name and test options for test_args."""
+
+                TestCommand.finalize_options(self)
+                self.test_args = TestRunner._pypackage.runner_args
+                self.test_suite = True
+
+            def run_tests(self):
+                """Run tests inline, could be pytest, nose or unittest."""
+
+                pypackage = TestRunner._pypackage
+                if pypackage.test_runner == "nose":
+                    errno = pypackage._runner.main(argv=self.test_args)
+                elif pypackage.test_runner == "unittest":
+                    unittest = pypackage._runner
+                    test_suite = unittest.defaultTestLoader.discover(
+                        os.path.abspath(getattr(pypackage, "tests_dir", "."))
+                    )
+                    errno = unittest.TextTestRunner().run(test_suite)
+                else:
+                    errno = pypackage._runner.main(self.test_args)
+
+                raise SystemExit(errno)
+
+        _TEST_RUNNER.append(TestRunner)
+
+    _TEST_RUNNER[0].pypackage(config)
+    return _TEST_RUNNER[0]
 
 
 # for the setup.py; used in config outputting
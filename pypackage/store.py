@@ -0,0 +1,275 @@
+"""Optional local store of built artifacts, shared between checkouts.
+
+Set artifact_store in your $HOME/.pypackage to a directory to use it. Built
+sdists and wheels are kept in it by the artifact_key of their inputs and the
+command which built them, under the name they were built with, so any
+checkout of the same sources on the host can reuse them rather than building
+again. The store is kept under artifact_store_size bytes by removing the
+least recently used artifacts.
+"""
+
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import shutil
+import logging
+from functools import partial
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from . import native
+from .cache import build_atomically
+from .cache import write_atomically
+from .fingerprint import artifact_key
+from .fingerprint import input_fingerprint
+
+
+STATS_NAME = "stats.json"
+
+LOCK_NAME = ".lock"
+
+# the default size cap of the store in bytes, artifact_store_size overrides it
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+
+class ArtifactStore(object):
+    """A directory of artifacts, stored by the key of their inputs.
+
+    Args::
+
+        root: the directory of the store
+        max_size: bytes to keep the store under, 0 for no limit
+    """
+
+    def __init__(self, root, max_size=DEFAULT_MAX_SIZE):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, config):
+        """Returns the config's store, or None if it doesn't use one."""
+
+        root = getattr(config, "artifact_store", None)
+        if not root:
+            return None
+        return cls(root, getattr(config, "artifact_store_size",
+                                 DEFAULT_MAX_SIZE))
+
+    def _directory(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _copy(self, source, path):
+        """Copies source to path via a temporary file and a rename."""
+
+        build_atomically(path, partial(shutil.copyfile, source))
+
+    def _locked(self, func):
+        """Calls func holding the store's lock, returns what it returns."""
+
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        with open(os.path.join(self.root, LOCK_NAME), "a") as openlock:
+            if fcntl is not None:
+                fcntl.flock(openlock, fcntl.LOCK_EX)
+            try:
+                return func()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(openlock, fcntl.LOCK_UN)
+
+    def stats(self):
+        """Returns a dict of the hits, misses, published and evicted counts.
+        """
+
+        counts = {"hits": 0, "misses": 0, "published": 0, "evicted": 0}
+        try:
+            with open(os.path.join(self.root, STATS_NAME), "rb") as openstats:
+                counts.update(json.loads(openstats.read().decode("utf-8")))
+        except (IOError, OSError, ValueError):
+            pass
+        return counts
+
+    def _count(self, **changes):
+        """Adds changes to the stored stats."""
+
+        def _update():
+            counts = self.stats()
+            for key, change in changes.items():
+                counts[key] += change
+            write_atomically(
+                os.path.join(self.root, STATS_NAME),
+                json.dumps(counts, sort_keys=True).encode("utf-8"),
+            )
+
+        try:
+            self._locked(_update)
+        except (IOError, OSError) as error:
+            logging.info("Could not update the store's stats: %r", error)
+
+    def lookup(self, key):
+        """Returns the path of the artifact stored by key, or None on a miss.
+
+        A hit marks the artifact as recently used.
+        """
+
+        directory = self._directory(key)
+        try:
+            path = os.path.join(directory, [
+                name for name in os.listdir(directory) if
+                not name.startswith(".tmp-")
+            ][0])
+            os.utime(path, None)
+        except (IndexError, OSError):
+            self._count(misses=1)
+            return None
+        self._count(hits=1)
+        return path
+
+    def fetch(self, key, dist_dir):
+        """Copies the artifact stored by key into dist_dir.
+
+        Returns:
+            the path of the copy, or None if it isn't in the store
+        """
+
+        stored = self.lookup(key)
+        if stored is None:
+            return None
+        path = os.path.join(dist_dir, os.path.basename(stored))
+        try:
+            self._copy(stored, path)
+        except (IOError, OSError) as error:  # evicted since the lookup
+            logging.info("Could not fetch %s: %r", stored, error)
+            return None
+        return path
+
+    def publish(self, key, path):
+        """Adds the artifact at path to the store, if it isn't already in it.
+
+        The artifact is copied in under a temporary name and renamed into
+        place, so concurrent readers and writers only see whole artifacts.
+        """
+
+        stored = os.path.join(self._directory(key), os.path.basename(path))
+        if os.path.isfile(stored):
+            return
+        try:
+            self._copy(path, stored)
+        except (IOError, OSError) as error:
+            logging.info("Could not store %s: %r", path, error)
+            return
+        self._count(published=1)
+        if self.max_size:
+            evicted = self._locked(self.evict)
+            if evicted:
+                self._count(evicted=evicted)
+
+    def _artifacts(self):
+        """Returns (last used, size, path) for every stored artifact."""
+
+        found = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if directory == self.root or name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, path))
+        return sorted(found)
+
+    def evict(self):
+        """Removes the least recently used artifacts until under max_size.
+
+        Call this holding the store's lock, so only one process evicts.
+
+        Returns:
+            the number of artifacts removed
+        """
+
+        artifacts = self._artifacts()
+        total = sum(size for _, size, _ in artifacts)
+        evicted = 0
+        for _, size, path in artifacts:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+
+def fetch_artifacts(store, record, commands):
+    """Copies what the store has of the record's artifacts into dist.
+
+    Args::
+
+        store: the ArtifactStore
+        record: the build's BuildRecord
+        commands: the setuptools commands being run
+
+    Returns:
+        list of the commands still needed to build the rest
+    """
+
+    if not record.inputs:
+        return commands
+
+    done = []
+    for command, key in record.keys().items():
+        path = store.fetch(key, record.dist_dir)
+        if path:
+            print("Using {} from the artifact store".format(path))
+            done.append(command)
+    return native.remaining(commands, done)
+
+
+def publish_artifacts(store, record):
+    """Adds the record's built artifacts to the store."""
+
+    if not record.inputs:
+        return
+
+    keys = record.keys()
+    for command, name in record.find_built().items():
+        store.publish(keys[command], os.path.join(record.dist_dir, name))
+
+
+def install_stored(store, config):
+    """Installs the config's wheel from the store with pip, if it's there.
+
+    Returns:
+        boolean of if the wheel was installed
+    """
+
+    inputs = input_fingerprint(config)
+    if not inputs:
+        return False
+
+    path = store.lookup(artifact_key(inputs, "bdist_wheel"))
+    if path is None:
+        return False
+
+    import subprocess
+
+    print("Installing {} from the artifact store".format(path))
+    pip = [sys.executable, "-m", "pip", "install"]
+    try:
+        subprocess.check_call(pip + ["--force-reinstall", "--no-deps", path])
+        if config._resolved_kwargs.get("install_requires"):
+            subprocess.check_call(pip + [path])  # any missing requirements
+    except subprocess.CalledProcessError as error:
+        raise SystemExit(error.returncode)
+    return True
@@ -0,0 +1,544 @@
+"""A single pass snapshot of the project tree.
+
+Guessing, package discovery and cleaning all need to look at every file down
+from the cwd. Rather than each of them walking the disk on their own, the tree
+is scanned once and the snapshot is queried by all of them.
+"""
+
+
+import os
+import ast
+import time
+from fnmatch import fnmatchcase
+from collections import OrderedDict
+
+try:
+    from os import scandir
+except ImportError:  # pragma: no cover
+    scandir = None
+
+from .cache import RACY_SECONDS
+from .cache import file_identity
+from .constants import STRING_TYPE
+
+
+# directories that nothing in pypackage ever wants to look inside of
+PRUNED_DIRS = (
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    ".eggs",
+)
+
+# virtualenvs made in the project root, a package named venv deeper down is
+# still a package to setuptools' find_packages
+ROOT_PRUNED_DIRS = (
+    ".venv",
+    "venv",
+)
+
+# snapshots kept between configs by long running processes, see keep_snapshots
+_KEPT = OrderedDict()
+_KEEPING = []
+KEPT_SNAPSHOTS = 16
+
+
+def keep_snapshots():
+    """Keeps snapshots for TreeSnapshot.kept, for long running processes."""
+
+    if not _KEEPING:
+        _KEEPING.append(True)
+
+
+class _Entry(object):
+    """Minimal stand-in for os.DirEntry, where scandir is not available."""
+
+    def __init__(self, root, name):
+        self.name = name
+        self.path = os.path.join(root, name)
+        self._stat = None
+
+    def is_dir(self):
+        return os.path.isdir(self.path)
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+    def is_file(self):
+        return os.path.isfile(self.path)
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def _identity(path):
+    """Returns the file_identity of path, or None if it's gone."""
+
+    try:
+        return file_identity(os.stat(path))
+    except OSError:
+        return None
+
+
+def _scandir(path):
+    """Yields os.DirEntry (like) objects for the contents of path."""
+
+    if scandir is not None:
+        return scandir(path)
+    return (  # pragma: no cover
+        _Entry(path, name) for name in os.listdir(path)
+    )
+
+
+def _rebased(path, old_root, new_root):
+    """Returns path, which is joined onto old_root, joined onto new_root."""
+
+    if path == old_root:
+        return new_root
+    return os.path.join(new_root, path[len(old_root):].lstrip(os.sep))
+
+
+def _rooted(root, paths):
+    """Returns a frozenset of the relative paths joined onto root."""
+
+    return frozenset(os.path.join(root, os.path.normpath(path)) for path in
+                     paths)
+
+
+class TreeSnapshot(object):
+    """Snapshot of all directories and files down from root.
+
+    Args::
+
+        root: the directory to scan, paths are relative to it like os.walk's
+        pruned: directory names which are never descended into
+        skip_dir: callable taking a directory path, returning True if it
+                  should not be scanned at all (or None)
+        root_pruned: paths relative to root of directories which are never
+                     descended into
+    """
+
+    def __init__(self, root=os.curdir, pruned=PRUNED_DIRS, skip_dir=None,
+                 root_pruned=ROOT_PRUNED_DIRS):
+        self.root = root
+        self._pruned = set(pruned)
+        self._root_pruned = _rooted(root, root_pruned)
+        self._skip_dir = skip_dir
+        self._dirs = {}     # directory path: (directory names, file names)
+        self._entries = {}  # file path: DirEntry, type and stat info cached
+        self._dir_entries = {}  # directory path: DirEntry, for their stats
+        self._left_out = {}  # directory path: names of directories not scanned
+        self._stat_sources = ()
+        self.complete = True  # has everything on disk but what was left out
+        self._scan()
+
+    @classmethod
+    def from_files(cls, file_paths, root=os.curdir, pruned=PRUNED_DIRS,
+                   skip_dir=None, stat_sources=(),
+                   root_pruned=ROOT_PRUNED_DIRS):
+        """Builds a snapshot from a list of files rather than scanning root.
+
+        Files missing from the disk are left out, as are any under a pruned
+        or skipped directory.
+
+        Args::
+
+            file_paths: paths of the files to include, joined onto root
+            root: the directory the paths are relative to
+            pruned: directory names which are never descended into
+            skip_dir: callable taking a directory path, returning True if it
+                      should be left out (or None)
+            stat_sources: extra files whose stats identify the listing, like
+                          the index it came from, for directory_stats
+            root_pruned: paths relative to root of directories which are
+                         left out
+
+        Returns:
+            TreeSnapshot
+        """
+
+        tree = cls.__new__(cls)
+        tree.root = root
+        tree._pruned = set(pruned)
+        tree._root_pruned = _rooted(root, root_pruned)
+        tree._skip_dir = skip_dir
+        tree._dirs = {root: ([], [])}
+        tree._entries = {}
+        tree._dir_entries = {}
+        tree._left_out = {}
+        tree._stat_sources = tuple(stat_sources)
+        tree.complete = False
+
+        skipped = {}
+        for file_path in file_paths:
+            directory, name = os.path.split(file_path)
+            if not tree._add_directory(directory, skipped):
+                continue
+
+            entry = _Entry(directory, name)
+            try:
+                entry.stat()
+            except OSError:
+                continue
+            tree._dirs[directory][1].append(name)
+            tree._entries[file_path] = entry
+
+        return tree
+
+    @classmethod
+    def kept(cls, key, root=os.curdir, pruned=PRUNED_DIRS, skip_dir=None,
+             root_pruned=ROOT_PRUNED_DIRS):
+        """Returns a snapshot of root, reusing a kept one if it's current.
+
+        A kept snapshot is current if none of its directories have changed
+        since it was scanned, its files are stat'd again as they're used.
+        Snapshots are kept by the absolute path of root, one scanned from
+        another spelling of the same directory is returned rebased onto root.
+        Without keep_snapshots, this is the same as a new TreeSnapshot.
+
+        Args::
+
+            key: hashable identity of everything which skip_dir depends on
+            root: the directory to scan, paths are relative to it
+            pruned: directory names which are never descended into
+            skip_dir: callable taking a directory path, returning True if it
+                      should not be scanned at all (or None)
+            root_pruned: paths relative to root of directories which are
+                         never descended into
+        """
+
+        if not _KEEPING:
+            return cls(root, pruned, skip_dir, root_pruned)
+
+        base = os.path.abspath(root)
+        key = (base, tuple(pruned), tuple(root_pruned), key)
+        tree, identities = _KEPT.pop(key, (None, None))
+        if tree is None or any(
+                _identity(path) != identity for path, identity in
+                identities.items()):
+            started = time.time()
+            tree = cls(root, pruned, skip_dir, root_pruned)
+            identities = dict(
+                (_rebased(path, root, base), file_identity(stat)) for
+                path, stat in tree.directory_stats()
+            )
+            if any(identity[1] >= (started - RACY_SECONDS) * 1e9 for
+                   identity in identities.values()):
+                return tree  # too fresh to trust, scan it again next time
+
+        _KEPT[key] = (tree, identities)
+        while len(_KEPT) > KEPT_SNAPSHOTS:
+            _KEPT.popitem(last=False)
+        return tree._copy(root)
+
+    def _copy(self, root=None):
+        """Returns a copy of the snapshot which stats its files afresh.
+
+        Args::
+
+            root: the same directory as the snapshot's root, spelled as the
+                  copy's paths should be relative to (or None to keep it)
+        """
+
+        old_root = self.root
+        if root is None or root == old_root:
+            root = old_root
+            dirs = self._dirs
+            dir_entries = self._dir_entries
+            left_out = self._left_out
+            root_pruned = self._root_pruned
+            file_paths = self._entries
+        else:
+            dirs = dict(
+                (_rebased(path, old_root, root), listing) for path, listing in
+                self._dirs.items()
+            )
+            dir_entries = dict(
+                (path, _Entry(*os.path.split(path))) for path in
+                (_rebased(path, old_root, root) for path in self._dir_entries)
+            )
+            left_out = dict(
+                (_rebased(path, old_root, root), names) for path, names in
+                self._left_out.items()
+            )
+            root_pruned = frozenset(
+                _rebased(path, old_root, root) for path in self._root_pruned
+            )
+            file_paths = [
+                _rebased(path, old_root, root) for path in self._entries
+            ]
+
+        tree = self.__class__.__new__(self.__class__)
+        tree.root = root
+        tree._pruned = self._pruned
+        tree._root_pruned = root_pruned
+        tree._skip_dir = self._skip_dir
+        tree._dirs = dirs
+        tree._entries = dict(
+            (path, _Entry(*os.path.split(path))) for path in file_paths
+        )
+        tree._dir_entries = dir_entries
+        tree._left_out = left_out
+        tree._stat_sources = self._stat_sources
+        tree.complete = self.complete
+        return tree
+
+    def _add_directory(self, path, skipped):
+        """Adds path and its parents to the snapshot, if they aren't skipped.
+
+        Args::
+
+            path: directory path, relative to the root like os.walk's
+            skipped: dict of {path: boolean} already decided, updated
+
+        Returns:
+            boolean of if path is in the snapshot
+        """
+
+        if path in self._dirs:
+            return True
+        if path in skipped:
+            return not skipped[path]
+
+        parent, name = os.path.split(path)
+        skip = not name or self._is_pruned(path, name) or \
+            not self._add_directory(parent, skipped) or \
+            bool(self._skip_dir and self._skip_dir(path))
+        skipped[path] = skip
+        if not skip:
+            self._dirs[parent][0].append(name)
+            self._dirs[path] = ([], [])
+            self._dir_entries[path] = _Entry(parent, name)
+        return not skip
+
+    def _is_pruned(self, path, name):
+        """Returns a boolean of if the directory at path is pruned."""
+
+        return name in self._pruned or path in self._root_pruned
+
+    def _scan(self):
+        """Walks the tree from root once, filling in _dirs and _entries."""
+
+        to_scan = [self.root]
+        while to_scan:
+            top = to_scan.pop()
+            directories, files = [], []
+            try:
+                entries = list(_scandir(top))
+            except OSError:
+                entries = []
+
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    path = os.path.join(top, entry.name)
+                    if self._is_pruned(path, entry.name) or \
+                            (self._skip_dir and self._skip_dir(path)):
+                        self._left_out.setdefault(top, []).append(entry.name)
+                        continue
+                    directories.append(entry.name)
+                    # like os.walk, symlinked directories are listed only
+                    if not entry.is_symlink():
+                        self._dir_entries[path] = entry
+                        to_scan.append(path)
+                else:
+                    files.append(entry.name)
+                    self._entries[os.path.join(top, entry.name)] = entry
+
+            self._dirs[top] = (directories, files)
+
+    def walk(self, skip_dir=None):
+        """Walks the snapshot top down, in the same fashion as os.walk.
+
+        Args:
+            skip_dir: callable taking a directory path, returning True if it
+                      (and everything below it) should not be walked
+
+        Yields:
+            tuples of (directory path, directory names, file names)
+        """
+
+        to_walk = [self.root]
+        while to_walk:
+            top = to_walk.pop()
+            if top not in self._dirs:
+                continue  # symlinked directory, listed but not scanned
+
+            directories, files = self._dirs[top]
+            if skip_dir is not None:
+                directories = [d for d in directories if
+                               not skip_dir(os.path.join(top, d))]
+
+            yield top, list(directories), list(files)
+
+            to_walk.extend(
+                os.path.join(top, d) for d in reversed(directories)
+            )
+
+    def files(self, directory=None):
+        """Returns the list of file names directly inside of directory."""
+
+        directory = self._path(directory)
+        return list(self._dirs.get(directory, ((), ()))[1])
+
+    def directories(self, directory=None):
+        """Returns the list of directory names directly inside of directory."""
+
+        directory = self._path(directory)
+        return list(self._dirs.get(directory, ((), ()))[0])
+
+    def listing(self, directory=None):
+        """Returns what is on disk in directory, if the snapshot knows it.
+
+        Returns:
+            tuple of (set of file names, list of directory names, including
+            any which were pruned or skipped), or None if the directory
+            wasn't scanned or the snapshot wasn't scanned from the disk
+        """
+
+        directory = self._path(directory)
+        if not self.complete or directory not in self._dirs:
+            return None
+        directories, files = self._dirs[directory]
+        return set(files), directories + self._left_out.get(directory, [])
+
+    def isdir(self, path):
+        """Returns a boolean of if path is a scanned directory."""
+
+        return self._path(path) in self._dirs
+
+    def isfile(self, path):
+        """Returns a boolean of if path is a file in the snapshot."""
+
+        return self._path(path) in self._entries
+
+    def stat(self, path):
+        """Returns the (cached) stat result for a file in the snapshot."""
+
+        return self._entries[self._path(path)].stat()
+
+    def paths(self):
+        """Returns a list of the paths of every file in the snapshot."""
+
+        return list(self._entries)
+
+    def directory_stats(self):
+        """Yields (path, stat result) tuples for every scanned directory."""
+
+        for path in self._stat_sources:
+            yield path, os.stat(path)
+        for path in self._dirs:
+            if path == self.root:
+                yield path, os.stat(path)
+            else:
+                yield path, self._dir_entries[path].stat()
+
+    def find_packages(self, where=os.curdir, exclude=(), include=("*",),
+                      namespaces=False):
+        """Finds python packages the same way setuptools.find_packages does.
+
+        Args::
+
+            where: directory to search from, relative to the snapshot's root
+            exclude: sequence of package name patterns to exclude
+            include: sequence of package name patterns to include
+            namespaces: boolean to find PEP 420 namespace packages as well,
+                        like setuptools.find_namespace_packages
+
+        Returns:
+            list of package names
+        """
+
+        exclude = ("ez_setup", "*__pycache__") + tuple(exclude)
+        base = self._path(where)
+        packages = []
+
+        to_walk = [base]
+        while to_walk:
+            top = to_walk.pop()
+            sub_packages = []
+            for directory in self._dirs.get(top, ((), ()))[0]:
+                full_path = os.path.join(top, directory)
+                if "." in directory or (not namespaces and os.path.join(
+                        full_path, "__init__.py") not in self._entries):
+                    continue
+
+                package = os.path.relpath(full_path, base).replace(
+                    os.path.sep, "."
+                )
+                if any(fnmatchcase(package, pat) for pat in include) and \
+                        not any(fnmatchcase(package, pat) for pat in exclude):
+                    packages.append(package)
+                sub_packages.append(full_path)
+
+            to_walk.extend(reversed(sub_packages))
+
+        return packages
+
+    def _path(self, path):
+        """Converts a path into the key format used in the snapshot."""
+
+        if path is None or os.path.normpath(path) == os.curdir:
+            return self.root
+        return os.path.join(self.root, os.path.normpath(path))
+
+
+# the setuptools finder functions, and if they find namespace packages
+FINDERS = {
+    "find_packages": False,
+    "find_namespace_packages": True,
+}
+
+
+def parse_find_packages(spec):
+    """Parses a find_packages(...) call string, without evaluating it.
+
+    Only literal arguments are accepted, positionally or by keyword, in the
+    same order as setuptools' find_packages(where, exclude, include).
+
+    Args::
+
+        spec: string like 'find_packages(exclude=["tests"])'
+
+    Returns:
+        dict of keyword arguments for TreeSnapshot.find_packages, or None if
+        spec is not a find_packages or find_namespace_packages call
+    """
+
+    try:
+        call = ast.parse(spec.strip(), mode="eval").body
+    except (SyntaxError, ValueError, TypeError):
+        return None
+
+    if not isinstance(call, ast.Call) or \
+            not isinstance(call.func, ast.Name) or \
+            call.func.id not in FINDERS or \
+            getattr(call, "starargs", None) or getattr(call, "kwargs", None):
+        return None
+
+    names = ("where", "exclude", "include")
+    if len(call.args) > len(names):
+        return None
+
+    kwargs = {"namespaces": FINDERS[call.func.id]}
+    try:
+        for name, arg in zip(names, call.args):
+            kwargs[name] = ast.literal_eval(arg)
+        for keyword in call.keywords:
+            if keyword.arg not in names or keyword.arg in kwargs:
+                return None
+            kwargs[keyword.arg] = ast.literal_eval(keyword.value)
+    except ValueError:
+        return None
+
+    for name in ("exclude", "include"):
+        if isinstance(kwargs.get(name), STRING_TYPE):
+            return None  # would be iterated per character, not intended
+    return kwargs
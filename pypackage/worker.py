@@ -0,0 +1,402 @@
+"""Optional background worker to run the py-* commands warm.
+
+Started with ``py-worker``, the worker listens on a Unix socket and keeps
+pypackage and its dependencies imported, with the metadata files it has seen
+parsed and the project trees it has seen scanned. Each command is run in a
+child forked from the worker, using the client's cwd, argv, environment and
+its actual stdin, stdout and stderr, which are passed over the socket.
+
+The console scripts forward themselves to a running worker and fall back to
+running in process if there isn't one, or if it runs another interpreter or
+version of pypackage, so nothing changes without it. Commands which will
+prompt the user always run in process, a child of the worker isn't in the
+terminal's foreground process group to read from it.
+"""
+
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import errno
+import signal
+import logging
+
+from .tree import keep_snapshots
+from .cache import file_identity
+from .config import get_config
+from .constants import dist_version
+
+
+# set to the socket path to use, if not the default in the user's home
+SOCKET_ENV = "PYPACKAGE_WORKER"
+
+DEFAULT_SOCKET = os.path.join("~", ".pypackage-worker.sock")
+
+# seconds without a request before the worker exits on its own
+IDLE_TIMEOUT = 3600
+
+# seconds between checks for idleness and changes to pypackage itself
+POLL_INTERVAL = 1.0
+
+# true in the children of the worker, so they don't forward to themselves
+_IN_WORKER = []
+
+
+def socket_path():
+    """Returns the path of the worker's socket."""
+
+    return os.path.expanduser(os.environ.get(SOCKET_ENV) or DEFAULT_SOCKET)
+
+
+def supported():
+    """Return a boolean of if the worker can be used on this platform."""
+
+    import socket
+
+    return hasattr(socket, "AF_UNIX") and hasattr(socket.socket, "sendmsg")
+
+
+def _read_line(reader):
+    """Reads a single newline terminated JSON message, or None at the end.
+
+    Args::
+
+        reader: a file object from the socket's makefile
+    """
+
+    line = reader.readline()
+    if not line.endswith(b"\n"):
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def _send_line(connection, message):
+    """Sends message as a single newline terminated JSON line."""
+
+    connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def forward(command):
+    """Runs command in the worker, if one is running.
+
+    Args::
+
+        command: the name of the function in pypackage.commands to run
+
+    Returns:
+        the command's exit status, or None if it should be run in process
+    """
+
+    if _IN_WORKER or not os.path.exists(socket_path()) or not supported():
+        return None
+
+    import array
+    import socket
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    reader = client.makefile("rb")
+    try:
+        client.connect(socket_path())
+        client.sendmsg(
+            [json.dumps({
+                "command": command,
+                "argv": sys.argv,
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+                "executable": sys.executable,
+                "version": dist_version(),
+            }).encode("utf-8") + b"\n"],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+              array.array("i", [0, 1, 2]).tobytes())],
+        )
+        started = _read_line(reader)
+    except (socket.error, ValueError):
+        started = None
+
+    if started is None or started.get("pid") is None:
+        reader.close()  # no worker, or one which can't run this client
+        client.close()
+        return None
+
+    try:
+        while True:
+            try:
+                finished = _read_line(reader)
+                break
+            except KeyboardInterrupt:
+                # the child isn't in our process group, pass the ^C along
+                os.kill(started["pid"], signal.SIGINT)
+    finally:
+        reader.close()
+        client.close()
+
+    if finished is None:
+        raise SystemExit("The pypackage worker exited during the command")
+    return finished["status"]
+
+
+def forwarded(func, prompts=None):
+    """Runs func in the worker when there is one, otherwise in process.
+
+    Args::
+
+        func: the command function, named as it is in pypackage.commands
+        prompts: callable returning True if func will prompt the user, to
+                 run it in process instead (or None)
+    """
+
+    def _forwarded():
+        """Inner wrap function, forward to the worker or call func."""
+
+        status = None if prompts and prompts() else forward(func.__name__)
+        if status is None:
+            return func()
+        elif status:
+            raise SystemExit(status)
+
+    _forwarded.__name__ = func.__name__
+    _forwarded.__doc__ = func.__doc__
+    return _forwarded
+
+
+def forwarded_unless(prompts):
+    """Decorator to run a command in the worker unless prompts() is True."""
+
+    return lambda func: forwarded(func, prompts)
+
+
+def _exit_status(code):
+    """Returns an exit status for the code of a SystemExit, like python."""
+
+    if code is None:
+        return 0
+    elif isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _run_child(connection, request, fds):
+    """Runs the request in this forked child, then exits it.
+
+    Args::
+
+        connection: the client's socket
+        request: the decoded request from the client
+        fds: the client's stdin, stdout and stderr file descriptors
+    """
+
+    from . import commands
+
+    _IN_WORKER.append(True)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    status = 1
+    try:
+        for target, source in enumerate(fds):
+            os.dup2(source, target)
+            os.close(source)
+        _send_line(connection, {"pid": os.getpid()})
+
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        sys.argv = request["argv"]
+
+        try:
+            getattr(commands, request["command"])()
+            status = 0
+        except SystemExit as error:
+            status = _exit_status(error.code)
+        except KeyboardInterrupt:
+            status = 130
+        except Exception:
+            logging.exception("py-%s failed in the worker", request["command"])
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+        _send_line(connection, {"status": status})
+    finally:
+        os._exit(0)
+
+
+def _accept(listener):
+    """Accepts one request, forking a child to run it.
+
+    Returns:
+        the decoded request, or None if it wasn't a valid one
+    """
+
+    import array
+    import socket
+
+    connection, _ = listener.accept()
+    connection.settimeout(None)
+    fds = array.array("i")
+    try:
+        message, ancillary, _, _ = connection.recvmsg(
+            65536, socket.CMSG_SPACE(3 * fds.itemsize),
+        )
+        for level, kind, data in ancillary:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+
+        while message and not message.endswith(b"\n"):
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            message += chunk
+
+        try:
+            request = json.loads(message.decode("utf-8"))
+        except ValueError:
+            return None
+
+        if len(fds) != 3:
+            return None
+        elif request["command"] == "stop":
+            _send_line(connection, {"pid": os.getpid()})
+            _send_line(connection, {"status": 0})
+        elif request.get("executable") != sys.executable or \
+                request.get("version") != dist_version():
+            _send_line(connection, {"pid": None})  # run it in the client
+            return None
+        else:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                listener.close()
+                _run_child(connection, request, fds)
+        return request
+    finally:
+        for fd in fds:
+            os.close(fd)
+        connection.close()
+
+
+def _warm(cwd):
+    """Loads the config and tree for cwd, so the next child has them.
+
+    This runs in the worker between requests, without changing its cwd.
+    """
+
+    try:
+        config = get_config(cwd)
+        config._root = cwd
+        config._project_tree
+    except Exception:  # pragma: no cover
+        logging.debug("could not warm %s", cwd, exc_info=True)
+
+
+def _reap():
+    """Waits on any finished children."""
+
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except OSError:
+            return
+        if not pid:
+            return
+
+
+def _module_identities():
+    """Returns the identities of pypackage's own loaded source files."""
+
+    identities = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if name.split(".")[0] == "pypackage" and path:
+            try:
+                identities[path] = file_identity(os.stat(path))
+            except OSError:
+                identities[path] = None
+    return identities
+
+
+def serve(path=None, idle_timeout=IDLE_TIMEOUT):
+    """Runs the worker in the foreground until idle, stopped or outdated.
+
+    Args::
+
+        path: the socket path to listen on, defaults to socket_path()
+        idle_timeout: seconds without requests before exiting
+    """
+
+    import socket
+    from . import commands  # noqa, imported once here for every child
+
+    keep_snapshots()
+    path = path or socket_path()
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error:
+            os.unlink(path)  # left over from a worker which didn't exit
+        else:
+            raise SystemExit("A pypackage worker is already using {}".format(
+                path
+            ))
+        finally:
+            probe.close()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o077)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(umask)
+    listener.listen(16)
+    listener.settimeout(POLL_INTERVAL)
+
+    modules = _module_identities()
+    last_request = time.time()
+    try:
+        while True:
+            try:
+                request = _accept(listener)
+            except socket.timeout:
+                request = None
+            except socket.error as error:
+                if error.errno != errno.EINTR:
+                    raise
+                request = None
+            else:
+                last_request = time.time()
+
+            if request is not None:
+                if request["command"] == "stop":
+                    break
+                _warm(request["cwd"])
+
+            _reap()
+            if time.time() - last_request > idle_timeout:
+                logging.info("pypackage worker idle, exiting")
+                break
+            if _module_identities() != modules:
+                logging.info("pypackage changed on disk, worker exiting")
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        try:
+            os.unlink(path)
+        except OSError:  # pragma: no cover
+            pass
+
+
+def stop():
+    """Asks the running worker to exit.
+
+    Returns:
+        boolean of if there was a worker to stop
+    """
+
+    if _IN_WORKER or not supported():
+        return False
+    return forward("stop") is not None
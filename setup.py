@@ -47,7 +47,6 @@ setup(
         "setuptools >= 15.0",
         "pytest     >= 2.7.0",
         "nose       >= 1.3.0",
-        "PyYAML     >= 3.0",
     ],
     cmdclass={"test": PyTest},
     tests_require=["mock", "pytest", "pytest-cov", "requests"],
@@ -59,6 +58,7 @@ setup(
         "py-setup   = pypackage.commands:setup",
         "py-test    = pypackage.commands:run_tests",
         "py-clean   = pypackage.commands:clean",
+        "py-worker  = pypackage.commands:worker",
     ]},
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -3,6 +3,8 @@
 
 import os
 import sys
+import glob
+import json
 import pytest
 import random
 import shutil
@@ -206,6 +208,39 @@ def source_release(request, new_package):
     return new_module, source_label, source_url
 
 
+@pytest.fixture
+def run_build():
+    """Returns a function to run py-build with some metadata settings.
+
+    The function takes keyword args to update the metadata file with, and
+    empty_dist to remove what's in dist first. It returns the dist paths.
+    """
+
+    from pypackage.commands import build
+
+    def _run_build(empty_dist=True, **settings):
+        """Runs py-build, returns the sorted paths of the files in dist."""
+
+        # distutils remembers the directories it made, so only empty dist
+        if empty_dist:
+            for path in glob.glob(os.path.join("dist", "*")):
+                os.remove(path)
+
+        metadata = {}
+        if os.path.isfile(META_NAME):
+            with open(META_NAME) as openmeta:
+                metadata = json.load(openmeta)
+        metadata.update(settings)
+        with open(META_NAME, "w") as openmeta:
+            json.dump(metadata, openmeta)
+
+        sys.argv = ["py-build"]
+        build()
+        return sorted(glob.glob(os.path.join("dist", "*")))
+
+    return _run_build
+
+
 def module_cleanup():
     """Used to cleanup the testing module."""
 
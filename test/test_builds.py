@@ -10,6 +10,7 @@ import tarfile
 import zipfile
 
 from pypackage.commands import build
+from pypackage.fingerprint import FINGERPRINT_NAME
 
 
 def verify_wheel(expected, zip_path):
@@ -73,11 +74,13 @@ def verify_source(source_files, gz_path):
 
 
 def verify_artifacts(mod_dir):
-    """Asserts the dist directory exists and has two files in it."""
+    """Asserts the dist directory exists and has two artifacts in it."""
 
     dist_dir = os.path.join(mod_dir, "dist")
     assert os.path.isdir(dist_dir)
-    assert len(os.listdir(dist_dir)) == 2, "should have wheel and src"
+    artifacts = [name for name in os.listdir(dist_dir) if
+                 name != FINGERPRINT_NAME]
+    assert len(artifacts) == 2, "should have wheel and src"
     return dist_dir
 
 
@@ -149,14 +152,18 @@ def test_manifest_mixin(with_data):
 
     tar_fname = glob.glob(os.path.join(dist_dir, "*.tar.gz"))[0]
     with tarfile.open(tar_fname, "r:gz") as tar_file:
-        tar_file.getnames()
+        names = tar_file.getnames()
         manifest = [f for f in tar_file.members if "MANIFEST.in" in f.name][0]
         content = tar_file.extractfile(manifest).read()
 
+        # the fully included data directory is compacted into one rule
         assert [codecs.decode(l, "utf-8") for l in content.splitlines()] == [
             "include {}/data/data_2".format(pkg_name),
-            "include {}/data/data_1".format(pkg_name),
+            "recursive-include {}/data *".format(pkg_name),
         ]
+        for data_file in ("data_1", "data_2"):
+            assert any(name.endswith("/".join([pkg_name, "data", data_file]))
+                       for name in names)
 
 
 def test_with_scripts(with_scripts):
@@ -0,0 +1,207 @@
+"""Tests for the on disk guesswork cache."""
+
+
+import os
+import json
+import time
+import mock
+import pytest
+
+from pypackage import cache
+from pypackage import guessing
+from pypackage.tree import TreeSnapshot
+from pypackage.config import get_config
+from pypackage.cmdline import get_options
+
+
+def age_tree(seconds=60):
+    """Moves the mtime of everything in the cwd back, so it isn't racy."""
+
+    old = time.time() - seconds
+    for root, directories, files in os.walk(os.curdir):
+        for name in files + directories:
+            os.utime(os.path.join(root, name), (old, old))
+    os.utime(os.curdir, (old, old))
+
+
+@pytest.fixture
+def versioned_package(simple_package):
+    """Writes a version and author into the simple_package's __init__.py."""
+
+    pkg_name = os.path.basename(simple_package)
+    init_file = os.path.join(pkg_name, "__init__.py")
+    with open(init_file, "w") as openinit:
+        openinit.write("__version__ = '1.2.3'\n__author__ = 'someone'\n")
+    age_tree()
+    return simple_package, init_file
+
+
+def test_warm_cache_reads_nothing(versioned_package):
+    """With an unchanged tree, find_in_files should not read any files."""
+
+    guess_cache = cache.GuessCache()
+    cold = guessing.find_in_files(TreeSnapshot(), guess_cache)
+    guess_cache.save()
+
+    guess_cache = cache.GuessCache()
+    with mock.patch.object(guessing, "file_assignments") as patched:
+        warm = guessing.find_in_files(TreeSnapshot(), guess_cache)
+
+    assert not patched.called
+    assert warm == cold
+    assert warm["version"] == "1.2.3"
+
+
+def test_changed_file_is_rescanned(versioned_package):
+    """Files whose identity changed are read again."""
+
+    root, init_file = versioned_package
+    guess_cache = cache.GuessCache()
+    guessing.find_in_files(TreeSnapshot(), guess_cache)
+    guess_cache.save()
+
+    with open(init_file, "w") as openinit:
+        openinit.write("__version__ = '2.0.0-changed'\n")
+
+    found = guessing.find_in_files(TreeSnapshot(), cache.GuessCache())
+    assert found["version"] == "2.0.0-changed"
+    assert "author" not in found
+
+
+def test_listing_invalidated_by_new_files(versioned_package):
+    """Adding a file changes the tree identity, invalidating listings."""
+
+    root, init_file = versioned_package
+    guess_cache = cache.GuessCache()
+    assert guessing.potential_data_files([], TreeSnapshot(), guess_cache) == []
+    guess_cache.save()
+
+    data_file = os.path.join(os.path.dirname(init_file), "data.txt")
+    with open(data_file, "w") as opendata:
+        opendata.write("some data")
+
+    assert guessing.potential_data_files(
+        [], TreeSnapshot(), cache.GuessCache()
+    ) == [data_file]
+
+
+def test_other_versions_discarded(versioned_package):
+    """A cache written by another pypackage version is not used."""
+
+    guess_cache = cache.GuessCache()
+    guessing.find_in_files(TreeSnapshot(), guess_cache)
+    guess_cache.save()
+
+    with open(guess_cache.path, "r") as opencache:
+        cached = json.load(opencache)
+    cached["format"] = cache.CACHE_VERSION - 1
+    with open(guess_cache.path, "w") as opencache:
+        json.dump(cached, opencache)
+
+    assert cache.GuessCache()._files == {}
+
+
+def test_guesswork_saves_cache(versioned_package, reset_sys_argv):
+    """perform_guesswork should write the cache in the configured dir."""
+
+    with open("pypackage.meta", "w") as openmeta:
+        openmeta.write('{"cache_dir": "guess-cache"}')
+    age_tree()
+
+    conf = get_config()
+    guessing.perform_guesswork(conf, get_options())
+
+    assert conf.version == "1.2.3"
+    assert os.path.isfile(os.path.join("guess-cache", cache.CACHE_NAME))
+    assert conf._metadata["cache_dir"] == "guess-cache"
+    assert not conf._project_tree.isdir("guess-cache")
+
+
+def test_cache_dir_pruned_from_root_only(simple_package):
+    """Only the cache_dir itself is left out, not directories of its name."""
+
+    package = [name for name in os.listdir(".") if
+               os.path.isfile(os.path.join(name, "__init__.py"))][0]
+    for directory in (os.path.join(package, "cache"),
+                      os.path.join(package, "a")):
+        os.mkdir(directory)
+        open(os.path.join(directory, "__init__.py"), "w").close()
+    os.makedirs(os.path.join("a", "b"))
+    os.mkdir("cache")
+    with open("pypackage.meta", "w") as openmeta:
+        openmeta.write('{"cache_dir": "a/b"}')
+
+    conf = get_config()
+    assert not conf._project_tree.isdir(os.path.join("a", "b"))
+    assert conf._project_tree.isdir("a")
+    assert sorted(conf._as_kwargs["packages"]) == [
+        package, package + ".a", package + ".cache",
+    ]
+
+    with open("pypackage.meta", "w") as openmeta:
+        openmeta.write('{"cache_dir": "cache"}')
+    conf = get_config()
+    assert not conf._project_tree.isdir("cache")
+    assert package + ".cache" in conf._as_kwargs["packages"]
+
+
+def test_cache_disabled(versioned_package, reset_sys_argv):
+    """An empty cache_dir disables the cache."""
+
+    with open("pypackage.meta", "w") as openmeta:
+        openmeta.write('{"cache_dir": ""}')
+
+    conf = get_config()
+    guessing.perform_guesswork(conf, get_options())
+
+    assert conf._guess_cache is None
+    assert not os.path.exists(cache.DEFAULT_CACHE_DIR)
+
+
+def test_file_digest_cached(versioned_package):
+    """Unchanged files are hashed once, changed ones are hashed again."""
+
+    _, init_file = versioned_package
+    os.utime(init_file, (1000000000, 1000000000))  # not racy
+    guess_cache = cache.GuessCache()
+    digest = guess_cache.file_digest(init_file, os.stat(init_file))
+    assert digest == cache.content_digest(init_file)
+    guess_cache.save()
+
+    guess_cache = cache.GuessCache()
+    with mock.patch.object(cache, "content_digest") as patched:
+        assert guess_cache.file_digest(init_file,
+                                       os.stat(init_file)) == digest
+    assert not patched.called
+
+    with open(init_file, "a") as openinit:
+        openinit.write("# changed\n")
+    assert guess_cache.file_digest(init_file, os.stat(init_file)) != digest
+
+
+def test_racy_files_not_cached(versioned_package):
+    """Files and trees changed in the last RACY_SECONDS aren't cached."""
+
+    _, init_file = versioned_package
+    with open(init_file, "a") as openinit:
+        openinit.write("# just changed\n")
+    data_file = os.path.join(os.path.dirname(init_file), "data.txt")
+    with open(data_file, "w") as opendata:
+        opendata.write("new in the package directory")
+
+    guess_cache = cache.GuessCache()
+    guessing.find_in_files(TreeSnapshot(), guess_cache)
+    guessing.potential_data_files([], TreeSnapshot(), guess_cache)
+
+    assert os.path.abspath(init_file) not in guess_cache._files
+    assert "package_data" not in guess_cache._listings
+
+    age_tree()
+    guessing.find_in_files(TreeSnapshot(), guess_cache)
+    guessing.potential_data_files([], TreeSnapshot(), guess_cache)
+    assert os.path.abspath(init_file) in guess_cache._files
+    assert "package_data" in guess_cache._listings
+
+
+if __name__ == "__main__":
+    pytest.main(["-rx", "-v", "--pdb", __file__])
@@ -14,5 +14,16 @@ def test_get_options(reset_sys_argv):
         assert getattr(options, opt)
 
 
+@pytest.mark.parametrize("argv, expected", [
+    (["py-build", "-s", "-j", "4"], "4"),
+    (["py-build", "--jobs", "8", "-s"], "8"),
+    (["py-build", "--jobs=2"], "2"),
+    (["py-build", "-s"], None),
+])
+def test_get_options__jobs(reset_sys_argv, argv, expected):
+    sys.argv = argv
+    assert get_options().jobs == expected
+
+
 if __name__ == "__main__":
     pytest.main(["-rx", "-v", "--pdb", __file__])
@@ -4,11 +4,47 @@
 import sys
 import mock
 import pytest
+import subprocess
 
 import pypackage
 from pypackage import commands
 
 
+# microseconds importing pypackage.commands may take, for every CLI start
+IMPORT_BUDGET = 250000
+
+
+def test_import_is_light():
+    """Test frameworks, setuptools and build or worker modules load lazily."""
+
+    heavy = ("setuptools", "pkg_resources", "nose", "pytest", "unittest",
+             "yaml", "multiprocessing", "tarfile", "zipfile", "socket")
+    output = subprocess.check_output([
+        sys.executable, "-c",
+        "import sys; loaded = set(sys.modules); import pypackage.commands; "
+        "print(' '.join(m for m in {!r} if m in sys.modules and "
+        "m not in loaded))".format(heavy),
+    ]).decode("utf-8")
+    assert output.split() == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="needs -X importtime")
+def test_import_time_budget():
+    """Importing the commands stays under the cold start budget."""
+
+    output = subprocess.check_output(
+        [sys.executable, "-X", "importtime", "-c",
+         "import pypackage.commands"],
+        stderr=subprocess.STDOUT,
+    ).decode("utf-8")
+    for line in output.splitlines():
+        if line.endswith("| pypackage.commands"):
+            assert int(line.split("|")[1]) < IMPORT_BUDGET
+            break
+    else:
+        pytest.fail("pypackage.commands import time not reported")
+
+
 def test_run_tests():
     """Ensure we call tests correctly..."""
 
@@ -141,7 +177,6 @@ def test_info__using_pkg_info(reset_sys_argv, capfd):
             "Source-url: http://yourcompany.com",
         ]:
             yield line
-        raise StopIteration
 
     mock_pkg = mock.Mock()
     mock_pkg.PKG_INFO = "PKG-INFO"
@@ -150,8 +185,10 @@ def test_info__using_pkg_info(reset_sys_argv, capfd):
     mockenv = mock.Mock()
     mockenv.__getitem__ = mock.Mock(return_value=[mock_pkg])
 
+    import pkg_resources  # imported by info when it's run
+
     environment_patch = mock.patch.object(
-        commands.pkg_resources,
+        pkg_resources,
         "Environment",
         return_value=mockenv,
     )
@@ -118,6 +118,24 @@ def test_additional_tests_require(runner):
     assert conf.runner_args[-1] == "changed"
 
 
+def test_verify__only_dependents():
+    """Verifying changed keys only runs the feature hooks depending on them."""
+
+    conf = Config(name="test", test_runner="pytest")
+    conf.name = "changed"
+    conf.keywords = "one"
+    with mock.patch.object(conf, "_enable_long_description_read") as long_:
+        conf._verify(keys=["name", "keywords"])
+
+    assert not long_.called
+    assert conf.runner_args[-1] == "changed"
+    assert conf.keywords == ["one"]
+
+    with mock.patch.object(conf, "_enable_test_runner") as runner:
+        conf._verify(keys=["license"])
+    assert not runner.called
+
+
 def test_verify_key__dict_failure():
     """Do not try to coerce something that should be a dict into one."""
 
@@ -229,6 +247,66 @@ def test_multiline():
     ]"""
 
 
+def test_json_loading__comments():
+    """Comment lines are skipped, line numbers in errors stay the same."""
+
+    filename = tempfile.mktemp()
+    with open(filename, "w") as openfile:
+        openfile.write('# top\n{\n  # indented\n  "name": "x",\n'
+                       '  "url": "http://#not-a-comment"\n}\n')
+
+    assert config.json_maybe_commented(filename) == {
+        "name": "x",
+        "url": "http://#not-a-comment",
+    }
+
+    with open(filename, "w") as openfile:
+        openfile.write('{\n# one\n# two\n  "name": "x",,\n}\n')
+
+    with pytest.raises(SystemExit) as error:
+        config.json_maybe_commented(filename)
+    assert " (originally line 4 in .meta)" in error.exconly()
+
+
+def test_load_metadata__cached():
+    """Metadata files are parsed once, until they change on disk."""
+
+    filename = tempfile.mktemp()
+    with open(filename, "w") as openfile:
+        openfile.write('{"name": "first", "classifiers": ["a"]}')
+
+    with mock.patch.object(config, "json_maybe_commented",
+                           wraps=config.json_maybe_commented) as patched:
+        loaded = config.load_metadata(filename)
+        loaded["classifiers"].append("b")
+        assert config.load_metadata(filename) == {
+            "name": "first",
+            "classifiers": ["a"],
+        }
+        assert patched.call_count == 1
+
+        with open(filename, "w") as openfile:
+            openfile.write('{"name": "second and longer"}')
+        assert config.load_metadata(filename) == {"name": "second and longer"}
+        assert patched.call_count == 2
+
+    os.remove(filename)
+    assert config.load_metadata(filename) is None
+
+
+def test_load_metadata__bounded():
+    """The metadata cache does not grow past its size."""
+
+    with mock.patch.object(config, "METADATA_CACHE_SIZE", 2):
+        for _ in range(4):
+            filename = tempfile.mktemp()
+            with open(filename, "w") as openfile:
+                openfile.write("{}")
+            config.load_metadata(filename)
+            os.remove(filename)
+        assert len(config._METADATA_CACHE) == 2
+
+
 def test_json_loading__failure():
     """Ensure the error logged and empty return value on invalid json file."""
 
@@ -293,13 +371,34 @@ def test_as_kwargs_finds_packages():
     """The _as_kwargs property should use find_packages."""
 
     conf = Config()
-    with mock.patch.object(config, "find_packages", return_value=4) as patched:
+    with mock.patch.object(config.TreeSnapshot, "find_packages",
+                           return_value=4) as patched:
         conf_args = conf._as_kwargs
 
     assert conf_args["packages"] == 4
     patched.assert_called_once_with(exclude=["test", "tests"])
 
 
+def test_as_kwargs_cached():
+    """Packages are only found again after an attribute changes."""
+
+    conf = Config()
+    with mock.patch.object(config.TreeSnapshot, "find_packages",
+                           return_value=["pkg"]) as patched:
+        first = conf._as_kwargs
+        first["name"] = "changed in the copy"
+        assert conf._as_kwargs.get("name") != "changed in the copy"
+        assert patched.call_count == 1
+
+        conf.name = "renamed"
+        assert conf._as_kwargs["name"] == "renamed"
+        assert patched.call_count == 2
+
+        del conf.name
+        assert "name" not in conf._as_kwargs
+        assert patched.call_count == 3
+
+
 def test_long_read_errors_buried(with_readme):
     """Errors when trying to read long_description file should be buried."""
 
@@ -309,6 +408,33 @@ def test_long_read_errors_buried(with_readme):
     assert not conf._long_read_in_setup
 
 
+def test_long_read_lazy(with_readme):
+    """The long_description file is only read when setuptools needs it."""
+
+    conf = config.get_config(with_readme[0])
+    assert conf._long_read_in_setup
+    assert conf._long_text is None
+
+    assert conf._metadata["long_description"] == "README"
+    assert "long_description=long_description" in str(conf)
+    assert conf._long_text is None
+
+    long_description = conf._setuptools_kwargs["long_description"]
+    assert long_description.endswith("'s readme... with content!")
+    assert conf._as_kwargs["long_description"] == "README"
+
+
+def test_long_read_bad_encoding(simple_package):
+    """A long_description file which isn't utf-8 is used as a string."""
+
+    with open("README", "wb") as openreadme:
+        openreadme.write(b"\xff\xfe not utf-8")
+
+    conf = Config(long_description="README")
+    assert not conf._long_read_in_setup
+    assert conf._setuptools_kwargs["long_description"] == "README"
+
+
 def test_write_pkg_info_shim(source_release):
     """Confirm the metadata shim to write out our extra metadata params."""
 
@@ -325,5 +451,101 @@ def test_write_pkg_info_shim(source_release):
     assert "Source-url: {}".format(source_url) in pkg_info
 
 
+def test_config_record_views(source_release):
+    """A ConfigRecord has the same views as the Config it was made from."""
+
+    pkg_root, source_label, source_url = source_release
+    conf = config.get_config(pkg_root)
+    record = config.ConfigRecord(conf)
+
+    assert record._metadata == conf._metadata
+    kwargs = record._as_kwargs
+    conf_kwargs = conf._as_kwargs
+    assert list(kwargs) == list(conf_kwargs)
+    assert kwargs["metadata"].source_label == source_label
+    assert kwargs["metadata"].source_url == source_url
+    assert record.source_label == conf.source_label
+
+    with pytest.raises(AttributeError):
+        record.not_a_key
+
+
+def test_config_record_compact(source_release):
+    """Records are read only, slotted and share their keys and defaults."""
+
+    pkg_root = source_release[0]
+    first, second = config.get_config_records([pkg_root, pkg_root])
+
+    assert not hasattr(first, "__dict__")
+    assert first._kwargs_keys is second._kwargs_keys
+    assert first._defaults is second._defaults
+
+    with pytest.raises(AttributeError):
+        first.name = "something else"
+    with pytest.raises(AttributeError):
+        del first.name
+
+
+def test_config_records_find_packages_per_path(source_release):
+    """Record packages are found from their own path, not the cwd."""
+
+    pkg_root = source_release[0]
+    packages = config.get_config(pkg_root)._as_kwargs["packages"]
+    os.chdir(os.path.dirname(pkg_root))
+
+    with mock.patch.object(config.TreeSnapshot, "kept",
+                           wraps=config.TreeSnapshot.kept) as patched:
+        record = config.get_config_records([pkg_root])[0]
+
+    assert record.packages == packages
+    assert [call[0][1] for call in patched.call_args_list] == [pkg_root]
+
+
+def test_config_records_share_defaults(source_release, move_home_pypackage):
+    """Values from the site defaults are shared, the interned are bounded."""
+
+    with open(move_home_pypackage, "w") as opensite:
+        json.dump({"classifiers": ["Programming Language :: Python"],
+                   "license": "MIT"}, opensite)
+
+    pkg_root = source_release[0]
+    first, second = config.get_config_records([pkg_root, pkg_root])
+    assert first.classifiers is second.classifiers
+    assert first.classifiers is first._defaults["classifiers"]
+
+    for index in range(config.INTERNED_SIZE + 10):
+        config._interned(("key_{}".format(index),))
+    assert len(config._INTERNED) == config.INTERNED_SIZE
+
+
+def test_config_records_memory(source_release):
+    """Records hold a fraction of the memory of full Config objects."""
+
+    tracemalloc = pytest.importorskip("tracemalloc")
+    pkg_root = source_release[0]
+    count = 200
+
+    def allocated(build):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            built = build()
+            return tracemalloc.get_traced_memory()[0] - before, built
+        finally:
+            tracemalloc.stop()
+
+    def full_configs():
+        configs = [config.get_config(pkg_root) for _ in range(count)]
+        for conf in configs:
+            conf._as_kwargs
+        return configs
+
+    config_size = allocated(full_configs)[0]
+    record_size = allocated(
+        lambda: config.get_config_records([pkg_root] * count)
+    )[0]
+    assert record_size * 3 < config_size
+
+
 if __name__ == "__main__":
     pytest.main(["-rx", "-v", "--pdb", __file__])
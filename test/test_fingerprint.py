@@ -0,0 +1,137 @@
+"""Tests for skipping builds when nothing has changed."""
+
+
+import os
+import sys
+import glob
+import json
+import mock
+
+from pypackage.config import get_config
+from pypackage.fingerprint import input_fingerprint
+from pypackage.constants import META_NAME
+from pypackage.fingerprint import BuildRecord
+from pypackage.fingerprint import FINGERPRINT_NAME
+
+
+def mtimes(paths):
+    """Returns a dict of {path: mtime} for the paths."""
+
+    return dict((path, os.stat(path).st_mtime) for path in paths)
+
+
+def test_fingerprint_stable(source_release):
+    """The Metadata shim fingerprints the same from any config or command."""
+
+    with open(META_NAME) as openmeta:
+        metadata = json.load(openmeta)
+    metadata["name"] = "thing"
+    with open(META_NAME, "w") as openmeta:
+        json.dump(metadata, openmeta)
+
+    sys.argv = ["py-build"]
+    built = input_fingerprint(get_config())
+    assert "metadata" in get_config()._as_kwargs
+    sys.argv = ["py-install"]
+    assert built is not None
+    assert input_fingerprint(get_config()) == built
+
+
+def test_unknown_value_not_fingerprinted(simple_package):
+    """Builds with values that have no stable encoding aren't skipped."""
+
+    config = get_config()
+    config.name = "thing"
+    config.zip_safe = object()
+    with mock.patch("logging.info") as patched:
+        assert input_fingerprint(config) is None
+    assert "can't be fingerprinted" in str(patched.call_args)
+
+
+def test_unchanged_build_skipped(with_data, capfd, run_build):
+    """Building again without changes leaves the artifacts alone."""
+
+    built = mtimes(run_build(empty_dist=False, native_build=True))
+    assert len(built) == 2
+    assert os.path.isfile(os.path.join("dist", FINGERPRINT_NAME))
+    capfd.readouterr()
+
+    assert mtimes(run_build(empty_dist=False, native_build=True)) == built
+    assert capfd.readouterr()[0].startswith("Nothing changed since ")
+
+
+def test_unchanged_setuptools_build_skipped(simple_package, capfd, run_build):
+    """Builds through setuptools are skipped the same way."""
+
+    built = mtimes(run_build(empty_dist=False, native_build=False))
+    capfd.readouterr()
+
+    assert mtimes(run_build(empty_dist=False, native_build=False)) == built
+    assert capfd.readouterr()[0].startswith("Nothing changed since ")
+
+
+def test_setuptools_artifact_names_recorded(simple_package, capfd, run_build):
+    """The record has the artifacts setuptools made, whatever their names."""
+
+    with open("setup.cfg", "w") as opencfg:
+        opencfg.write("[bdist_wheel]\nuniversal = 1\n")
+    built = mtimes(run_build(empty_dist=False, native_build=False))
+    capfd.readouterr()
+
+    with open(os.path.join("dist", FINGERPRINT_NAME)) as openrecord:
+        recorded = json.load(openrecord)["artifacts"]
+    assert recorded["bdist_wheel"][0].endswith("-py2.py3-none-any.whl")
+    assert sorted(os.path.join("dist", entry[0]) for entry in
+                  recorded.values()) == sorted(built)
+
+    assert mtimes(run_build(empty_dist=False, native_build=False)) == built
+    assert capfd.readouterr()[0].startswith("Nothing changed since ")
+
+
+def test_find_built(simple_package):
+    """Artifacts are found by their name and version, not a guessed name."""
+
+    with open(META_NAME, "w") as openmeta:
+        json.dump({"name": "Thing", "version": "1.0"}, openmeta)
+    os.mkdir("dist")
+    for name in ("thing-1.0-py2.py3-none-any.whl", "thing-1.0.tar.gz",
+                 "other-1.0-py3-none-any.whl", "thing-2.0.tar.gz"):
+        open(os.path.join("dist", name), "w").close()
+
+    record = BuildRecord(get_config(), ["sdist", "bdist_wheel"])
+    assert record.find_built() == {
+        "sdist": "thing-1.0.tar.gz",
+        "bdist_wheel": "thing-1.0-py2.py3-none-any.whl",
+    }
+
+
+def test_changed_input_rebuilds(with_data, capfd, run_build):
+    """Changing a file that goes in the artifacts builds them again."""
+
+    run_build(empty_dist=False, native_build=True)
+    data_file = [path for path in glob.glob(os.path.join("*", "data", "*"))
+                 if os.path.isfile(path)][0]
+    with open(data_file, "a") as opendata:
+        opendata.write("changed")
+    capfd.readouterr()
+
+    run_build(empty_dist=False, native_build=True)
+    assert "Nothing changed" not in capfd.readouterr()[0]
+
+
+def test_changed_artifact_rebuilds(simple_package, capfd, run_build):
+    """Missing or altered artifacts are built again."""
+
+    built = mtimes(run_build(empty_dist=False, native_build=True))
+    wheel = [path for path in built if path.endswith(".whl")][0]
+    with open(wheel, "ab") as openwheel:
+        openwheel.write(b"junk")
+    capfd.readouterr()
+
+    run_build(empty_dist=False, native_build=True)
+    assert "Nothing changed" not in capfd.readouterr()[0]
+
+    os.remove(wheel)
+    run_build(empty_dist=False, native_build=True)
+    assert "Nothing changed" not in capfd.readouterr()[0]
+    assert os.path.isfile(wheel)
@@ -0,0 +1,167 @@
+"""Tests for reading git's on disk formats natively."""
+
+
+import os
+import mock
+import pytest
+import subprocess
+
+from pypackage import git
+from pypackage import guessing
+from pypackage.config import Config
+
+
+def run_git(*args):
+    """Runs git quietly in the cwd, skipping the test if it's not there."""
+
+    try:
+        return subprocess.check_output(
+            ("git", "-c", "user.name=test", "-c", "user.email=t@e.st") + args,
+            stderr=subprocess.STDOUT,
+        ).decode("utf-8")
+    except OSError:
+        pytest.skip("git is not installed")
+
+
+@pytest.fixture
+def git_package(with_data):
+    """Makes the with_data package a git repo with everything added."""
+
+    root, pkg_root = with_data
+    run_git("init", "-q")
+    run_git("add", "-A")
+    return root, pkg_root
+
+
+def commit(message):
+    """Commits a change to a file named after message."""
+
+    with open(message, "w") as openfile:
+        openfile.write(message)
+    run_git("add", message)
+    run_git("commit", "-q", "-m", message)
+
+
+@pytest.fixture
+def tagged_history(git_package):
+    """Commits and tags some history, with a merge after the last tag."""
+
+    run_git("commit", "-q", "-m", "initial")
+    run_git("tag", "0.1")
+    commit("second")
+    run_git("tag", "-a", "-m", "annotated", "0.2")
+    run_git("checkout", "-q", "-b", "side")
+    commit("side")
+    run_git("checkout", "-q", "-")
+    commit("third")
+    run_git("merge", "-q", "--no-edit", "side")
+    return git_package
+
+
+@pytest.mark.parametrize("gc", [False, True], ids=["loose", "packed"])
+def test_describe(tagged_history, gc):
+    """The nearest tag and distance match git describe's, packed or not."""
+
+    if gc:
+        run_git("gc", "-q")
+        assert os.path.isfile(os.path.join(".git", "packed-refs"))
+        assert not os.listdir(os.path.join(".git", "refs", "tags"))
+
+    expected = run_git("describe", "--tags", "--long").strip()
+    tag, distance, short = expected.rsplit("-", 2)
+
+    repository = git.Repository(".git")
+    name, found_distance, head = repository.describe()
+    assert (name, found_distance) == (tag, int(distance))
+    assert head.startswith(short[1:])
+
+    assert git.latest_tag() == "0.2"
+    assert git.latest_tag(dev=True) == "0.2.dev{}+g{}".format(
+        distance, head[:7],
+    )
+
+
+def test_latest_tag__not_reachable(tagged_history):
+    """Without a tag reachable from HEAD, the newest tag is used."""
+
+    run_git("checkout", "-q", "--orphan", "other")
+    run_git("commit", "-q", "-m", "unrelated")
+    assert git.latest_tag() == "0.2"
+
+
+def test_latest_tag__cached(tagged_history):
+    """The answer is cached until HEAD or the tags change."""
+
+    guess_cache = mock.Mock()
+    guess_cache.listing.side_effect = lambda name, identity, compute: (
+        identity, compute(),
+    )
+
+    first, tag = git.latest_tag(cache=guess_cache)
+    assert tag == "0.2"
+    assert git.latest_tag(cache=guess_cache)[0] == first
+
+    run_git("tag", "0.3")
+    second, tag = git.latest_tag(cache=guess_cache)
+    assert tag == "0.3"
+    assert second != first
+
+
+@pytest.mark.parametrize("version", ["2", "3", "4"])
+def test_read_index(git_package, version):
+    """The index is read the same as git ls-files lists it."""
+
+    os.makedirs(os.path.join("deep", "er" * 40, "still"))
+    with open(os.path.join("deep", "er" * 40, "still", "file"), "w") as open_:
+        open_.write("a long path")
+    run_git("add", "-A")
+    run_git("update-index", "--index-version", version)
+
+    expected = run_git("ls-files", "-z").split("\0")[:-1]
+    assert git.read_index(os.path.join(".git", "index")) == expected
+
+
+def test_read_index__not_an_index(simple_package):
+    """Anything which isn't an index raises a ValueError."""
+
+    with open("index", "wb") as openindex:
+        openindex.write(b"not an index at all")
+
+    with pytest.raises(ValueError):
+        git.read_index("index")
+
+
+def test_git_dir__gitdir_file(simple_package):
+    """A .git file pointing elsewhere is followed."""
+
+    with open(".git", "w") as opengit:
+        opengit.write("gitdir: ../elsewhere/.git\n")
+
+    assert git.git_dir() == os.path.normpath(os.path.join(
+        os.curdir, "..", "elsewhere", ".git"
+    ))
+    assert git.tracked_files() is None
+
+
+def test_git_files(git_package):
+    """With git_files, untracked files are not guessed as package data."""
+
+    root, pkg_root = git_package
+    pkg_name = os.path.basename(pkg_root)
+    with open(os.path.join(pkg_root, "data", "untracked"), "w") as open_:
+        open_.write("not in git")
+
+    tracked = os.path.join(pkg_name, "data", "data_1")
+    untracked = os.path.join(pkg_name, "data", "untracked")
+
+    conf = Config(git_files=True)
+    assert guessing.potential_data_files(
+        [], conf._project_tree, ignore=conf._ignore_matcher,
+    ) == [tracked]
+
+    conf = Config(git_files=True, git_untracked=True)
+    assert sorted(guessing.potential_data_files(
+        [], conf._project_tree, ignore=conf._ignore_matcher,
+    )) == [tracked, untracked]
+
+    assert conf._project_tree.find_packages() == [pkg_name]
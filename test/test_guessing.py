@@ -6,12 +6,14 @@ from __future__ import unicode_literals
 
 import io
 import os
+import re
 import sys
 import mock
 import time
 import codecs
 import pytest
 import random
+import multiprocessing
 from collections import OrderedDict
 
 from pypackage import guessing
@@ -212,5 +214,190 @@ def test_find_in_files__file_too_large(find_in_files_setup):
     find_in_files_asserts(guessing.find_in_files())
 
 
+def test_find_in_files__skipped_extension(find_in_files_setup):
+    """Files with data extensions should never be read."""
+
+    pkg_root = find_in_files_setup[1]
+    with open(os.path.join(pkg_root, "__version__.json"), "w") as openjson:
+        openjson.write("__version__ = '9.9.9'\n")
+
+    with mock.patch.object(guessing, "file_assignments",
+                           wraps=guessing.file_assignments) as patched:
+        find_in_files_asserts(guessing.find_in_files())
+
+    read = [os.path.basename(call[0][0]) for call in patched.call_args_list]
+    assert "__version__.json" not in read
+    assert "__init__.py" in read
+
+
+def test_find_in_files__sniffed_binary(find_in_files_setup):
+    """Files with NUL bytes in their first block are treated as binary."""
+
+    version_file = os.path.join(find_in_files_setup[1], "__version__.py")
+    with open(version_file, "wb") as openversionfile:
+        openversionfile.write(b"\0\n__version__ = '9.9.9'\n")
+
+    find_in_files_asserts(guessing.find_in_files())
+
+
+def test_find_in_files__large_text(find_in_files_setup):
+    """Text files larger than the sniffed block are matched throughout."""
+
+    version_file = os.path.join(find_in_files_setup[1], "__version__.py")
+    with open(version_file, "w") as openversionfile:
+        openversionfile.write("# {}\n".format("x" * guessing.SNIFF_SIZE * 4))
+        openversionfile.write("__version__ = '9.9.9'\n")
+
+    assert guessing.find_in_files()["version"] == "9.9.9"
+
+
+def test_find_in_files__max_size(find_in_files_setup):
+    """The size cap is configurable, with 0 meaning no cap."""
+
+    version_file = os.path.join(find_in_files_setup[1], "__version__.py")
+    with open(version_file, "w") as openversionfile:
+        openversionfile.write("__version__ = '9.9.9'\n")
+        openversionfile.write("#{}\n".format("x" * 200000))
+
+    find_in_files_asserts(guessing.find_in_files())
+    assert guessing.find_in_files(max_size=0)["version"] == "9.9.9"
+    assert "version" not in guessing.find_in_files(max_size=10)
+
+
+def test_find_in_files__early_exit(find_in_files_setup):
+    """Unbeatable guesses from the first tier skip scanning the rest."""
+
+    version_file = os.path.join(find_in_files_setup[1], "__version__.py")
+    with open(version_file, "w") as openversionfile:
+        openversionfile.write("\n".join([
+            "__version__ = '3.0'",
+            "__author__ = 'ali'",
+            "__author_email__ = 'ali@ali.com'",
+            "__maintainer__ = 'ali'",
+            "__maintainer_email__ = 'ali@ali.com'",
+        ]))
+
+    with mock.patch.object(guessing, "file_assignments",
+                           wraps=guessing.file_assignments) as patched:
+        found = guessing.find_in_files()
+
+    assert found["version"] == "3.0"
+    read = [os.path.basename(call[0][0]) for call in patched.call_args_list]
+    assert sorted(read) == ["__init__.py", "__version__.py"]
+
+
+def test_find_in_files__later_tier_wins(find_in_files_setup):
+    """A heavier guess in a later tier still beats the first tier's."""
+
+    sub_package = os.path.join(find_in_files_setup[1], "sub")
+    os.mkdir(sub_package)
+    with open(os.path.join(sub_package, "__version__.py"), "w") as openver:
+        openver.write("__version__ = '4.0'\n")
+
+    found = guessing.find_in_files()
+    assert found["version"] == "4.0"
+    assert found["author"] == "mike tyson"
+
+
+def test_find_in_files__keys(find_in_files_setup):
+    """Only the requested keys are returned, nothing is read for none."""
+
+    assert list(guessing.find_in_files(keys=["author"])) == ["author"]
+    with mock.patch.object(guessing, "file_assignments") as patched:
+        assert guessing.find_in_files(keys=[]) == {}
+    assert not patched.called
+
+
+def test_find_in_files__budget(find_in_files_setup):
+    """Once the time budget runs out, the best guesses so far are used."""
+
+    with mock.patch.object(guessing.time, "time", side_effect=[0] + [1] * 9):
+        with mock.patch.object(guessing, "file_assignments") as patched:
+            assert guessing.find_in_files(budget=500) == {}
+    assert not patched.called
+
+
+def test_guess_budget_option(reset_sys_argv):
+    """--guess-budget overrides the guess_budget setting."""
+
+    conf = Config(guess_budget=250)
+    assert guessing._guess_budget(conf) == 250
+    sys.argv = ["py-build", "--guess-budget", "40"]
+    assert guessing._guess_budget(conf, get_options()) == 40
+    assert guessing._guess_budget(Config()) is None
+
+
+@pytest.mark.parametrize("processes", (False, True), ids=("threads", "procs"))
+def test_find_in_files__parallel(find_in_files_setup, processes):
+    """Scanning in parallel should pick exactly the same guesses."""
+
+    pkg_root = find_in_files_setup[1]
+    for i in range(20):
+        with open(os.path.join(pkg_root, "mod_{}.py".format(i)), "w") as openf:
+            openf.write("__version__ = '0.{0}'\nauthor = 'x{0}'\n".format(i))
+
+    serial = guessing.find_in_files()
+    parallel = guessing.find_in_files(workers=4, processes=processes)
+    assert parallel == serial
+    find_in_files_asserts(parallel)
+
+
+def test_find_in_files__pools_reused(simple_package):
+    """The pools are started once, not once per batch of files."""
+
+    pkg_root = os.path.join(simple_package, os.path.basename(simple_package))
+    for i in range(80):
+        with open(os.path.join(pkg_root, "mod_{}.py".format(i)), "w") as openf:
+            openf.write("x{0} = {0}\n".format(i))
+
+    real_pool = multiprocessing.Pool
+    with mock.patch.object(multiprocessing, "Pool",
+                           side_effect=real_pool) as patched:
+        # a budget scans in batches of 32 files
+        guessing.find_in_files(workers=2, processes=True, budget=60000)
+    assert patched.call_count == 1
+
+
+def test_scan_workers_option(reset_sys_argv):
+    """The --jobs flag overrides the scan_workers setting."""
+
+    conf = Config(scan_workers="3")
+    assert guessing._scan_workers(conf) == 3
+    sys.argv = ["py-build", "-j", "6"]
+    assert guessing._scan_workers(conf, get_options()) == 6
+    sys.argv = ["py-build", "--jobs=lots"]
+    with pytest.raises(SystemExit):
+        guessing._scan_workers(conf, get_options())
+
+
+@pytest.mark.parametrize("content", [
+    "__version__ = '1.0'\nversion = '0.1'\n",
+    "_author_='one'\nauthor = 'two'\n__author__ = \"three\"\n",
+    "version = 'unclosed\n__author__ = 'bob'\n",
+    "author_email = 'a@b.com'\nemail='c@d.com'\nmaintainer_email=''\n",
+    "__version_ = 'nope'\n  __version__ = 'indented'\nx = 1\n",
+])
+def test_match_assignments(content):
+    """The single pass matcher should agree with a search per pattern."""
+
+    found = guessing.match_assignments(codecs.encode(content, "utf-8"))
+
+    names = ("version", "author", "email", "author_email", "maintainer",
+             "maintainer_email")
+    for name in names:
+        for i in range(3):
+            pattern = r'^{u}{name}{u} *= *[\'"]([^\'"]*)[\'"]'.format(
+                u="_" * i,
+                name=name,
+            )
+            re_match = re.search(pattern, content, re.M)
+            if re_match:
+                position, value = found.pop((name, i))
+                assert position == re_match.start()
+                assert codecs.decode(value, "utf-8") == re_match.group(1)
+
+    assert not found
+
+
 if __name__ == "__main__":
     pytest.main(["-rx", "-v", "--pdb", __file__])
@@ -0,0 +1,132 @@
+"""Tests for the compiled ignore matcher."""
+
+
+import os
+import pytest
+
+from pypackage import guessing
+from pypackage.ignore import IgnoreMatcher
+from pypackage.ignore import parse_gitignore
+from pypackage.config import Config
+
+
+@pytest.mark.parametrize("path, is_dir, ignored", [
+    ("./build", True, True),
+    ("./pkg/Tests", True, True),
+    ("./pkg.egg-info", True, True),
+    ("./.venv", True, True),
+    ("./pkg/data", True, False),
+    ("./pkg/thing.pyc", False, True),
+    ("./pkg/tox.ini", False, True),
+    ("./pkg/data.json", False, False),
+])
+def test_builtin_rules(path, is_dir, ignored):
+    """The built in names and patterns are matched like they always were."""
+
+    matcher = IgnoreMatcher(gitignore=False)
+    check = matcher.ignored_dir if is_dir else matcher.ignored_file
+    assert check(path) is ignored
+
+
+@pytest.mark.parametrize("pattern, path, is_dir, ignored", [
+    ("node_modules/", "./web/node_modules", True, True),
+    ("node_modules/", "./web/node_modules", False, False),
+    ("/cache", "./cache", True, True),
+    ("/cache", "./pkg/cache", True, False),
+    ("pkg/*.bin", "./pkg/blob.bin", False, True),
+    ("pkg/*.bin", "./pkg/sub/blob.bin", False, False),
+    ("**/fixtures", "./a/b/fixtures", True, True),
+    ("vendor/**", "./vendor/x/y.txt", False, True),
+    ("*.sw[op]", "./pkg/.file.swp", False, True),
+    ("# comment", "./# comment", False, False),
+])
+def test_gitignore_patterns(pattern, path, is_dir, ignored):
+    """Gitignore style patterns match relative to the root."""
+
+    matcher = IgnoreMatcher(patterns=[pattern], gitignore=False)
+    assert matcher._gitignored(path, is_dir) is ignored
+
+
+def test_negation_last_match_wins():
+    """A later negated pattern re-includes what an earlier one ignored."""
+
+    matcher = IgnoreMatcher(patterns=["*.log", "!keep.log"], gitignore=False)
+    assert matcher.ignored_file("./pkg/debug.log")
+    assert not matcher.ignored_file("./pkg/keep.log")
+
+
+@pytest.mark.parametrize("negation", [[], ["!keep.LOG"]])
+def test_gitignore_case_sensitive(negation):
+    """Gitignore rules match case sensitively, with or without negations."""
+
+    matcher = IgnoreMatcher(patterns=["Data/", "*.LOG"] + negation,
+                            gitignore=False)
+    assert matcher._gitignored("./Data", True)
+    assert not matcher._gitignored("./data", True)
+    assert matcher._gitignored("./pkg/x.LOG", False)
+    assert not matcher._gitignored("./pkg/x.log", False)
+
+
+def test_parse_gitignore_skips_blanks():
+    """Blank lines and comments do not produce rules."""
+
+    assert parse_gitignore(["", "   ", "# nothing", "/"]) == []
+
+
+def test_gitignore_file_read(with_data):
+    """The project's .gitignore is read, its dirs aren't guessed from."""
+
+    root, pkg_root = with_data
+    pkg_name = os.path.basename(pkg_root)
+    vendored = os.path.join(pkg_root, "node_modules", "left-pad")
+    os.makedirs(vendored)
+    with open(os.path.join(vendored, "index.js"), "w") as openjs:
+        openjs.write("__version__ = '6.6.6'\n")
+    with open(".gitignore", "w") as opengitignore:
+        opengitignore.write("node_modules/\n*.tmp\n")
+    with open(os.path.join(pkg_root, "data", "scratch.tmp"), "w") as opentmp:
+        opentmp.write("temporary")
+
+    conf = Config()
+    found = guessing.find_in_files(conf._project_tree,
+                                   ignore=conf._ignore_matcher)
+    assert found.get("version") != "6.6.6"
+
+    data_files = guessing.potential_data_files(
+        [], conf._project_tree, ignore=conf._ignore_matcher,
+    )
+    assert data_files == [os.path.join(pkg_name, "data", "data_1")]
+
+
+def test_ignore_setting(with_data):
+    """Extra patterns from the metadata are ignored as well."""
+
+    root, pkg_root = with_data
+    conf = Config(ignore="data/")
+    assert conf.ignore == ["data/"]
+    assert guessing.potential_data_files(
+        [], conf._project_tree, ignore=conf._ignore_matcher,
+    ) == []
+
+
+def test_gitignored_packages_found(simple_package):
+    """Gitignored packages are still found, the same as setuptools does."""
+
+    import setuptools
+
+    pkg_root = os.path.join(simple_package, os.path.basename(simple_package))
+    generated = os.path.join(pkg_root, "gen")
+    os.makedirs(generated)
+    with open(os.path.join(generated, "__init__.py"), "w") as openinit:
+        openinit.write("")
+    with open(".gitignore", "w") as opengitignore:
+        opengitignore.write("gen/\n")
+
+    conf = Config()
+    assert sorted(conf._find_packages()) == \
+        sorted(setuptools.find_packages())
+    assert "{}.gen".format(os.path.basename(pkg_root)) in \
+        conf._find_packages()
+    assert guessing.potential_data_files(
+        [], conf._project_tree, ignore=conf._ignore_matcher,
+    ) == []
@@ -0,0 +1,138 @@
+"""Tests for compacting data files into globs and MANIFEST.in rules."""
+
+
+import os
+import mock
+
+from pypackage import manifest
+from pypackage.tree import TreeSnapshot
+from pypackage.manifest import expand_paths
+from pypackage.manifest import compact_paths
+from pypackage.manifest import manifest_lines
+from pypackage.manifest import manifest_files
+
+
+def write_files(*paths):
+    """Writes an empty file at each of the relative paths."""
+
+    for path in paths:
+        if os.path.dirname(path) and not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as openfile:
+            openfile.write(path)
+
+
+def test_compact_paths(simple_package):
+    """Fully included directories become globs, partial ones are listed."""
+
+    full = [os.path.join("full", name) for name in ("a", "b", "c")]
+    partial = [os.path.join("partial", name) for name in ("a", "b")]
+    write_files(*(full + partial + [os.path.join("partial", "skip.pyc")]))
+
+    single = os.path.join("single", "only")
+    write_files(single)
+
+    assert compact_paths(full + partial + [single]) == \
+        ["full/*"] + partial + [single]
+
+
+def test_expand_paths(simple_package):
+    """Globs expand back into the files they match."""
+
+    write_files(os.path.join("full", "a"), os.path.join("full", "b"))
+    assert expand_paths(["full/*", "README"]) == [
+        os.path.join("full", "a"), os.path.join("full", "b"), "README",
+    ]
+
+
+def test_manifest_lines(simple_package):
+    """Fully included trees become a single recursive-include."""
+
+    write_files(*[
+        os.path.join("tree", "a"),
+        os.path.join("tree", "b"),
+        os.path.join("tree", "sub", "c"),
+        os.path.join("tree", "sub", "d"),
+        os.path.join("tree", "lone", "e"),
+        os.path.join("mixed", "f"),
+        os.path.join("mixed", "g"),
+        os.path.join("mixed", "sub", "h"),
+    ])
+    paths = compact_paths([
+        os.path.join("tree", "a"),
+        os.path.join("tree", "b"),
+        os.path.join("tree", "sub", "c"),
+        os.path.join("tree", "sub", "d"),
+        os.path.join("tree", "lone", "e"),
+        os.path.join("mixed", "f"),
+        os.path.join("mixed", "g"),
+    ])
+
+    assert manifest_lines(paths) == [
+        "recursive-include tree *",
+        "include mixed/*",
+    ]
+
+
+def test_manifest_lines__from_tree(simple_package):
+    """Directory listings come from the tree rather than the disk."""
+
+    paths = [
+        os.path.join("tree", "a"),
+        os.path.join("tree", "b"),
+        os.path.join("tree", "sub", "c"),
+        os.path.join("tree", "sub", "d"),
+    ]
+    write_files(*paths)
+    tree = TreeSnapshot()
+
+    with mock.patch.object(manifest, "_scandir", side_effect=AssertionError):
+        compacted = compact_paths(paths, tree)
+        assert manifest_lines(compacted, tree) == ["recursive-include tree *"]
+
+
+def test_manifest_lines__pruned_directories(simple_package):
+    """Directories the tree left out still count as not included."""
+
+    paths = [os.path.join("tree", "a"), os.path.join("tree", "b")]
+    write_files(*(paths + [os.path.join("tree", ".venv", "c")]))
+    tree = TreeSnapshot()
+
+    assert manifest_lines(compact_paths(paths, tree), tree) == \
+        ["include tree/*"]
+
+
+def test_manifest_lines__scales_with_directories(simple_package):
+    """Thousands of files in a few directories make a few rules."""
+
+    paths = []
+    for directory in ("one", "two"):
+        for index in range(2000):
+            paths.append(os.path.join("data", directory, str(index)))
+    write_files(*paths)
+
+    compacted = compact_paths(paths)
+    assert compacted == ["data/one/*", "data/two/*"]
+    assert manifest_lines(compacted) == ["recursive-include data/one *",
+                                         "recursive-include data/two *"]
+
+
+def test_manifest_files():
+    """MANIFEST.in commands select files in order, like distutils."""
+
+    paths = ["README", "setup.py", "docs/index.txt", "docs/api/ref.txt",
+             "pkg/data/a.json", "pkg/data/b.tmp", "pkg/sub/c.json",
+             "build/junk.json"]
+    lines = [
+        "# a comment",
+        "include *.py README",
+        "recursive-include pkg *.json *.tmp",
+        "global-exclude *.tmp",
+        "graft docs",
+        "prune docs/api",
+        "exclude pkg/sub/*",
+        "unknown-command ignored",
+    ]
+    assert manifest_files(lines, paths) == set([
+        "README", "setup.py", "docs/index.txt", "pkg/data/a.json",
+    ])
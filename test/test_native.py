@@ -0,0 +1,226 @@
+"""Tests for building wheels without setuptools."""
+
+
+import os
+import glob
+import mock
+import base64
+import hashlib
+import tarfile
+import zipfile
+import pytest
+
+from pypackage import native
+from pypackage.fingerprint import FINGERPRINT_NAME
+
+
+def wheel_members():
+    """Returns the {name: content} of the files in the wheel in dist."""
+
+    wheel = glob.glob(os.path.join("dist", "*.whl"))[0]
+    with zipfile.ZipFile(wheel) as openwheel:
+        return dict(
+            (name, openwheel.read(name)) for name in openwheel.namelist()
+        )
+
+
+def sdist_members():
+    """Returns the {name: content} of the files in the sdist in dist."""
+
+    sdist = glob.glob(os.path.join("dist", "*.tar.gz"))[0]
+    with tarfile.open(sdist) as opensdist:
+        return dict(
+            (member.name, opensdist.extractfile(member).read()) for member in
+            opensdist.getmembers() if member.isfile()
+        )
+
+
+def _payload(files):
+    """Returns files without the ones in the .dist-info directory."""
+
+    return dict((name, content) for name, content in files.items() if
+                ".dist-info/" not in name)
+
+
+def assert_same_as_setuptools(run_build):
+    """Asserts the native wheel has the same name and files as setuptools'."""
+
+    run_build(native_build=False)
+    setuptools_files = wheel_members()
+    setuptools_sdist = sdist_members()
+    setuptools_dist = os.listdir("dist")
+    run_build(native_build=True)
+    native_files = wheel_members()
+    native_sdist = sdist_members()
+    native_dist = os.listdir("dist")
+
+    assert sorted(native_dist) == sorted(setuptools_dist)
+    assert _payload(native_files) == _payload(setuptools_files)
+
+    dist_info = [name.split("/")[1] for name in native_files if
+                 ".dist-info/" in name]
+    assert sorted(dist_info) == sorted(
+        name.split("/")[1] for name in setuptools_files if
+        ".dist-info/" in name and "LICENSE" not in name
+    )
+
+    assert sorted(native_sdist) == sorted(setuptools_sdist)
+    for name, content in native_sdist.items():
+        if name.endswith((".py", ".txt", ".json", "setup.cfg")) and \
+                not name.endswith("setup.py"):
+            assert content == setuptools_sdist[name], name
+
+
+@pytest.mark.parametrize("fixture", [
+    "simple_module",
+    "simple_package",
+    "with_data",
+    "only_binary",
+])
+def test_same_as_setuptools(request, fixture, run_build):
+    """The native wheel has the same files and name as setuptools makes."""
+
+    request.getfixturevalue(fixture)
+    assert_same_as_setuptools(run_build)
+
+
+def test_same_as_setuptools__scripts(with_scripts, run_build):
+    """Scripts are in the wheel's data, with their python shebang rewritten."""
+
+    assert_same_as_setuptools(run_build)
+
+
+@pytest.mark.parametrize("setup_cfg", [
+    "[bdist_wheel]\nuniversal = 1\n",
+    "[bdist_wheel]\npython-tag = py38\n",
+    "[wheel]\nuniversal = true\n",
+], ids=["universal", "python-tag", "legacy universal"])
+def test_same_as_setuptools__wheel_tag(simple_package, setup_cfg, run_build):
+    """The wheel is tagged with the setup.cfg's bdist_wheel options."""
+
+    with open("setup.cfg", "w") as opencfg:
+        opencfg.write(setup_cfg)
+    assert_same_as_setuptools(run_build)
+
+
+def test_fallback_reason__setup_cfg(simple_package):
+    """Wheels for a platform or build number are left to setuptools."""
+
+    with open("setup.cfg", "w") as opencfg:
+        opencfg.write("[bdist_wheel]\nplat-name = linux_x86_64\n")
+    assert native.fallback_reason({"name": "thing"}) == \
+        "setup.cfg sets bdist_wheel plat-name"
+
+
+def test_project_tree_reused(with_data, run_build):
+    """The build lists files from the config's tree, not new scans."""
+
+    with open("MANIFEST.in", "w") as openmanifest:
+        openmanifest.write("include *.txt\n")
+    with mock.patch.object(native, "TreeSnapshot",
+                           side_effect=AssertionError("scanned again")):
+        run_build(native_build=True)
+    assert "MANIFEST.in" in [name.split("/", 1)[-1] for name in
+                             sdist_members()]
+
+
+def test_record(with_data, run_build):
+    """Every file in the wheel is in the RECORD, with its hash and size."""
+
+    run_build(native_build=True)
+    files = wheel_members()
+    record_name = [name for name in files if name.endswith("/RECORD")][0]
+    record = files[record_name].decode("utf-8").splitlines()
+
+    assert sorted(line.split(",")[0] for line in record) == sorted(files)
+    for line in record:
+        name, digest, size = line.split(",")
+        if name == record_name:
+            assert digest == size == ""
+            continue
+        expected = base64.urlsafe_b64encode(
+            hashlib.sha256(files[name]).digest()
+        ).rstrip(b"=").decode("utf-8")
+        assert digest == "sha256={}".format(expected)
+        assert int(size) == len(files[name])
+
+
+def test_parallel_build(with_data, capfd, run_build):
+    """Parallel builds make the same artifacts, and time each of them."""
+
+    run_build(native_build=True)
+    files = wheel_members()
+    sdist = sdist_members()
+    dist = os.listdir("dist")
+    run_build(native_build=True, parallel_build=True)
+    parallel_files = wheel_members()
+    parallel_dist = os.listdir("dist")
+
+    assert sorted(parallel_dist) == sorted(dist)
+    assert sorted(parallel_files) == sorted(files)
+    assert _payload(parallel_files) == _payload(files)
+    assert sorted(sdist_members()) == sorted(sdist)
+
+    output = capfd.readouterr()[0].splitlines()
+    for name in dist:
+        if name == FINGERPRINT_NAME:
+            continue
+        assert any(line.startswith("Built {}".format(
+            os.path.join("dist", name))) for line in output)
+    assert "Built 2 artifacts in " in output[-1]
+
+
+def test_sdist_untouched(with_data, run_build):
+    """Native sdists leave the project's MANIFEST.in and setup.py alone."""
+
+    with open("MANIFEST.in", "w") as openmanifest:
+        openmanifest.write("include *.txt\n")
+    run_build(native_build=True)
+
+    with open("MANIFEST.in") as openmanifest:
+        assert openmanifest.read() == "include *.txt\n"
+    assert not os.path.exists("setup.py")
+
+    members = sdist_members()
+    manifest = [name for name in members if name.endswith("/MANIFEST.in")]
+    assert members[manifest[0]].decode("utf-8").startswith("include *.txt\n")
+    assert len(members[manifest[0]].splitlines()) > 1
+
+
+def test_metadata():
+    """The core metadata includes requirements, extras and the description."""
+
+    assert native.metadata({
+        "name": "thing",
+        "version": "1.0",
+        "install_requires": ["requests >= 2.0"],
+        "extras_require": {"test:python_version<'3'": ["mock"]},
+        "classifiers": ["Topic :: Utilities"],
+        "long_description": "Thing\n=====\n",
+    }) == "\n".join([
+        "Metadata-Version: 2.1",
+        "Name: thing",
+        "Version: 1.0",
+        "Classifier: Topic :: Utilities",
+        "Requires-Dist: requests >= 2.0",
+        "Provides-Extra: test",
+        "Requires-Dist: mock; (python_version<'3') and extra == \"test\"",
+        "",
+        "Thing",
+        "=====",
+    ]) + "\n"
+
+
+@pytest.mark.parametrize("kwargs, reason", [
+    ({"ext_modules": ["ext"]}, "ext_modules is set"),
+    ({"cmdclass": {"build_py": object}}, "a custom cmdclass is set"),
+    ({"cmdclass": {"test": object}}, "a custom cmdclass is set"),
+    ({"cmdclass": {"test": native.TEST_COMMAND}}, None),
+    ({"name": ""}, "there is no name"),
+], ids=["ext_modules", "cmdclass", "test cmdclass", "our test", "no name"])
+def test_fallback_reason(kwargs, reason):
+    """Anything setuptools has to build is left to setuptools."""
+
+    full = {"name": "thing", "version": "1.0"}
+    full.update(kwargs)
+    assert native.fallback_reason(full) == reason
@@ -1,12 +1,14 @@
 """Tests for the pypackage_setup function in the __init__.py."""
 
 
+import os
 import sys
 import mock
 import pytest
 
 import pypackage
 from pypackage import pypackage_setup
+from pypackage.context import write_if_changed
 
 
 @pytest.mark.parametrize("flag", ("-h", "--help"))
@@ -57,5 +59,37 @@ def test_reclassify_trigger(simple_module, reset_sys_argv, flag):
     assert set_v_patch.call_count == 1
 
 
+def test_outputs_not_rewritten(simple_package, reset_sys_argv):
+    """Unchanged setup.py and metadata files are left alone, mtime and all."""
+
+    for _ in range(2):  # the second run reads the first's metadata
+        sys.argv = ["py-build", "-ms"]
+        pypackage_setup()
+
+    stats = {}
+    for file_ in ("setup.py", pypackage.META_NAME):
+        os.utime(file_, (0, 0))
+        stats[file_] = os.stat(file_)
+
+    sys.argv = ["py-build", "-ms"]
+    pypackage_setup()  # the meta banner would have a new timestamp
+
+    for file_, stat in stats.items():
+        assert os.stat(file_).st_mtime == stat.st_mtime
+        assert os.stat(file_).st_ino == stat.st_ino
+
+
+def test_write_if_changed(simple_package):
+    """Only differing content is written, banners can be ignored."""
+
+    assert write_if_changed("out", "# banner 1\ncontent\n")
+    assert not write_if_changed("out", "# banner 1\ncontent\n")
+    assert not write_if_changed("out", "# banner 2\ncontent\n", banner=True)
+    assert write_if_changed("out", "# banner 2\ncontent\n")
+    assert write_if_changed("out", "# banner 3\nchanged\n", banner=True)
+    with open("out") as openout:
+        assert openout.read() == "# banner 3\nchanged\n"
+
+
 if __name__ == "__main__":
     pytest.main(["-rx", "-v", "--pdb", __file__])
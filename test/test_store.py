@@ -0,0 +1,115 @@
+"""Tests for the shared store of built artifacts."""
+
+
+import os
+import sys
+import json
+import mock
+import shutil
+import pytest
+import tempfile
+
+from pypackage import store
+from pypackage.commands import install
+
+
+@pytest.fixture
+def store_dir(request, move_home_pypackage):
+    """Configures a new artifact store in the site defaults."""
+
+    root = tempfile.mkdtemp()
+    with open(move_home_pypackage, "w") as opensite:
+        json.dump({"artifact_store": root}, opensite)
+    request.addfinalizer(lambda: shutil.rmtree(root))
+    return root
+
+
+def read_artifacts(paths):
+    """Returns a dict of {file name: content} for the artifact paths."""
+
+    artifacts = {}
+    for path in paths:
+        with open(path, "rb") as openartifact:
+            artifacts[os.path.basename(path)] = openartifact.read()
+    return artifacts
+
+
+def test_reused_from_store(with_data, store_dir, capfd, run_build):
+    """A second build of the same inputs copies the stored artifacts."""
+
+    built = read_artifacts(run_build(native_build=True))
+    assert store.ArtifactStore(store_dir).stats() == {
+        "hits": 0, "misses": 2, "published": 2, "evicted": 0,
+    }
+    capfd.readouterr()
+
+    assert read_artifacts(run_build(native_build=True)) == built
+    output = capfd.readouterr()[0]
+    assert output.count("from the artifact store") == 2
+    assert "Built " not in output
+    assert store.ArtifactStore(store_dir).stats()["hits"] == 2
+
+
+def test_changed_inputs_miss(simple_package, store_dir, capfd, run_build):
+    """Changed inputs are built and published under a new key."""
+
+    run_build(native_build=True)
+    with open("README", "w") as openreadme:
+        openreadme.write("changed")
+    capfd.readouterr()
+
+    run_build(native_build=True)
+    assert "from the artifact store" not in capfd.readouterr()[0]
+    stats = store.ArtifactStore(store_dir).stats()
+    assert stats["misses"] == 4
+    assert stats["published"] == 4
+
+
+def test_lru_eviction(store_dir):
+    """The least recently used artifacts are removed to stay under the cap."""
+
+    artifacts = store.ArtifactStore(store_dir, max_size=25)
+    for index, key in enumerate(("aa11", "bb22", "cc33")):
+        path = os.path.join(store_dir, "artifact-{}".format(index))
+        with open(path, "w") as openartifact:
+            openartifact.write("0123456789")
+        artifacts.publish(key, path)
+        stored = artifacts.lookup(key)
+        os.utime(stored, (1000000000 + index, 1000000000 + index))
+        if index == 1:  # use the first one again, so the second is older
+            os.utime(artifacts.lookup("aa11"), None)
+
+    assert artifacts.lookup("aa11").endswith("artifact-0")
+    assert artifacts.lookup("bb22") is None
+    assert artifacts.lookup("cc33").endswith("artifact-2")
+    assert artifacts.stats()["evicted"] == 1
+
+
+def test_publish_atomic(store_dir):
+    """Published artifacts are renamed into place, leaving no temp files."""
+
+    artifacts = store.ArtifactStore(store_dir)
+    path = os.path.join(store_dir, "artifact")
+    with open(path, "w") as openartifact:
+        openartifact.write("content")
+    artifacts.publish("dd44", path)
+    artifacts.publish("dd44", path)
+
+    assert os.listdir(os.path.join(store_dir, "dd", "dd44")) == ["artifact"]
+    assert artifacts.stats()["published"] == 1
+
+
+def test_install_from_store(simple_package, store_dir, run_build):
+    """py-install installs the stored wheel with pip when there is one."""
+
+    wheel = [os.path.basename(path) for path in
+             run_build(native_build=True) if path.endswith(".whl")][0]
+
+    sys.argv = ["py-install"]
+    with mock.patch("subprocess.check_call") as patched:
+        install()
+
+    command = patched.call_args[0][0]
+    assert command[:4] == [sys.executable, "-m", "pip", "install"]
+    assert os.path.basename(command[-1]) == wheel
+    assert command[-1].startswith(store_dir)
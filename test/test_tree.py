@@ -0,0 +1,185 @@
+"""Tests for the shared project tree snapshot."""
+
+
+import os
+import mock
+import pytest
+from setuptools import find_packages
+from setuptools import find_namespace_packages
+
+from pypackage import tree as tree_module
+from pypackage.tree import TreeSnapshot
+from pypackage.tree import parse_find_packages
+
+
+def test_walk_matches_os_walk(with_data):
+    """The snapshot should walk the same directories and files as os.walk."""
+
+    tree = TreeSnapshot()
+    walked = sorted(
+        (root, sorted(dirs), sorted(files)) for root, dirs, files in
+        tree.walk()
+    )
+    expected = sorted(
+        (root, sorted(dirs), sorted(files)) for root, dirs, files in
+        os.walk(os.curdir)
+    )
+    assert walked == expected
+
+
+def test_walk_skip_dir(with_data):
+    """Directories skipped while walking should not be descended into."""
+
+    root, pkg_root = with_data
+    tree = TreeSnapshot()
+    skipped = os.path.join(pkg_root.replace(root, os.curdir), "data")
+    walked = [root for root, _, _ in tree.walk(skip_dir=skipped.__eq__)]
+    assert os.path.join(os.curdir, os.path.basename(pkg_root)) in walked
+    assert not any(root.endswith("data") for root in walked)
+
+
+def test_scan_skip_dir(with_data):
+    """Directories skipped while scanning are not in the snapshot at all."""
+
+    tree = TreeSnapshot(skip_dir=lambda path: path.endswith("data"))
+    assert not tree.isdir("data")
+    assert "data" not in tree.directories()
+
+
+def test_pruned_dirs(simple_package):
+    """Pruned directories are never scanned."""
+
+    os.makedirs(os.path.join(".git", "refs"))
+    with open(os.path.join(".git", "HEAD"), "w") as openhead:
+        openhead.write("ref: refs/heads/master")
+
+    tree = TreeSnapshot()
+    assert not tree.isdir(".git")
+    assert not tree.isfile(os.path.join(".git", "HEAD"))
+    assert ".git" not in tree.directories()
+
+
+def test_root_pruned_dirs(simple_package):
+    """Virtualenvs are only pruned in the root, not as sub packages."""
+
+    pkg_name = os.path.basename(simple_package)
+    for venv in ("venv", os.path.join(pkg_name, "venv")):
+        os.mkdir(venv)
+        with open(os.path.join(venv, "__init__.py"), "w"):
+            pass
+
+    tree = TreeSnapshot()
+    assert not tree.isdir("venv")
+    assert tree.isfile(os.path.join(pkg_name, "venv", "__init__.py"))
+    assert "{}.venv".format(pkg_name) in tree.find_packages()
+
+
+def test_stat_is_cached(simple_package):
+    """File stat info should come from the scan, not another os.stat."""
+
+    tree = TreeSnapshot()
+    meta_size = tree.stat("pypackage.meta").st_size
+    with open("pypackage.meta", "a") as openmeta:
+        openmeta.write("\n" * 10)
+    assert tree.stat("pypackage.meta").st_size == meta_size
+
+
+def test_kept_snapshots(with_data):
+    """Kept snapshots are reused until one of their directories changes."""
+
+    for root, _, _ in os.walk(os.curdir):
+        os.utime(root, (0, 0))  # well out of the racy window
+
+    with mock.patch.object(tree_module, "_KEEPING", [True]), \
+            mock.patch.object(tree_module, "_KEPT", {}), \
+            mock.patch.object(TreeSnapshot, "_scan",
+                              autospec=True,
+                              side_effect=TreeSnapshot._scan) as scan:
+        first = TreeSnapshot.kept("key")
+        second = TreeSnapshot.kept("key")
+        assert scan.call_count == 1
+        assert second is not first
+        assert sorted(second.paths()) == sorted(first.paths())
+
+        TreeSnapshot.kept("other key")
+        assert scan.call_count == 2
+
+        with open("new_file", "w") as openfile:
+            openfile.write("changes the directory")
+        assert "./new_file" in TreeSnapshot.kept("key").paths()
+        assert scan.call_count == 3
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"exclude": ["test", "tests"]},
+    {"exclude": ["*.sub"]},
+    {"include": ["*.sub*"]},
+])
+def test_find_packages(simple_package, kwargs):
+    """find_packages from the snapshot should agree with setuptools."""
+
+    pkg_name = os.path.basename(simple_package)
+    for sub_package in ("sub", os.path.join("sub", "deeper"), "not.valid",
+                        "venv"):
+        os.makedirs(os.path.join(pkg_name, sub_package))
+        with open(os.path.join(pkg_name, sub_package, "__init__.py"), "w"):
+            pass
+    os.mkdir("no_init")
+    os.makedirs(os.path.join("tests", "unit"))
+    with open(os.path.join("tests", "__init__.py"), "w"):
+        pass
+    with open(os.path.join("tests", "unit", "__init__.py"), "w"):
+        pass
+
+    tree = TreeSnapshot()
+    assert tree.find_packages(**kwargs) == find_packages(**kwargs)
+    assert tree.find_packages(namespaces=True, **kwargs) == \
+        find_namespace_packages(**kwargs)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("find_packages()", {"namespaces": False}),
+    ("find_namespace_packages('src')", {"namespaces": True, "where": "src"}),
+    ('find_packages(exclude=["*.tests"], include=("pkg*",))', {
+        "namespaces": False, "exclude": ["*.tests"], "include": ("pkg*",),
+    }),
+    ("find_packages(exclude=__import__('os').listdir('.'))", None),
+    ("find_packages(exclude='tests')", None),
+    ("find_packages(where='.', where='.')", None),
+    ("find_packages(1, 2, 3, 4)", None),
+    ("setup()", None),
+    ("some_package", None),
+    ("find_packages(!@!^%&)", None),
+])
+def test_parse_find_packages(spec, expected):
+    """find_packages strings are parsed safely, literal arguments only."""
+
+    assert parse_find_packages(spec) == expected
+
+
+if __name__ == "__main__":
+    pytest.main(["-rx", "-v", "--pdb", __file__])
+
+
+def test_kept_snapshots_rebased(with_data):
+    """Snapshots kept for a directory are rebased onto how it's spelled."""
+
+    for root, _, _ in os.walk(os.curdir):
+        os.utime(root, (0, 0))  # well out of the racy window
+
+    absolute = os.path.abspath(os.curdir)
+    with mock.patch.object(tree_module, "_KEEPING", [True]), \
+            mock.patch.object(tree_module, "_KEPT", {}), \
+            mock.patch.object(TreeSnapshot, "_scan",
+                              autospec=True,
+                              side_effect=TreeSnapshot._scan) as scan:
+        kept = TreeSnapshot.kept(None, absolute)
+        rebased = TreeSnapshot.kept(None)
+        assert scan.call_count == 1
+
+    fresh = TreeSnapshot()
+    assert all(path.startswith(absolute) for path in kept.paths())
+    assert sorted(rebased.paths()) == sorted(fresh.paths())
+    assert sorted(rebased.walk()) == sorted(fresh.walk())
+    assert rebased.find_packages() == fresh.find_packages()
@@ -0,0 +1,148 @@
+"""Tests for forwarding commands to the background worker."""
+
+
+import os
+import sys
+import mock
+import time
+import shutil
+import pytest
+import tempfile
+import subprocess
+
+from pypackage import worker
+
+
+pytestmark = pytest.mark.skipif(not worker.supported(),
+                                reason="needs Unix sockets")
+
+
+def run_command(command, *args):
+    """Runs a pypackage command in a new process, returns its output."""
+
+    return subprocess.check_output([
+        sys.executable, "-c",
+        "import sys; from pypackage import commands; "
+        "sys.argv = {!r}; commands.{}()".format(["py-" + command] +
+                                                list(args), command),
+    ]).decode("utf-8")
+
+
+@pytest.fixture
+def socket_env(request):
+    """Points the worker's socket at a new temporary directory."""
+
+    # unix socket paths are short, so this isn't with the test packages
+    socket_dir = tempfile.mkdtemp()
+    os.environ[worker.SOCKET_ENV] = os.path.join(socket_dir, "worker.sock")
+
+    def _cleanup():
+        os.environ.pop(worker.SOCKET_ENV)
+        shutil.rmtree(socket_dir)
+
+    request.addfinalizer(_cleanup)
+    return os.environ[worker.SOCKET_ENV]
+
+
+@pytest.fixture
+def running_worker(request, socket_env):
+    """Starts a worker process, stopping it after the test."""
+
+    process = subprocess.Popen([
+        sys.executable, "-c", "from pypackage import worker; worker.serve()",
+    ])
+    request.addfinalizer(lambda: process.poll() is None and process.kill())
+
+    for _ in range(100):
+        if os.path.exists(socket_env):
+            break
+        time.sleep(0.05)
+    return process
+
+
+def test_no_worker(socket_env):
+    """Without a worker, or with a dead one's socket, run in process."""
+
+    assert worker.forward("setup") is None
+    with open(socket_env, "w") as opensocket:
+        opensocket.write("not a socket")
+    assert worker.forward("setup") is None
+
+
+def test_forwarded_output(with_data, running_worker):
+    """The worker's output is the same as running in process."""
+
+    in_worker = run_command("setup")
+    in_worker_again = run_command("setup")
+
+    socket_path = os.environ.pop(worker.SOCKET_ENV)
+    try:
+        in_process = run_command("setup")
+    finally:
+        os.environ[worker.SOCKET_ENV] = socket_path
+
+    assert in_worker == in_process == in_worker_again
+    assert running_worker.poll() is None
+
+
+def test_forwarded_exit_status(simple_package, running_worker):
+    """SystemExits in the worker are passed back to the client."""
+
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        run_command("setup", "--version")
+    assert error.value.returncode == 1
+
+
+def test_mismatched_client_runs_in_process(simple_package, running_worker):
+    """Clients of another version or interpreter aren't run in the worker."""
+
+    with mock.patch.object(worker, "dist_version", return_value="0.0.0"):
+        assert worker.forward("setup") is None
+    with mock.patch.object(worker.sys, "executable", "/other/python"):
+        assert worker.forward("setup") is None
+    assert running_worker.poll() is None
+
+
+def test_stop(running_worker, socket_env):
+    """The worker can be asked to stop, and removes its socket."""
+
+    assert worker.stop()
+    assert running_worker.wait() == 0
+    assert not os.path.exists(socket_env)
+    assert not worker.stop()
+
+
+@pytest.mark.parametrize("argv, runs, prompts", [
+    (["py-clean"], "clean_all", True),
+    (["py-clean", "-y"], "clean_all", False),
+    (["py-build", "-i"], "pypackage_setup", True),
+    (["py-build", "-si"], "pypackage_setup", True),
+    (["py-build"], "pypackage_setup", False),
+])
+def test_prompting_commands_in_process(argv, runs, prompts):
+    """Commands which will prompt the user are never forwarded."""
+
+    from pypackage import commands
+
+    command = argv[0][3:]
+    with mock.patch.object(sys, "argv", argv), \
+            mock.patch.object(commands, runs) as run, \
+            mock.patch.object(worker, "forward", return_value=0) as forward:
+        getattr(commands, command)()
+
+    assert run.called is prompts
+    assert forward.called is not prompts
+
+
+def test_warm_keeps_cwd(with_data):
+    """Warming a project loads its tree without changing the cwd."""
+
+    root, _ = with_data
+    cwd = os.getcwd()
+    with mock.patch.object(os, "chdir") as chdir, \
+            mock.patch.object(worker, "get_config",
+                              wraps=worker.get_config) as get_config:
+        worker._warm(root)
+    assert not chdir.called
+    get_config.assert_called_once_with(root)
+    assert os.getcwd() == cwd